@@ -0,0 +1,29 @@
+from django.db import connections
+
+
+def pool_stats():
+    """
+    Returns psycopg pool statistics for every database alias that has
+    pooling enabled, plus saturation and average wait time.
+    """
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if not pool:
+            continue
+
+        raw = pool.get_stats()
+        max_size = raw.get('pool_max') or pool.max_size
+        # A pool is opened lazily by the first request that needs it
+        in_use = 0 if pool.closed else raw.get('pool_size', 0) - raw.get('pool_available', 0)
+        requests = raw.get('requests_num', 0)
+
+        stats[alias] = {
+            **raw,
+            'open': not pool.closed,
+            'in_use': in_use,
+            'saturation': round(in_use / max_size, 3) if max_size else 0,
+            'avg_wait_ms': round(raw.get('requests_wait_ms', 0) / requests, 2) if requests else 0,
+            'timeout': pool.timeout,
+        }
+    return stats
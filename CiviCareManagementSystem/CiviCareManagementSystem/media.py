@@ -0,0 +1,199 @@
+"""
+Serves MEDIA_ROOT files from Django with access checks, conditional GET,
+single byte-range requests and optional hand-off to the front proxy.
+
+MEDIA_ACCEL_REDIRECT selects how file bytes leave the worker:
+    None      FileResponse; gunicorn streams it with os.sendfile
+    'nginx'   X-Accel-Redirect to MEDIA_ACCEL_PREFIX + name (internal location)
+    'apache'  X-Sendfile with the absolute path (mod_xsendfile / lighttpd)
+
+receive_upload takes presigned attachment uploads when attachments are
+stored on the local filesystem (issues.storage.ContentAddressedStorage).
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_safe
+from django.views.static import was_modified_since
+
+from issues.models import ArchivedIssueAttachment, IssueAttachment
+from issues.storage import get_attachment_storage
+from users.models import User
+
+range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _attachment_exists(request, name):
+    return (
+        IssueAttachment.objects.filter(file=name).exists()
+        or ArchivedIssueAttachment.objects.filter(file=name).exists()
+    )
+
+
+def _avatar_exists(request, name):
+    return User.objects.filter(avatar=name).exists()
+
+
+# upload_to prefix -> access check; anything else under MEDIA_ROOT is not served
+MEDIA_ACCESS_CHECKS = {
+    'issue_attachments/': _attachment_exists,
+    'avatars/': _avatar_exists,
+}
+
+
+def can_access(request, name):
+    for prefix, check in MEDIA_ACCESS_CHECKS.items():
+        if name.startswith(prefix):
+            return check(request, name)
+    return False
+
+
+class FileRange:
+    """
+    File-like view of `length` bytes starting at `start`. fileno() is kept so
+    the WSGI file wrapper can still sendfile() the range.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) for a single satisfiable byte range, None to serve
+    the whole file, or raises ValueError if the range can't be satisfied.
+    """
+    match = range_re.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: ignoring Range is allowed
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def _accel_response(name, path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL_REDIRECT == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves a media file after Django has checked the caller may see it.
+    """
+    name = path.replace('\\', '/').lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+
+    if not os.path.isfile(full_path) or not can_access(request, name):
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # The proxy handles Range and conditional requests itself
+        response = _accel_response(name, full_path, content_type)
+        response['Last-Modified'] = last_modified
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or parse_http_date_safe(if_range) == int(stat.st_mtime)):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(FileRange(file, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(file, content_type=content_type)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+def receive_upload(request, token):
+    """
+    Stores the body of a presigned PUT; the token is the credential, as the
+    signature is for an object store.
+    """
+    storage = get_attachment_storage()
+    if not hasattr(storage, 'receive_upload'):
+        raise Http404('Uploads go to the object store')
+
+    chunks = iter(lambda: request.read(UPLOAD_CHUNK_SIZE), b'')
+    try:
+        storage.receive_upload(token, chunks)
+    except signing.BadSignature:
+        return HttpResponseForbidden('Invalid or expired upload URL')
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    return HttpResponse(status=200)
@@ -0,0 +1,219 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers, set_response_etag
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .routers import (
+    SAFE_METHODS,
+    pin_to_primary,
+    reset_current_request,
+    set_current_request,
+)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Exposes the current request to PrimaryReplicaRouter and pins clients to
+    the primary database after a successful write.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_current_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_current_request(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request, response)
+
+        return response
+
+
+def _accepted_encodings(request):
+    """
+    Parses Accept-Encoding into the set of codings with a non-zero q-value.
+    """
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=5)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _abrotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=5)
+    async for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _agzip_sequence(sequence):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in sequence:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressedResponseCache:
+    """
+    Small thread-safe LRU of compressed bodies keyed by (path, ETag, encoding).
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compressed_cache = CompressedResponseCache(getattr(settings, 'COMPRESSION_CACHE_SIZE', 128))
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip compression for JSON (and export) responses.
+
+    Picks brotli when the client accepts it, falling back to gzip. Responses
+    smaller than COMPRESSION_MIN_SIZE are left alone and streaming responses
+    are compressed chunk by chunk. Compressed bodies of anonymous, publicly
+    cacheable responses are kept in an LRU keyed by their ETag, so identical
+    issue list/detail payloads are only compressed once.
+    """
+    compressible_types = ('application/json', 'text/csv', 'application/x-ndjson')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.compressible_types or response.has_header('Content-Encoding'):
+            return response
+
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = _accepted_encodings(request)
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            self.compress_stream(response, encoding)
+        elif not self.compress_content(request, response, encoding):
+            return response
+
+        # A strong ETag would claim byte equality with the uncompressed body
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def is_shareable(self, request, response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return False
+        if 'HTTP_AUTHORIZATION' in request.META or response.cookies:
+            return False
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return False
+        cache_control = response.get('Cache-Control', '').lower()
+        return 'private' not in cache_control and 'no-store' not in cache_control
+
+    def compress_content(self, request, response, encoding):
+        key = None
+        if self.is_shareable(request, response):
+            if not response.has_header('ETag'):
+                set_response_etag(response)
+            key = (request.path, response['ETag'], encoding)
+            compressed = compressed_cache.get(key)
+            if compressed is not None:
+                response.content = compressed
+                response.headers['Content-Length'] = str(len(compressed))
+                return True
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=5)
+        else:
+            # Per-user responses get the random filename padding against BREACH
+            compressed = compress_string(
+                response.content,
+                max_random_bytes=None if key else 100,
+            )
+
+        if len(compressed) >= len(response.content):
+            return False
+
+        if key:
+            compressed_cache.set(key, compressed)
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        return True
+
+    def compress_stream(self, response, encoding):
+        content = response.streaming_content
+        if response.is_async:
+            wrapper = _abrotli_sequence if encoding == 'br' else _agzip_sequence
+        else:
+            wrapper = _brotli_sequence if encoding == 'br' else compress_sequence
+        response.streaming_content = wrapper(content)
+        # The compressed size is unknown until the stream ends
+        del response.headers['Content-Length']
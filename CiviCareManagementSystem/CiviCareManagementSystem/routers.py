@@ -0,0 +1,100 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Auth/session lookups happen before a request knows who it belongs to and
+# must see a freshly created account immediately, so they never use a replica.
+# The job queue claims rows with locking reads. Database cache entries
+# (replica pins) must not lag either.
+PRIMARY_ONLY_APPS = {
+    'users', 'auth', 'sessions', 'contenttypes', 'admin', 'token_blacklist', 'jobs', 'django_cache',
+}
+
+PIN_COOKIE_NAME = 'ccms_primary_pin'
+
+_current_request = ContextVar('ccms_current_request', default=None)
+
+
+def set_current_request(request):
+    return _current_request.set(request)
+
+
+def reset_current_request(token):
+    _current_request.reset(token)
+
+
+def _pin_cache_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_cache():
+    # Shared by all workers: the follow-up read may land on any of them
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_to_primary(request, response):
+    """
+    Keep the client that just wrote on the primary for REPLICA_PIN_SECONDS,
+    so it reads its own vote/issue instead of a lagging replica.
+    """
+    if not getattr(settings, 'DATABASE_REPLICAS', []):
+        # Every read already goes to the primary
+        return
+
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+    response.set_cookie(PIN_COOKIE_NAME, '1', max_age=seconds, httponly=True, samesite='Lax')
+
+    # JWT clients usually drop cookies, so also pin by user id
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        pin_cache().set(_pin_cache_key(user.pk), True, seconds)
+
+
+def is_pinned(request):
+    pinned = getattr(request, '_replica_pinned', None)
+    if pinned is not None:
+        return pinned
+
+    if request.COOKIES.get(PIN_COOKIE_NAME):
+        request._replica_pinned = True
+        return True
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # Don't remember the answer: DRF may still authenticate the request
+        return False
+
+    request._replica_pinned = bool(pin_cache().get(_pin_cache_key(user.pk)))
+    return request._replica_pinned
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends safe-method reads to one of settings.DATABASE_REPLICAS and
+    everything else (writes, migrations, management commands) to default.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return 'default'
+
+        request = _current_request.get()
+        if request is None or request.method not in SAFE_METHODS:
+            return 'default'
+
+        if is_pinned(request):
+            return 'default'
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
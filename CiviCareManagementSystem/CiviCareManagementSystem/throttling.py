@@ -0,0 +1,214 @@
+"""
+Token-bucket throttles whose buckets are shared by every worker on a node.
+
+Buckets live in a memory-mapped file (THROTTLE_BUCKET_FILE) laid out as a
+fixed-size open-addressing table of THROTTLE_BUCKET_SLOTS slots:
+
+    key hash (u64) | tokens (f64) | last refill (f64)
+
+A key hashes to a window of PROBE_SLOTS consecutive slots; that window is
+locked with fcntl.lockf for the few microseconds it takes to refill and
+take a token, so a check is O(1) and gunicorn/uvicorn workers see the same
+counts. When a window is full the least recently used bucket is recycled.
+Without fcntl (e.g. on Windows) buckets are only shared between threads.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SLOT = struct.Struct('<Qdd')
+PROBE_SLOTS = 8
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class SharedBucketStore:
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = max(int(slots), PROBE_SLOTS)
+        self.size = self.slots * SLOT.size
+        self.fd = None
+        self.map = None
+        # fcntl locks belong to the process, so threads still need this
+        self.lock = threading.Lock()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self.map = mmap.mmap(fd, self.size)
+        self.fd = fd
+
+    @staticmethod
+    def key_hash(key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def take(self, key, capacity, refill_rate, cost=1):
+        """
+        Takes `cost` tokens from the bucket for `key`.
+
+        Returns (allowed, seconds until enough tokens are available).
+        """
+        key_hash = self.key_hash(key)
+        start = (key_hash % (self.slots - PROBE_SLOTS + 1)) * SLOT.size
+        length = PROBE_SLOTS * SLOT.size
+
+        with self.lock:
+            if self.map is None:
+                self._open()
+            if fcntl is not None:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                current = time.time()
+                position, tokens, updated = self._find(key_hash, start, capacity, current)
+
+                tokens = min(capacity, tokens + (current - updated) * refill_rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self.map, position, key_hash, tokens, current)
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+        if allowed:
+            return True, 0
+        return False, (cost - tokens) / refill_rate
+
+    def _find(self, key_hash, start, capacity, current):
+        free = None
+        oldest = None
+        for index in range(PROBE_SLOTS):
+            position = start + index * SLOT.size
+            slot_hash, tokens, updated = SLOT.unpack_from(self.map, position)
+            if slot_hash == key_hash:
+                return position, tokens, updated
+            if slot_hash == 0:
+                if free is None:
+                    free = position
+            elif oldest is None or updated < oldest[1]:
+                oldest = (position, updated)
+
+        # New bucket: starts full, in a free slot or the least recently used one
+        position = free if free is not None else oldest[0]
+        return position, capacity, current
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def bucket_store():
+    path = settings.THROTTLE_BUCKET_FILE
+    slots = getattr(settings, 'THROTTLE_BUCKET_SLOTS', 65536)
+    with _stores_lock:
+        store = _stores.get((path, slots))
+        if store is None:
+            store = _stores[path, slots] = SharedBucketStore(path, slots)
+        return store
+
+
+def parse_rate(rate):
+    """
+    '30/min' -> (capacity 30, refill 0.5 tokens per second).
+    """
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope], in the
+    same 'count/period' format as DRF's own throttles; the count is both the
+    burst size and the number of tokens refilled per period.
+    """
+    scope = None
+
+    def __init__(self):
+        self.capacity, self.refill_rate = parse_rate(self.get_rate())
+        self.retry_after = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+    def applies_to(self, request, view):
+        return True
+
+    def allow_request(self, request, view):
+        if self.capacity is None or not self.applies_to(request, view):
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        allowed, self.retry_after = bucket_store().take(f'{self.scope}:{ident}', self.capacity, self.refill_rate)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserOrIPBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per authenticated user, or per client IP for anonymous requests.
+    """
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class VoteThrottle(UserOrIPBucketThrottle):
+    scope = 'vote'
+
+
+class UploadThrottle(UserOrIPBucketThrottle):
+    scope = 'upload'
+
+    def applies_to(self, request, view):
+        # Only requests that actually carry files
+        return request.method in ('POST', 'PUT', 'PATCH') and bool(request.FILES)
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = 'login'
+
+
+class LoginAccountThrottle(TokenBucketThrottle):
+    """
+    Per target account, against credential stuffing spread over many IPs.
+    """
+    scope = 'login_account'
+
+    def get_ident_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return str(username).strip().lower()
+
+
+class SignupThrottle(TokenBucketThrottle):
+    scope = 'signup'
@@ -15,9 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .media import receive_upload, serve_media
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('issues/', include('issues.urls')),
@@ -27,10 +28,19 @@ urlpatterns = [
     path('api/v1/user/', include('api.users.urls')),
     
     #issues
-     path('api/v1/', include('api.issues.urls'))
+     path('api/v1/', include('api.issues.urls')),
+
+    # system
+    path('api/v1/system/', include('api.system.urls')),
+]
+
+# media files go through Django for access checks; bytes are streamed with
+# sendfile or handed to the front proxy (see MEDIA_ACCEL_REDIRECT)
+urlpatterns += [
+    # presigned attachment uploads when attachments are stored locally
+    path('api/v1/uploads/<str:token>/', receive_upload, name='media-upload'),
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
 ]
 
-# serve media file as static file 
 if not settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Read-only fast path for issue lists.
+
+IssueValuesSerializer renders plain `.values()` rows instead of model
+instances. Converters are precomputed once per request from IssueSerializer's
+own fields, so the output (including ?fields= / ?expand=) is the same JSON
+that IssueSerializer(many=True) would produce, minus the per-item field
+machinery and the per-item vote_summary queries.
+"""
+import decimal
+from collections import defaultdict
+
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from issues.models import Issue, Vote
+from .serializers import IssueSerializer
+
+
+def _nullable(convert):
+    # Serializer.to_representation() short-circuits None for every field
+    def converter(value):
+        return None if value is None else convert(value)
+    return converter
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output:
+        return field.to_representation
+
+    if field.decimal_places is None:
+        return lambda value: f'{value:f}'
+
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != 'iso-8601' or hasattr(field, 'timezone'):
+        return field.to_representation
+
+    tz = field.default_timezone()
+    if tz is None:
+        return field.to_representation
+
+    def convert(value):
+        if not value or not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _file_converter(field, storage, request):
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return convert
+
+
+def build_converter(field, model_field, request):
+    """
+    Returns a function turning a raw column value into field.to_representation() output.
+    """
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        convert = str
+    elif isinstance(field, serializers.DecimalField):
+        convert = _decimal_converter(field)
+    elif isinstance(field, serializers.DateTimeField):
+        convert = _datetime_converter(field)
+    elif isinstance(field, serializers.FileField):
+        convert = _file_converter(field, model_field.storage, request)
+    elif isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        convert = lambda value: choices.get(str(value), value)  # noqa: E731
+    elif isinstance(field, serializers.CharField):
+        convert = str
+    elif isinstance(field, serializers.IntegerField):
+        convert = int
+    elif isinstance(field, serializers.BooleanField):
+        convert = bool
+    else:
+        convert = field.to_representation
+    return _nullable(convert)
+
+
+class IssueValuesSerializer:
+    """
+    Serializes Issue `.values()` rows the way IssueSerializer serializes instances.
+
+    Usage:
+        fast = IssueValuesSerializer(context={'request': request})
+        rows = queryset.values(*fast.columns)
+        data = fast.to_representation(rows)
+    """
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.columns = ['id']
+        self.plan = []
+
+        # Instantiating IssueSerializer applies ?fields= / ?expand=
+        template = IssueSerializer(context=self.context)
+        for name, field in template.fields.items():
+            if field.write_only:
+                continue
+            if name == 'vote_summary':
+                self.plan.append(('votes', name, None))
+            elif isinstance(field, serializers.ListSerializer):
+                self.plan.append(('many', name, self._related_plan(field)))
+            elif isinstance(field, serializers.Serializer):
+                self.plan.append(('one', name, self._nested_plan(field)))
+            else:
+                self.plan.append(('value', name, self._column(Issue, field.source, field)))
+
+    def _column(self, model, source, field, prefix=''):
+        model_field = model._meta.get_field(source)
+        column = prefix + model_field.name
+        if column not in self.columns:
+            self.columns.append(column)
+        return column, build_converter(field, model_field, self.request)
+
+    def _nested_plan(self, serializer):
+        model = Issue._meta.get_field(serializer.source).related_model
+        prefix = serializer.source + '__'
+        return [
+            (name, self._column(model, sub.source, sub, prefix))
+            for name, sub in serializer.fields.items() if not sub.write_only
+        ]
+
+    def _related_plan(self, serializer):
+        relation = Issue._meta.get_field(serializer.source)
+        model = relation.related_model
+        child = serializer.child
+        fields = []
+        for name, sub in child.fields.items():
+            if sub.write_only:
+                continue
+            model_field = model._meta.get_field(sub.source)
+            fields.append((name, model_field.name, build_converter(sub, model_field, self.request)))
+        return model, relation.field.name, fields
+
+    def _fetch_related(self, plan, ids):
+        model, fk_name, fields = plan
+        columns = [column for _, column, _ in fields]
+        rows = model.objects.filter(**{f'{fk_name}__in': ids}).order_by('pk').values(f'{fk_name}_id', *columns)
+
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row[f'{fk_name}_id']].append({
+                name: convert(row[column]) for name, column, convert in fields
+            })
+        return grouped
+
+    def _fetch_votes(self, ids):
+        counts = {
+            row['issue_id']: (row['up'], row['down'])
+            for row in Vote.objects.filter(issue_id__in=ids).values('issue_id').annotate(
+                up=Count('id', filter=Q(value=1)),
+                down=Count('id', filter=Q(value=-1)),
+            ).order_by()
+        }
+
+        mine = {}
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            mine = dict(Vote.objects.filter(issue_id__in=ids, user=user).values_list('issue_id', 'value'))
+
+        summaries = {}
+        for issue_id in ids:
+            up, down = counts.get(issue_id, (0, 0))
+            value = mine.get(issue_id, 0)
+            summaries[issue_id] = {
+                'up': up,
+                'down': down,
+                'score': up - down,
+                'my_vote': 1 if value == 1 else -1 if value == -1 else 0,
+            }
+        return summaries
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+
+        related = {}
+        for kind, name, plan in self.plan:
+            if kind == 'many':
+                related[name] = self._fetch_related(plan, ids)
+            elif kind == 'votes':
+                related[name] = self._fetch_votes(ids)
+
+        data = []
+        for row in rows:
+            item = {}
+            for kind, name, plan in self.plan:
+                if kind == 'value':
+                    column, convert = plan
+                    item[name] = convert(row[column])
+                elif kind == 'one':
+                    item[name] = {
+                        sub_name: convert(row[column]) for sub_name, (column, convert) in plan
+                    }
+                elif kind == 'many':
+                    item[name] = related[name].get(row['id'], [])
+                else:
+                    item[name] = related[name][row['id']]
+            data.append(item)
+        return data
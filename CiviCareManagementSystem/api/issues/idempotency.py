@@ -0,0 +1,111 @@
+"""
+Idempotency-Key support for create and upload endpoints.
+
+A view method decorated with @idempotent runs at most once per
+(user, method, path, Idempotency-Key). Its response is stored in
+IdempotencyKey for IDEMPOTENCY_KEY_TTL seconds and replayed, with an
+Idempotent-Replayed header, to retries carrying the same key.
+
+The key row is inserted in the same transaction as the view's own writes
+and committed together with them, so a retry never sees a half-done
+request. A concurrent duplicate blocks on the primary key of the
+uncommitted row (PostgreSQL) until the first request finishes, then
+replays its response; if the first request failed and rolled back, the
+duplicate runs instead. Errors raised by the view and 5xx responses are
+not stored, so those requests can be retried.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+
+from issues.models import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+
+def key_digest(request, key):
+    scope = f'{request.user.pk}:{request.method}:{request.path}:{key}'
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+def request_fingerprint(request):
+    """
+    SHA-256 of the parsed body; uploads count by name and size.
+    """
+    data = request.data
+    hasher = hashlib.sha256()
+    for name in sorted(data.keys()):
+        values = data.getlist(name) if hasattr(data, 'getlist') else [data[name]]
+        for value in values:
+            if hasattr(value, 'read'):
+                value = f'file:{value.name}:{value.size}'
+            hasher.update(json.dumps([name, value], sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+def replay(stored):
+    response = Response(stored.response, status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def run_once(request, key, handler):
+    digest = key_digest(request, key)
+    fingerprint = request_fingerprint(request)
+    ttl = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+    while True:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        key=digest, fingerprint=fingerprint, expires_at=now() + ttl
+                    )
+            except IntegrityError:
+                stored = IdempotencyKey.objects.filter(key=digest).first()
+                if stored is None:
+                    # The other request rolled back
+                    continue
+                if stored.expires_at <= now():
+                    stored.delete()
+                    continue
+                if stored.fingerprint != fingerprint:
+                    return Response(
+                        {'error': 'Idempotency-Key was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return replay(stored)
+
+            response = handler()
+            if response.status_code >= 500:
+                record.delete()
+            else:
+                record.status_code = response.status_code
+                record.response = response.data
+                record.save(update_fields=['status_code', 'response'])
+            return response
+
+
+def idempotent(view_method):
+    """
+    Honours the Idempotency-Key request header on a view method.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return run_once(request, key, lambda: view_method(self, request, *args, **kwargs))
+    return wrapper
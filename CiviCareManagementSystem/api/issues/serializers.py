@@ -1,6 +1,12 @@
-from rest_framework import serializers
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
+from rest_framework import permissions, serializers
 from users.models import User
-from issues.models import Issue, IssueAttachment, IssueType, Vote
+from issues.duplicates import find_duplicates
+from issues.models import Issue, IssueAttachment, IssueStatusTransition, IssueType, Notification, VersionConflict, Vote
 from api.users.serializers import UserProfileSerializer
 
 class IssueTypePostSerializer(serializers.ModelSerializer):
@@ -18,6 +24,31 @@ class IssueAttachmentSerializer(serializers.ModelSerializer):
         model = IssueAttachment
         fields = ['id', 'file', 'file_type', 'created_at'] 
 
+class AttachmentPresignSerializer(serializers.Serializer):
+    issue = serializers.PrimaryKeyRelatedField(queryset=Issue.objects.all())
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=50)
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+    def validate_filename(self, value):
+        try:
+            return get_valid_filename(posixpath.basename(value.replace('\\', '/')))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError('Invalid file name.')
+
+    def validate_size(self, value):
+        limit = getattr(settings, 'ATTACHMENT_MAX_UPLOAD_SIZE', 20 * 1024 * 1024)
+        if value > limit:
+            raise serializers.ValidationError(f'Files may be at most {limit} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        return value.lower()
+
+class AttachmentConfirmSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
 class VoteUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -29,18 +60,163 @@ class VoteSerializer(serializers.ModelSerializer):
         model = Vote
         fields = ['id', 'user', 'value', 'created_at']  
 
-class IssueSerializer(serializers.ModelSerializer):  
+class IssueStatusTransitionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IssueStatusTransition
+        fields = ['from_status', 'to_status', 'changed_by', 'changed_at', 'seconds_in_previous']
+
+class TriageIssueSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Issue
+        fields = [
+            'id', 'title', 'status', 'priority', 'score', 'issue_type',
+            'created_at', 'claimed_by', 'claimed_until'
+        ]
+        read_only_fields = fields
+
+class IssueBulkFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Issue.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Issue.PRIORITY_CHOICES, required=False)
+    issue_type = serializers.IntegerField(required=False)
+    user = serializers.UUIDField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+
+    lookups = {
+        'issue_type': 'issue_type_id',
+        'user': 'user_id',
+        'created_before': 'created_at__lt',
+        'created_after': 'created_at__gte',
+    }
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError('At least one filter is required.')
+        return data
+
+class IssueBulkUpdateSerializer(serializers.Serializer):
+    """
+    Either `ids` or `filter` selects the issues; `status` and/or `priority`
+    is applied to them.
+    """
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    filter = IssueBulkFilterSerializer(required=False)
+    status = serializers.ChoiceField(choices=Issue.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Issue.PRIORITY_CHOICES, required=False)
+
+    def validate(self, data):
+        if ('ids' in data) == ('filter' in data):
+            raise serializers.ValidationError('Give either ids or filter.')
+        if 'status' not in data and 'priority' not in data:
+            raise serializers.ValidationError('Nothing to change: give status and/or priority.')
+        return data
+
+    def get_queryset(self):
+        if 'ids' in self.validated_data:
+            return Issue.objects.filter(id__in=self.validated_data['ids'])
+        lookups = IssueBulkFilterSerializer.lookups
+        return Issue.objects.filter(**{
+            lookups.get(name, name): value for name, value in self.validated_data['filter'].items()
+        })
+
+class NotificationSerializer(serializers.ModelSerializer):
+    issue_title = serializers.CharField(source='issue.title', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'issue', 'issue_title', 'status', 'created_at', 'updated_at', 'read_at']
+        read_only_fields = fields
+
+class DuplicateCheckSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    location_latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False, allow_null=True)
+    location_longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False, allow_null=True)
+    issue_type = serializers.PrimaryKeyRelatedField(queryset=IssueType.objects.all(), required=False, allow_null=True)
+
+class SparseFieldsMixin:
+    """
+    Lets clients ask for a subset of fields with ?fields=id,status,...
+    Fields named in ?expand= are added to that subset, so nested/computed
+    fields can be asked for by name; without ?fields= the full
+    representation (nested fields included) is returned. Unrequested fields
+    are dropped before anything is computed. On writes every writable field
+    is still accepted and only the response is trimmed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        self._requested = requested = self.requested_fields(request)
+        if requested is None:
+            return
+
+        writing = request.method not in permissions.SAFE_METHODS
+        for name in list(self.fields):
+            field = self.fields[name]
+            if name in requested or field.write_only or (writing and not field.read_only):
+                continue
+            self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self._requested is not None:
+            for name in list(data):
+                if name not in self._requested:
+                    del data[name]
+        return data
+
+    @staticmethod
+    def _split(value):
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Returns the set of requested field names, or None for the full representation.
+        """
+        if request is None or not getattr(request, 'query_params', None):
+            return None
+
+        fields = request.query_params.get('fields')
+        if not fields:
+            return None
+
+        return cls._split(fields) | cls._split(request.query_params.get('expand', '')) | {'id'}
+
+
+class IssueSerializer(SparseFieldsMixin, serializers.ModelSerializer):  
     user = UserProfileSerializer(read_only=True)
     issue_type_details = IssueTypePostSerializer(source="issue_type", read_only=True)
     attachments = IssueAttachmentSerializer(many=True, read_only=True)
     vote_summary = serializers.SerializerMethodField()
+    # On update: the version the client last read; a mismatch is a conflict
+    version = serializers.IntegerField(required=False, min_value=1)
     
     attachment_files = serializers.ListField(
         child=serializers.FileField(max_length=10000, allow_empty_file=False),
         write_only=True,
         required=False
     )
-    
+
+    # Serializer fields backed by a different model column
+    column_for_field = {
+        'issue_type_details': 'issue_type',
+    }
+
+    @classmethod
+    def columns_for(cls, fields):
+        """
+        Issue columns needed to render `fields`, for QuerySet.only().
+        """
+        model_fields = {f.name for f in Issue._meta.concrete_fields}
+        columns = {'id'}
+        for name in fields:
+            name = cls.column_for_field.get(name, name)
+            if name in model_fields:
+                columns.add(name)
+        return sorted(columns)
+
     def get_vote_summary(self, obj):
         request = self.context.get('request')
         user = request.user if request and request.user.is_authenticated else None
@@ -70,7 +246,7 @@ class IssueSerializer(serializers.ModelSerializer):
             'id', 'user', 'issue_type', 'issue_type_details', 
             'title', 'description', 'status', 'priority',
             'location_latitude', 'location_longitude',
-            'created_at', 'updated_at', 'closed_at',
+            'created_at', 'updated_at', 'closed_at', 'version',
             'attachments', 'attachment_files', 'vote_summary'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'closed_at']
@@ -80,9 +256,20 @@ class IssueSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('user', None)
+        validated_data.pop('version', None)
         attachment_files = validated_data.pop('attachment_files', [])
         request = self.context.get('request')
         user = request.user if request else None
+
+        # Checked before the insert so the new issue can't match itself
+        issue_type = validated_data.get('issue_type')
+        self.possible_duplicates = find_duplicates(
+            validated_data.get('title'),
+            validated_data.get('description'),
+            validated_data.get('location_latitude'),
+            validated_data.get('location_longitude'),
+            issue_type.pk if issue_type else None,
+        )
         
         issue = Issue.objects.create(
             user=user,
@@ -100,11 +287,22 @@ class IssueSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         attachment_files = validated_data.pop('attachment_files', [])
-        
+        expected = validated_data.pop('version', None)
+        if expected is not None and expected != instance.version:
+            raise VersionConflict(f'Issue {instance.pk} is at version {instance.version}, not {expected}')
+
+        changed = []
         for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        
-        instance.save()
+            field = instance._meta.get_field(attr)
+            if field.is_relation and value is not None:
+                value = value.pk
+            if field.value_from_object(instance) != value:
+                changed.append(attr)
+                setattr(instance, attr, validated_data[attr])
+
+        if changed:
+            # Writes only these columns, if the row is still at instance.version
+            instance.save(update_fields=changed)
         
         for file in attachment_files:
             file_type = file.content_type if hasattr(file, 'content_type') else None
@@ -114,4 +312,30 @@ class IssueSerializer(serializers.ModelSerializer):
                 file_type=file_type
             )
         
-        return instance
\ No newline at end of file
+        return instance
+
+class ArchivedIssueSerializer(serializers.BaseSerializer):
+    """
+    Renders the IssueSerializer snapshot stored on an ArchivedIssue, with
+    ?fields= / ?expand= applied and the caller's own vote filled in.
+    """
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        data = {key: value for key, value in instance.data.items() if key != 'history'}
+
+        user = getattr(request, 'user', None)
+        if data.get('vote_summary') is not None and user is not None and user.is_authenticated:
+            value = instance.votes.filter(user=user).values_list('value', flat=True).first() or 0
+            data['vote_summary'] = {**data['vote_summary'], 'my_vote': value}
+
+        if request is not None and data.get('attachments'):
+            data['attachments'] = [
+                {**item, 'file': request.build_absolute_uri(item['file'])}
+                if item.get('file', '').startswith('/') else item
+                for item in data['attachments']
+            ]
+
+        fields = IssueSerializer.requested_fields(request)
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields}
+        return data
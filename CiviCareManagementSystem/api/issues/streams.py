@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from issues.events import EventFilter, broadcaster, fetch_events
+
+
+def format_event(event):
+    data = json.dumps({
+        'issue': event['issue'],
+        'issue_type': event['issue_type'],
+        **event['data'],
+    })
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+@require_GET
+async def issue_events(request):
+    """
+    Server-Sent Events feed of issue created/updated/closed/deleted events
+    and coalesced vote counts. Filters: ?issue_type=1,2 and
+    ?bbox=min_lng,min_lat,max_lng,max_lat. Reconnecting clients send
+    Last-Event-ID and get the events they missed replayed first.
+    """
+    try:
+        event_filter = EventFilter.from_query(request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid issue_type or bbox')
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+
+    async def stream():
+        subscription = await broadcaster.subscribe(event_filter)
+        try:
+            yield f"retry: {int(getattr(settings, 'SSE_RETRY_MS', 3000))}\n\n"
+
+            if last_event_id and last_event_id.isdigit():
+                for event in await sync_to_async(fetch_events)(int(last_event_id)):
+                    if event_filter.matches(event):
+                        yield format_event(event)
+
+            while not (subscription.closed and subscription.queue.empty()):
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing idle connections
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,13 +1,26 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import IssueViewSet, IssueTypeViewSet, IssueAttachmentViewSet, VoteViewSet
+from .views import (
+    IssueViewSet, IssueBulkUpdateView, IssueClusterView, IssueSLAView,
+    IssueTriageClaimView, IssueTriageReleaseView, IssueTriageView, IssueTypeViewSet, IssueAttachmentViewSet, NotificationViewSet, VoteViewSet,
+)
+from .streams import issue_events
 
 router = DefaultRouter()
 router.register(r'issues', IssueViewSet)
 router.register(r'issue_types', IssueTypeViewSet)
 router.register(r'attachments', IssueAttachmentViewSet)
 router.register(r'votes', VoteViewSet)
+router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    # before the router, which would read "events" as an issue pk
+    path('issues/events/', issue_events, name='issue-events'),
+    path('issues/clusters/', IssueClusterView.as_view(), name='issue-clusters'),
+    path('issues/sla/', IssueSLAView.as_view(), name='issue-sla'),
+    path('issues/bulk/', IssueBulkUpdateView.as_view(), name='issue-bulk-update'),
+    path('issues/triage/', IssueTriageView.as_view(), name='issue-triage'),
+    path('issues/triage/claim/', IssueTriageClaimView.as_view(), name='issue-triage-claim'),
+    path('issues/triage/release/', IssueTriageReleaseView.as_view(), name='issue-triage-release'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,11 +1,66 @@
+import uuid
+
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import serializers
+from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
+from CiviCareManagementSystem.throttling import UploadThrottle, VoteThrottle
+from django.http import Http404
+from django.utils.timezone import now
 from users.models import User
-from issues.models import Issue, IssueAttachment, IssueType, Vote
-from .serializers import IssueSerializer, IssueAttachmentSerializer, IssueTypeSerializer, VoteSerializer
+from issues.bulk import bulk_update
+from issues.clusters import clusters
+from issues.duplicates import find_duplicates
+from issues.events import changes_since, decode_sync_token, encode_sync_token, latest_event_id
+from issues.models import ArchivedIssue, Issue, IssueAttachment, IssueType, Notification, VersionConflict, Vote
+from issues.sla import sla_report
+from issues.triage import claim, claimable, release, triage_queue
+from issues.uploads import UploadError, confirm as confirm_upload, presign as presign_upload
+from .serializers import (
+    ArchivedIssueSerializer,
+    AttachmentConfirmSerializer,
+    AttachmentPresignSerializer,
+    DuplicateCheckSerializer,
+    IssueBulkUpdateSerializer,
+    IssueSerializer,
+    IssueAttachmentSerializer,
+    IssueStatusTransitionSerializer,
+    IssueTypeSerializer,
+    NotificationSerializer,
+    TriageIssueSerializer,
+    VoteSerializer,
+)
+from .fast_serializers import IssueValuesSerializer
+from .idempotency import idempotent
+
+class IssueConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This issue was changed by someone else. Reload it and try again.'
+    default_code = 'conflict'
+
+    def __init__(self, issue):
+        super().__init__({'detail': self.default_detail})
+        # The version to re-read the issue at, kept as a number
+        self.detail['version'] = Issue.objects.filter(pk=issue.pk).values_list('version', flat=True).first()
+
+
+class IssueOrderingFilter(filters.OrderingFilter):
+    """
+    ?ordering=priority sorts by urgency (priority_rank), not alphabetically.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [
+            field.replace('priority', 'priority_rank') if field.lstrip('-') == 'priority' else field
+            for field in ordering
+        ]
+
 
 class IssueViewSet(viewsets.ModelViewSet):
     """
@@ -13,7 +68,7 @@ class IssueViewSet(viewsets.ModelViewSet):
     """
     queryset = Issue.objects.all().order_by('-created_at')
     serializer_class = IssueSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, IssueOrderingFilter]
     filterset_fields = ['status', 'priority', 'issue_type', 'user']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'priority', 'status']
@@ -23,13 +78,21 @@ class IssueViewSet(viewsets.ModelViewSet):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'vote']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'vote', 'check_duplicates']:
             permission_classes = [permissions.IsAuthenticated]
         else:
             # permission_classes = [permissions.IsAuthenticatedOrReadOnly]
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
 
+    def get_throttles(self):
+        if self.action == 'vote':
+            return [VoteThrottle()]
+        if self.action in ['create', 'update', 'partial_update']:
+            # attachment_files
+            return [UploadThrottle()]
+        return super().get_throttles()
+
     def get_queryset(self):
         """
         Optionally restricts the returned issues based on query parameters.
@@ -50,9 +113,72 @@ class IssueViewSet(viewsets.ModelViewSet):
             # Note: This is a simplified example. You'd want to use proper geospatial queries
             # Consider using GeoDjango or a specialized library for production use
             pass
+
+        # Only join/prefetch what will be serialized (?fields= / ?expand=)
+        fields = IssueSerializer.requested_fields(self.request)
+        if fields is None or 'user' in fields:
+            queryset = queryset.select_related('user')
+        if fields is None or 'issue_type_details' in fields:
+            queryset = queryset.select_related('issue_type')
+        if fields is None or 'attachments' in fields:
+            queryset = queryset.prefetch_related('attachments')
+
+        # Prune columns for reads; writes still load the full row
+        if fields is not None and self.action in ['list', 'retrieve']:
+            queryset = queryset.only(*IssueSerializer.columns_for(fields))
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        Lists issues through the read-only values() fast path, which renders
+        the same JSON as IssueSerializer without per-item serializer overhead.
+        """
+        fast = IssueValuesSerializer(context=self.get_serializer_context())
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).values(*fast.columns)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation(page))
+
+        return Response(fast.to_representation(rows))
+
+    def get_archived(self):
+        """
+        The ArchivedIssue for the requested pk, or None.
+        """
+        try:
+            pk = uuid.UUID(str(self.kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        except ValueError:
+            return None
+        return ArchivedIssue.objects.filter(pk=pk).first()
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves an issue, falling back to the archive (manage.py archive_issues).
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = self.get_archived()
+            if archived is None:
+                raise
+            return Response(ArchivedIssueSerializer(archived, context=self.get_serializer_context()).data)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """
+        Creates an issue and returns likely duplicates alongside it.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = dict(serializer.data)
+        data['possible_duplicates'] = getattr(serializer, 'possible_duplicates', [])
+        headers = self.get_success_headers(serializer.data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
     def perform_create(self, serializer):
         """
         Set the user to the current user when creating an issue.
@@ -63,7 +189,75 @@ class IssueViewSet(viewsets.ModelViewSet):
         """
         Custom update logic if needed.
         """
-        serializer.save()
+        # Attributes a status change to the caller (see Issue.save)
+        serializer.instance._changed_by = self.request.user
+        try:
+            serializer.save()
+        except VersionConflict:
+            raise IssueConflict(serializer.instance)
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Delta sync for offline clients.
+        GET ?since=<token>: issues created/updated/voted on since the token,
+        ids of deleted issues, and the token to continue from. Without
+        `since`, returns a token for "now" to take before a full download.
+        """
+        since = request.query_params.get('since')
+        if not since:
+            return Response({
+                'changes': [],
+                'deleted': [],
+                'next': encode_sync_token(latest_event_id()),
+                'has_more': False,
+            })
+
+        try:
+            after_id, issued_at = decode_sync_token(since)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Events older than the retention window may have been pruned
+        retention = settings.ISSUE_EVENT_RETENTION_DAYS * 86400
+        if now().timestamp() - issued_at > retention:
+            return Response(
+                {'error': 'Sync token expired, download the issue list again'},
+                status=status.HTTP_410_GONE
+            )
+
+        limit = getattr(settings, 'ISSUE_SYNC_MAX_EVENTS', 1000)
+        changed_ids, deleted_ids, last_id, has_more = changes_since(after_id, limit)
+
+        fast = IssueValuesSerializer(context=self.get_serializer_context())
+        rows = Issue.objects.filter(id__in=changed_ids).order_by('updated_at').values(*fast.columns)
+        changes = fast.to_representation(rows) if changed_ids else []
+
+        return Response({
+            'changes': changes,
+            'deleted': [str(issue_id) for issue_id in deleted_ids],
+            'next': encode_sync_token(last_id),
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['post'])
+    def check_duplicates(self, request):
+        """
+        Pre-submission check: open issues that look like the one being reported.
+        POST {title, description, location_latitude, location_longitude, issue_type}
+        """
+        serializer = DuplicateCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        issue_type = data.get('issue_type')
+        candidates = find_duplicates(
+            data['title'],
+            data['description'],
+            data.get('location_latitude'),
+            data.get('location_longitude'),
+            issue_type.pk if issue_type else None,
+        )
+        return Response({'possible_duplicates': candidates})
 
     @action(detail=True, methods=['post', 'get', 'delete'], permission_classes=[permissions.AllowAny])
     def vote(self, request, pk=None):
@@ -150,10 +344,30 @@ class IssueViewSet(viewsets.ModelViewSet):
             )
         
         issue.status = 'closed'
-        issue.save()
+        issue._changed_by = request.user
+        try:
+            issue.save(update_fields=['status'])
+        except VersionConflict:
+            raise IssueConflict(issue)
         serializer = self.get_serializer(issue)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Get the status transitions of an issue, oldest first.
+        """
+        try:
+            issue = self.get_object()
+        except Http404:
+            archived = self.get_archived()
+            if archived is None:
+                raise
+            return Response(archived.data.get('history', []))
+        transitions = issue.status_transitions.order_by('changed_at', 'id')
+        serializer = IssueStatusTransitionSerializer(transitions, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'])
     def attachments(self, request, pk=None):
         """
@@ -180,6 +394,121 @@ class IssueViewSet(viewsets.ModelViewSet):
         })
 
 
+class IssueSLAView(APIView):
+    """
+    Time-to-resolution and time-in-status percentiles (seconds, admin only).
+    GET ?group_by=issue_type|priority
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'issue_type')
+        if group_by not in ('issue_type', 'priority'):
+            return Response(
+                {'error': 'group_by must be issue_type or priority'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'group_by': group_by, 'results': sla_report(group_by)})
+
+
+class IssueBulkUpdateView(APIView):
+    """
+    Sets status and/or priority on many issues at once (admin only).
+    POST {"ids": [...]} or {"filter": {"status": "open", "issue_type": 3, ...}}
+         plus {"status": "closed"} and/or {"priority": "high"}
+    Returns only counts.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = IssueBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        totals = bulk_update(
+            serializer.get_queryset(),
+            status=serializer.validated_data.get('status'),
+            priority=serializer.validated_data.get('priority'),
+            changed_by=request.user,
+        )
+        return Response(totals)
+
+
+class IssueTriageView(APIView):
+    """
+    Admin triage queue: pending/open issues by priority, then score, oldest first.
+    GET ?limit=50[&available=1 to hide issues claimed by someone]
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = triage_queue()
+        if request.query_params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(claimable(now()))
+        return Response({'results': TriageIssueSerializer(queryset[:limit], many=True).data})
+
+
+class IssueTriageClaimView(APIView):
+    """
+    Claims the next unclaimed issues in the triage queue for the caller.
+    POST {"count": 1}
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= 50:
+            return Response({'error': 'count must be between 1 and 50'}, status=status.HTTP_400_BAD_REQUEST)
+
+        claimed = claim(request.user, count)
+        return Response({'results': TriageIssueSerializer(claimed, many=True).data})
+
+
+class IssueTriageReleaseView(APIView):
+    """
+    Gives up the caller's claims.
+    POST {"ids": ["<issue id>", ...]}
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        try:
+            ids = [uuid.UUID(str(value)) for value in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be a list of issue ids'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'released': release(request.user, ids)})
+
+
+class IssueClusterView(APIView):
+    """
+    Map clusters for a viewport, read from the precomputed grid cells.
+    GET ?zoom=12&bbox=min_lng,min_lat,max_lng,max_lat[&status=open,in_progress]
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+            bbox = [float(value) for value in request.query_params.get('bbox', '').split(',')]
+            if len(bbox) != 4:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'zoom and bbox=min_lng,min_lat,max_lng,max_lat are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+        return Response({'zoom': zoom, 'clusters': clusters(zoom, bbox, statuses)})
+
+
 class IssueTypeViewSet(viewsets.ModelViewSet):
     """
     API endpoint for issue types (typically admin only).
@@ -202,6 +531,7 @@ class IssueAttachmentViewSet(viewsets.ModelViewSet):
     queryset = IssueAttachment.objects.all().order_by('-created_at')
     serializer_class = IssueAttachmentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_classes = [UploadThrottle]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -212,6 +542,10 @@ class IssueAttachmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(issue__id=issue_id)
         
         return queryset
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """
@@ -227,6 +561,35 @@ class IssueAttachmentViewSet(viewsets.ModelViewSet):
         else:
             raise serializers.ValidationError({'issue': 'Issue ID is required'})
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def presign(self, request):
+        """
+        Starts a direct upload to the attachment storage (see issues.uploads).
+        """
+        serializer = AttachmentPresignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = presign_upload(request.user, **serializer.validated_data)
+        if result['upload']:
+            # The filesystem storage hands out a path on this site
+            result['upload']['url'] = request.build_absolute_uri(result['upload']['url'])
+        return Response(result)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def confirm(self, request):
+        """
+        Creates the attachment once its direct upload has finished.
+        """
+        serializer = AttachmentConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            attachment, created = confirm_upload(request.user, serializer.validated_data['token'])
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            IssueAttachmentSerializer(attachment, context={'request': request}).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
 
 class VoteViewSet(viewsets.ModelViewSet):
     """
@@ -251,4 +614,37 @@ class VoteViewSet(viewsets.ModelViewSet):
         """
         Set the user to the current user when creating a vote.
         """
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The current user's notifications, most recently updated first.
+    GET ?unread=1 lists unread ones only (served by a partial index).
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user).select_related('issue')
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(read_at__isnull=True)
+        return queryset.order_by('-updated_at', '-id')
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """
+        Mark a notification as read.
+        """
+        notification = self.get_object()
+        if notification.read_at is None:
+            notification.read_at = now()
+            notification.save(update_fields=['read_at'])
+        return Response(self.get_serializer(notification).data)
+
+    @action(detail=False, methods=['post'])
+    def read_all(self, request):
+        """
+        Mark all of the user's notifications as read.
+        """
+        count = Notification.objects.filter(user=request.user, read_at__isnull=True).update(read_at=now())
+        return Response({'marked_read': count})
@@ -0,0 +1,15 @@
+from rest_framework import permissions
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from CiviCareManagementSystem.dbpool import pool_stats
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    Connection pool saturation and wait time per database (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({'pools': pool_stats()})
@@ -1,10 +1,21 @@
+import re
+
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
-from users.models import User
+from issues.user_stats import get_stats
+from users.models import User, UserStats
+
+# Column named in a unique violation message, when the driver doesn't
+# report the constraint name
+UNIQUE_COLUMN_RES = (
+    re.compile(r'Key \((\w+)\)='),  # PostgreSQL detail
+    re.compile(r'UNIQUE constraint failed: \w+\.(\w+)'),  # SQLite
+)
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,6 +33,24 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class UserStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserStats
+        fields = ['issues_reported', 'open_issues', 'votes_cast']
+
+class UserWithStatsSerializer(UserSerializer):
+    """
+    The user's own profile, with the activity counters from UserStats
+    (one primary key lookup, no counting).
+    """
+    stats = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['stats']
+
+    def get_stats(self, obj):
+        return UserStatsSerializer(get_stats(obj)).data
+
 class SignupSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True, 
@@ -42,40 +71,74 @@ class SignupSerializer(serializers.ModelSerializer):
             'role', 'date_of_birth', 'avatar', 
             'password', 'confirm_password'
         ]
+        # Uniqueness is left to the database constraints (see create), so the
+        # usual signup costs one INSERT instead of one SELECT per unique field
         extra_kwargs = {
-            'email': {'required': True},
+            'email': {'required': True, 'validators': []},
             'full_name': {'required': True},
+            'username': {'validators': []},
+            'phone': {'validators': []},
         }
 
+    unique_fields = ('username', 'email', 'phone')
+
     def validate(self, data):
         # Check if passwords match
         if data['password'] != data['confirm_password']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         
-        # Check if email already exists
-        if User.objects.filter(email=data.get('email', '')).exists():
-            raise serializers.ValidationError({"email": "A user with this email already exists."})
-        
-        # Check if username already exists
-        if User.objects.filter(username=data.get('username', '')).exists():
-            raise serializers.ValidationError({"username": "A user with this username already exists."})
-        
         return data
 
+    @classmethod
+    def unique_field_for(cls, error):
+        """
+        Names the unique field an IntegrityError is about, from the violated
+        constraint's name where psycopg reports it ("users_user_email_key"),
+        else from the column in the PostgreSQL or SQLite message.
+        """
+        table = User._meta.db_table
+        columns = {User._meta.get_field(field).column: field for field in cls.unique_fields}
+
+        constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+        if constraint:
+            for column, field in columns.items():
+                if constraint.startswith(f'{table}_{column}_'):
+                    return field
+            return None
+
+        message = str(error)
+        for pattern in UNIQUE_COLUMN_RES:
+            match = pattern.search(message)
+            if match:
+                return columns.get(match.group(1))
+        return None
+
     def validate_email(self, value):
         value = value.lower().strip()  # Normalize email
         return value
 
+    def validate_phone(self, value):
+        # Blank would collide with other blank phones on the unique constraint
+        return value or None
+
     def create(self, validated_data):
         validated_data.pop('confirm_password')  # Remove confirm_password field
         password = validated_data.pop('password')
         
         try:
-            user = User.objects.create_user(
-                **validated_data,
-                password=password
-            )
+            # Savepoint, so a duplicate doesn't break an outer transaction
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    **validated_data,
+                    password=password
+                )
             return user
+        except IntegrityError as e:
+            field = self.unique_field_for(e)
+            if field is None:
+                raise
+            label = 'phone number' if field == 'phone' else field
+            raise serializers.ValidationError({field: [f"A user with this {label} already exists."]})
         except DjangoValidationError as e:
             raise serializers.ValidationError(str(e))
 
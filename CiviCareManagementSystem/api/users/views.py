@@ -1,4 +1,5 @@
-from rest_framework import status, generics, permissions
+from rest_framework import status, generics, permissions, filters
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -7,9 +8,12 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib.auth import logout
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from django_filters.rest_framework import DjangoFilterBackend
 
+from CiviCareManagementSystem.throttling import LoginAccountThrottle, LoginThrottle, SignupThrottle
 from .serializers import (
     UserSerializer, 
+    UserWithStatsSerializer,
     SignupSerializer, 
     LoginSerializer, 
     RefreshTokenSerializer,
@@ -23,6 +27,7 @@ class SignupView(generics.CreateAPIView):
     """
     serializer_class = SignupSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [SignupThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -49,6 +54,7 @@ class LoginView(APIView):
     View for user login
     """
     permission_classes = [AllowAny]
+    throttle_classes = [LoginThrottle, LoginAccountThrottle]
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data, context={'request': request})
@@ -154,7 +160,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     """
     View for user profile (view and update)
     """
-    serializer_class = UserSerializer
+    serializer_class = UserWithStatsSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
@@ -173,12 +179,39 @@ class ProfileView(generics.RetrieveUpdateAPIView):
             'message': 'Profile updated successfully'
         })
 
+class UserDirectoryPagination(CursorPagination):
+    """
+    Keyset pagination: each page is an index range scan, with no COUNT(*).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """
+    ?search= matches prefixes of username, email, full name and phone;
+    ?match=contains matches anywhere (trigram indexed on PostgreSQL).
+    """
+    def get_search_fields(self, view, request):
+        fields = super().get_search_fields(view, request)
+        if request.query_params.get('match') == 'contains':
+            return fields
+        return ['^' + field for field in fields]
+
+
 class UserListView(generics.ListAPIView):
     """
     View for listing all users (admin only)
+    GET ?search=&match=prefix|contains&role=&is_active=&cursor=
     """
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserDirectoryPagination
+    filter_backends = [DjangoFilterBackend, UserSearchFilter]
+    filterset_fields = ['role', 'is_active']
+    search_fields = ['username', 'email', 'full_name', 'phone']
     
     def get_queryset(self):
         user = self.request.user
@@ -246,7 +279,7 @@ class CurrentUserView(generics.RetrieveAPIView):
     """
     View to get current authenticated user details
     """
-    serializer_class = UserSerializer
+    serializer_class = UserWithStatsSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
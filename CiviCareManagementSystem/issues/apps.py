@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class IssuesConfig(AppConfig):
     name = 'issues'
+
+    def ready(self):
+        from . import signals  # noqa: F401
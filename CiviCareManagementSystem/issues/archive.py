@@ -0,0 +1,117 @@
+"""
+Archival of old closed/resolved issues.
+
+archive_batch() moves up to `limit` issues whose status has been resolved
+or closed since before `cutoff` into ArchivedIssue, ArchivedVote and
+ArchivedIssueAttachment and deletes the live rows, all in one transaction,
+so the hot Issue/Vote/IssueAttachment tables only hold the live set.
+Archived issues stay readable through IssueViewSet.retrieve.
+
+While archive_batch() deletes, is_archiving() is true and the issues.signals
+receivers skip per-vote events and keep attachment blob references, which
+move to the archived rows.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .models import (
+    ArchivedIssue,
+    ArchivedIssueAttachment,
+    ArchivedVote,
+    Issue,
+    IssueAttachment,
+    IssueStatusTransition,
+    Vote,
+)
+
+ARCHIVE_STATUSES = ('resolved', 'closed')
+
+_archiving = ContextVar('archiving', default=False)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+@contextmanager
+def archiving():
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def status_history(ids):
+    from api.issues.serializers import IssueStatusTransitionSerializer
+
+    history = defaultdict(list)
+    transitions = IssueStatusTransition.objects.filter(issue_id__in=ids).order_by('changed_at', 'id')
+    for transition in transitions:
+        # Same JSON as the /history/ endpoint
+        history[transition.issue_id].append(IssueStatusTransitionSerializer(transition).data)
+    return history
+
+
+def archive_batch(cutoff, limit=200):
+    """
+    Archives one batch; returns the number of issues archived.
+    """
+    # Imported here: the API package depends on this app, not the other way round
+    from api.issues.fast_serializers import IssueValuesSerializer
+
+    with transaction.atomic():
+        issues = list(
+            Issue.objects.select_for_update()
+            .filter(status__in=ARCHIVE_STATUSES, status_changed_at__lt=cutoff)
+            .order_by('status_changed_at')[:limit]
+        )
+        if not issues:
+            return 0
+        ids = [issue.pk for issue in issues]
+
+        # Same JSON the API served, rendered without a request (my_vote = 0)
+        fast = IssueValuesSerializer(context={})
+        rendered = {
+            item['id']: item
+            for item in fast.to_representation(Issue.objects.filter(id__in=ids).values(*fast.columns))
+        }
+        history = status_history(ids)
+
+        ArchivedIssue.objects.bulk_create([
+            ArchivedIssue(
+                id=issue.pk,
+                user_id=issue.user_id,
+                issue_type_id=issue.issue_type_id,
+                title=issue.title,
+                status=issue.status,
+                priority=issue.priority,
+                created_at=issue.created_at,
+                closed_at=issue.closed_at,
+                data={**rendered[str(issue.pk)], 'history': history[issue.pk]},
+            )
+            for issue in issues
+        ])
+        ArchivedVote.objects.bulk_create(
+            [
+                ArchivedVote(issue_id=issue_id, user_id=user_id, value=value, created_at=created_at)
+                for issue_id, user_id, value, created_at in Vote.objects.filter(issue_id__in=ids)
+                .values_list('issue_id', 'user_id', 'value', 'created_at').iterator()
+            ],
+            batch_size=1000
+        )
+        ArchivedIssueAttachment.objects.bulk_create([
+            ArchivedIssueAttachment(
+                issue_id=issue_id, file=file, blob_id=blob_id, file_type=file_type, created_at=created_at
+            )
+            for issue_id, file, blob_id, file_type, created_at in IssueAttachment.objects.filter(issue_id__in=ids)
+            .values_list('issue_id', 'file', 'blob_id', 'file_type', 'created_at')
+        ])
+
+        with archiving():
+            Issue.objects.filter(id__in=ids).delete()
+
+    return len(ids)
@@ -0,0 +1,132 @@
+"""
+Bulk status/priority changes for administrators.
+
+bulk_update() walks the selection in primary key order, BULK_UPDATE_CHUNK_SIZE
+issues per transaction. Each chunk locks its rows, changes them with one
+UPDATE (which bumps `version`, so concurrent edits of these issues get
+a conflict) and then writes, in bulk, what Issue.save() and the issues.signals
+receivers would have written one issue at a time:
+
+    * IssueStatusTransition rows and the SLA histogram counts
+    * IssueEvent rows (SSE stream, delta sync, duplicate index)
+    * map cell deltas, the reporters' open issue counters
+    * issues.notify_voters jobs for issues that became resolved/closed
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils.timezone import now
+
+from jobs.queue import enqueue_many
+
+from . import clusters, sla, user_stats
+from .events import issue_payload, record_events
+from .models import Issue, IssueStatusTransition
+from .notifications import NOTIFY_STATUSES
+
+COLUMNS = (
+    'id', 'user', 'issue_type', 'title', 'status', 'priority', 'location_latitude',
+    'location_longitude', 'created_at', 'updated_at', 'closed_at', 'status_changed_at',
+)
+
+
+def changes(status, priority):
+    """
+    Matches the issues that `status`/`priority` would actually change.
+    """
+    condition = Q()
+    if status is not None:
+        condition |= ~Q(status=status)
+    if priority is not None:
+        condition |= ~Q(priority=priority)
+    return condition
+
+
+def bulk_update(queryset, status=None, priority=None, changed_by=None, chunk_size=None):
+    """
+    Sets `status` and/or `priority` on every issue in `queryset` that differs.
+
+    Returns {'updated': issues changed, 'status_changed': of which changed status}.
+    """
+    chunk_size = chunk_size or getattr(settings, 'BULK_UPDATE_CHUNK_SIZE', 500)
+    pending = queryset.filter(changes(status, priority)).order_by('pk')
+    totals = {'updated': 0, 'status_changed': 0}
+
+    last_pk = None
+    while True:
+        chunk = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        with transaction.atomic():
+            issues = list(chunk.select_for_update().only(*COLUMNS)[:chunk_size])
+            if not issues:
+                break
+            status_changed = update_chunk(issues, status, priority, changed_by)
+        totals['updated'] += len(issues)
+        totals['status_changed'] += status_changed
+        last_pk = issues[-1].pk
+        if len(issues) < chunk_size:
+            break
+    return totals
+
+
+def update_chunk(issues, status, priority, changed_by):
+    current = now()
+    values = {'updated_at': current, 'version': F('version') + 1}
+    if priority is not None:
+        values['priority'] = priority
+        values['priority_rank'] = Issue.PRIORITY_RANKS[priority]
+    if status is not None:
+        moved = ~Q(status=status)
+        values['status'] = status
+        values['status_changed_at'] = Case(When(moved, then=Value(current)), default=F('status_changed_at'))
+        if status == 'closed':
+            values['closed_at'] = Case(
+                When(moved & Q(closed_at__isnull=True), then=Value(current)), default=F('closed_at')
+            )
+        else:
+            values['closed_at'] = None
+    Issue.objects.filter(pk__in=[issue.pk for issue in issues]).update(**values)
+
+    transitions, events, moves, notify = [], [], [], []
+    buckets, open_deltas = Counter(), defaultdict(int)
+    for issue in issues:
+        old_key = clusters.map_key(issue)
+        old_status = issue.status
+        issue.updated_at = current
+        if priority is not None:
+            issue.priority = priority
+
+        if status is not None and old_status != status:
+            seconds = int((current - issue.status_changed_at).total_seconds())
+            transitions.append(IssueStatusTransition(
+                issue=issue, from_status=old_status, to_status=status,
+                changed_by=changed_by, changed_at=current, seconds_in_previous=seconds,
+            ))
+            buckets.update(sla.transition_buckets(
+                issue.issue_type_id, issue.priority, issue.created_at,
+                old_status, status, current, seconds
+            ))
+            open_deltas[issue.user_id] += user_stats.is_open(status) - user_stats.is_open(old_status)
+            if status in NOTIFY_STATUSES:
+                notify.append({
+                    'issue_id': str(issue.pk),
+                    'status': status,
+                    'exclude_user_id': str(changed_by.pk) if changed_by else None,
+                })
+            issue.status = status
+            issue.status_changed_at = current
+
+        kind = 'closed' if issue.status == 'closed' and old_status != 'closed' else 'updated'
+        events.append((kind, issue, issue_payload(issue)))
+        moves.append((old_key, clusters.map_key(issue)))
+
+    # bulk_create skips post_save, so nothing is counted twice
+    IssueStatusTransition.objects.bulk_create(transitions)
+    sla.add_counts(buckets)
+    record_events(events)
+    clusters.move_many(moves)
+    for user_id, delta in open_deltas.items():
+        user_stats.bump(user_id, open_issues=delta)
+    enqueue_many('issues.notify_voters', notify)
+    return len(transitions)
@@ -0,0 +1,174 @@
+"""
+Per-zoom grid aggregates for server-side map clustering.
+
+Every issue with a location is counted in one IssueMapCell per zoom level
+0..MAP_CLUSTER_MAX_ZOOM. Cells are Web Mercator tiles split into
+MAP_CLUSTER_CELLS_PER_TILE x MAP_CLUSTER_CELLS_PER_TILE squares, so clusters
+look evenly spaced on screen at every zoom. Each cell row keeps a count and
+coordinate sums per (status, priority), which makes the centroid and the
+breakdowns a single indexed range scan per viewport.
+
+The issues.signals receivers keep the cells current as issues are created,
+moved, re-prioritised, change status or are deleted;
+manage.py rebuild_issue_map_cells recomputes them from scratch.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import IssueMapCell
+
+MAX_LATITUDE = 85.05112878
+
+
+def max_zoom():
+    return getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 16)
+
+
+def cells_per_side(zoom):
+    return (2 ** zoom) * getattr(settings, 'MAP_CLUSTER_CELLS_PER_TILE', 4)
+
+
+def cell_for(zoom, lat, lng):
+    """
+    Quantizes a coordinate to the (x, y) grid cell at `zoom`; y grows southwards.
+    """
+    n = cells_per_side(zoom)
+    lat = max(min(float(lat), MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((float(lng) + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cell_rows(lat, lng, status, priority, delta):
+    lat, lng = float(lat), float(lng)
+    for zoom in range(max_zoom() + 1):
+        x, y = cell_for(zoom, lat, lng)
+        yield (zoom, x, y, status, priority, delta, delta * lat, delta * lng)
+
+
+def apply_deltas(rows):
+    """
+    Adds (zoom, x, y, status, priority, count, sum_lat, sum_lng) rows to the
+    cells with one INSERT ... ON CONFLICT DO UPDATE (PostgreSQL and SQLite).
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(IssueMapCell._meta.db_table)
+    key = ', '.join(qn(name) for name in ('zoom', 'cell_x', 'cell_y', 'status', 'priority'))
+    columns = f'{key}, {qn("count")}, {qn("sum_lat")}, {qn("sum_lng")}'
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    updates = ', '.join(
+        f'{qn(name)} = {table}.{qn(name)} + EXCLUDED.{qn(name)}'
+        for name in ('count', 'sum_lat', 'sum_lng')
+    )
+    sql = (
+        f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+        f'ON CONFLICT ({key}) DO UPDATE SET {updates}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def map_key(issue):
+    """
+    The part of an issue the map cells depend on, or None without a location.
+    """
+    if issue.location_latitude is None or issue.location_longitude is None:
+        return None
+    return (
+        float(issue.location_latitude), float(issue.location_longitude),
+        issue.status, issue.priority,
+    )
+
+
+def move(old_key, new_key):
+    """
+    Moves one issue between cells; either key may be None.
+    """
+    if old_key == new_key:
+        return
+    rows = []
+    if old_key is not None:
+        rows.extend(cell_rows(*old_key, -1))
+    if new_key is not None:
+        rows.extend(cell_rows(*new_key, 1))
+    apply_deltas(rows)
+
+
+def move_many(moves, batch_size=1000):
+    """
+    Applies many (old_key, new_key) moves, merging the rows that hit the
+    same cell (one INSERT may not update a row twice).
+    """
+    cells = defaultdict(lambda: [0, 0.0, 0.0])
+    for old_key, new_key in moves:
+        if old_key == new_key:
+            continue
+        for key, delta in ((old_key, -1), (new_key, 1)):
+            if key is None:
+                continue
+            for zoom, x, y, status, priority, count, sum_lat, sum_lng in cell_rows(*key, delta):
+                cell = cells[zoom, x, y, status, priority]
+                cell[0] += count
+                cell[1] += sum_lat
+                cell[2] += sum_lng
+
+    rows = [(*key, *values) for key, values in cells.items()]
+    for start in range(0, len(rows), batch_size):
+        apply_deltas(rows[start:start + batch_size])
+
+
+def clusters(zoom, bbox, statuses=None):
+    """
+    Cluster centroids with status/priority breakdowns inside
+    bbox = (min_lng, min_lat, max_lng, max_lat).
+    """
+    zoom = min(max(int(zoom), 0), max_zoom())
+    min_lng, min_lat, max_lng, max_lat = bbox
+    x0, y0 = cell_for(zoom, max_lat, min_lng)
+    x1, y1 = cell_for(zoom, min_lat, max_lng)
+
+    if x0 <= x1:
+        x_range = Q(cell_x__gte=x0, cell_x__lte=x1)
+    else:
+        # Viewport crosses the antimeridian
+        x_range = Q(cell_x__gte=x0) | Q(cell_x__lte=x1)
+
+    rows = IssueMapCell.objects.filter(
+        x_range, zoom=zoom, cell_y__gte=y0, cell_y__lte=y1, count__gt=0
+    )
+    if statuses:
+        rows = rows.filter(status__in=statuses)
+
+    grouped = defaultdict(lambda: {
+        'count': 0, 'sum_lat': 0.0, 'sum_lng': 0.0,
+        'status': defaultdict(int), 'priority': defaultdict(int),
+    })
+    for x, y, status, priority, count, sum_lat, sum_lng in rows.values_list(
+        'cell_x', 'cell_y', 'status', 'priority', 'count', 'sum_lat', 'sum_lng'
+    ):
+        cluster = grouped[x, y]
+        cluster['count'] += count
+        cluster['sum_lat'] += sum_lat
+        cluster['sum_lng'] += sum_lng
+        cluster['status'][status] += count
+        cluster['priority'][priority] += count
+
+    return [
+        {
+            'cell': [x, y],
+            'lat': round(cluster['sum_lat'] / cluster['count'], 6),
+            'lng': round(cluster['sum_lng'] / cluster['count'], 6),
+            'count': cluster['count'],
+            'status': dict(cluster['status']),
+            'priority': dict(cluster['priority']),
+        }
+        for (x, y), cluster in grouped.items()
+    ]
@@ -0,0 +1,359 @@
+"""
+Near-duplicate detection for newly reported issues.
+
+Each worker keeps a DuplicateIndex of recent open issues in memory:
+
+    * a grid of cells about DUPLICATE_RADIUS_METERS wide, for "what was
+      reported near here"
+    * MinHash signatures of the title/description shingles, banded into an
+      LSH table, for "what was reported with (almost) the same words"
+
+The index is built from the database in a background thread, started by
+the first lookup and again every DUPLICATE_INDEX_MAX_AGE seconds (which also
+drops issues that have aged out of the window); lookups keep using the old
+index until the new one is swapped in. In between, each lookup applies at
+most DUPLICATE_CATCH_UP_EVENTS events from the IssueEvent log, the same feed
+that drives the SSE stream and delta sync. While the index isn't built yet,
+or is further behind than that, lookups return no candidates rather than
+hold up the request.
+"""
+import hashlib
+import math
+import random
+import re
+import threading
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+
+from .events import settled_length
+from .models import Issue, IssueEvent
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+MERSENNE_PRIME = (1 << 61) - 1
+METERS_PER_DEGREE = 111320
+
+DONE_STATUSES = ('resolved', 'closed')
+
+# Fixed seed: signatures must not depend on the process that computed them
+_rng = random.Random(20240101)
+_PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+word_re = re.compile(r'\w+')
+
+logger = logging.getLogger(__name__)
+
+
+def shingles(text):
+    """
+    Character shingles of the normalized text, hashed to 64-bit integers.
+    """
+    text = ' '.join(word_re.findall((text or '').lower()))
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'big')
+        for gram in grams
+    }
+
+
+def minhash(text):
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return tuple(
+        min((a * h + b) % MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(left, right):
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    if left is None or right is None:
+        return 0.0
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+def band_keys(signature):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def distance_meters(lat1, lng1, lat2, lng2):
+    """
+    Haversine distance; exact enough at neighbourhood scale.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+def issue_text(title, description):
+    return f'{title or ""} {description or ""}'
+
+
+class DuplicateIndex:
+
+    def __init__(self):
+        # Guards the index; held for one lookup or one bounded catch-up
+        self.lock = threading.Lock()
+        # Held by the background rebuild
+        self.rebuild_lock = threading.Lock()
+        self.entries = {}
+        self.cells = defaultdict(set)
+        self.bands = defaultdict(set)
+        self.cursor = None
+        self.built_at = None
+
+    @property
+    def radius(self):
+        return getattr(settings, 'DUPLICATE_RADIUS_METERS', 50)
+
+    @property
+    def cell_degrees(self):
+        return self.radius / METERS_PER_DEGREE
+
+    def cell_for(self, lat, lng):
+        size = self.cell_degrees
+        return int(math.floor(lat / size)), int(math.floor(lng / size))
+
+    # Index maintenance
+
+    def add(self, issue_id, issue_type_id, lat, lng, title, description, status):
+        self.remove(issue_id)
+        signature = minhash(issue_text(title, description))
+        lat = float(lat) if lat is not None else None
+        lng = float(lng) if lng is not None else None
+        self.entries[issue_id] = {
+            'issue_type': issue_type_id,
+            'lat': lat,
+            'lng': lng,
+            'title': title,
+            'status': status,
+            'signature': signature,
+        }
+        if lat is not None and lng is not None:
+            self.cells[self.cell_for(lat, lng)].add(issue_id)
+        if signature is not None:
+            for key in band_keys(signature):
+                self.bands[key].add(issue_id)
+
+    def remove(self, issue_id):
+        entry = self.entries.pop(issue_id, None)
+        if entry is None:
+            return
+        if entry['lat'] is not None and entry['lng'] is not None:
+            cell = self.cell_for(entry['lat'], entry['lng'])
+            self.cells[cell].discard(issue_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        if entry['signature'] is not None:
+            for key in band_keys(entry['signature']):
+                self.bands[key].discard(issue_id)
+                if not self.bands[key]:
+                    del self.bands[key]
+
+    def _load(self, queryset):
+        cutoff = now() - timedelta(days=getattr(settings, 'DUPLICATE_WINDOW_DAYS', 90))
+        rows = queryset.values_list(
+            'id', 'issue_type_id', 'location_latitude', 'location_longitude',
+            'title', 'description', 'status', 'created_at'
+        )
+        seen = set()
+        for issue_id, type_id, lat, lng, title, description, status, created_at in rows:
+            seen.add(issue_id)
+            if status in DONE_STATUSES or created_at < cutoff:
+                self.remove(issue_id)
+            else:
+                self.add(issue_id, type_id, lat, lng, title, description, status)
+        return seen
+
+    def rebuild(self):
+        """
+        Builds a new index from the database and swaps it in.
+        """
+        cursor = IssueEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        cutoff = now() - timedelta(days=getattr(settings, 'DUPLICATE_WINDOW_DAYS', 90))
+
+        fresh = DuplicateIndex()
+        fresh._load(
+            Issue.objects.filter(created_at__gte=cutoff)
+            .exclude(status__in=DONE_STATUSES).order_by()
+        )
+        with self.lock:
+            self.entries, self.cells, self.bands = fresh.entries, fresh.cells, fresh.bands
+            # Changes made during the build are replayed from here
+            self.cursor = cursor
+            self.built_at = time.monotonic()
+
+    def start_rebuild(self):
+        """
+        Rebuilds in a background thread (right here if DUPLICATE_INDEX_BACKGROUND
+        is off), unless a rebuild is running already.
+        """
+        if not self.rebuild_lock.acquire(blocking=False):
+            return
+        if not getattr(settings, 'DUPLICATE_INDEX_BACKGROUND', True):
+            try:
+                self.rebuild()
+            finally:
+                self.rebuild_lock.release()
+            return
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception('Rebuilding the duplicate index failed')
+            finally:
+                connection.close()
+                self.rebuild_lock.release()
+
+        threading.Thread(target=run, name='duplicate-index', daemon=True).start()
+
+    def catch_up(self, limit=None):
+        """
+        Applies up to `limit` issue changes recorded since the last seen
+        event; returns False if there are more to apply.
+        """
+        limit = limit or getattr(settings, 'DUPLICATE_CATCH_UP_EVENTS', 500)
+        # Vote events are read too, so a gap in the ids means an uncommitted event
+        rows = list(
+            IssueEvent.objects.filter(id__gt=self.cursor)
+            .order_by('id').values_list('id', 'created_at', 'issue_id', 'kind')[:limit]
+        )
+        events = rows[:settled_length((row[:2] for row in rows), self.cursor)]
+        if not events:
+            return True
+
+        changed, deleted = set(), set()
+        for _, _, issue_id, kind in events:
+            if kind == 'votes':
+                continue
+            if kind == 'deleted':
+                deleted.add(issue_id)
+                changed.discard(issue_id)
+            else:
+                changed.add(issue_id)
+                deleted.discard(issue_id)
+
+        for issue_id in deleted:
+            self.remove(issue_id)
+        if changed:
+            found = self._load(Issue.objects.filter(id__in=changed).order_by())
+            for issue_id in changed - found:
+                self.remove(issue_id)
+        self.cursor = events[-1][0]
+        # Stopped at a gap: as current as it can be for now
+        return len(rows) < limit or len(events) < len(rows)
+
+    def refresh(self):
+        """
+        Brings the index up to date as far as one lookup may; returns False
+        if it can't be used yet.
+        """
+        max_age = getattr(settings, 'DUPLICATE_INDEX_MAX_AGE', 86400)
+        if self.built_at is None or time.monotonic() - self.built_at > max_age:
+            self.start_rebuild()
+        if self.built_at is None:
+            return False
+        with self.lock:
+            if self.catch_up():
+                return True
+        # Far behind (a bulk change): start over rather than replay it all
+        self.start_rebuild()
+        return False
+
+    # Lookups
+
+    def _nearby(self, lat, lng):
+        row, col = self.cell_for(lat, lng)
+        # Longitude cells shrink away from the equator
+        span = math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))
+        ids = set()
+        for d_row in (-1, 0, 1):
+            for d_col in range(-span, span + 1):
+                ids |= self.cells.get((row + d_row, col + d_col), set())
+        return ids
+
+    def candidates(self, title, description, lat=None, lng=None, issue_type=None, exclude=None):
+        """
+        Returns open issues likely to describe the same problem, best first.
+        """
+        budget = getattr(settings, 'DUPLICATE_CHECK_BUDGET_MS', 50) / 1000
+        min_score = getattr(settings, 'DUPLICATE_MIN_SCORE', 0.35)
+        limit = getattr(settings, 'DUPLICATE_MAX_CANDIDATES', 5)
+        started = time.monotonic()
+
+        lat = float(lat) if lat is not None else None
+        lng = float(lng) if lng is not None else None
+        signature = minhash(issue_text(title, description))
+
+        if not self.refresh():
+            return []
+
+        with self.lock:
+            ids = set()
+            if lat is not None and lng is not None:
+                ids |= self._nearby(lat, lng)
+            if signature is not None:
+                for key in band_keys(signature):
+                    ids |= self.bands.get(key, set())
+            ids.discard(exclude)
+
+            results = []
+            for issue_id in ids:
+                if time.monotonic() - started > budget:
+                    break
+                entry = self.entries[issue_id]
+
+                distance = None
+                if None not in (lat, lng, entry['lat'], entry['lng']):
+                    distance = distance_meters(lat, lng, entry['lat'], entry['lng'])
+                    if distance > self.radius:
+                        # Same words, different place: a different pothole
+                        continue
+
+                text_score = similarity(signature, entry['signature'])
+                if distance is None:
+                    score = text_score
+                else:
+                    score = 0.6 * text_score + 0.4 * (1 - distance / self.radius)
+                if issue_type is not None and entry['issue_type'] == issue_type:
+                    score += 0.1
+                if score < min_score:
+                    continue
+
+                results.append({
+                    'id': str(issue_id),
+                    'title': entry['title'],
+                    'status': entry['status'],
+                    'distance_m': None if distance is None else round(distance, 1),
+                    'similarity': round(text_score, 2),
+                    'score': round(min(score, 1.0), 2),
+                })
+
+        results.sort(key=lambda item: item['score'], reverse=True)
+        return results[:limit]
+
+
+duplicate_index = DuplicateIndex()
+
+
+def find_duplicates(title, description, lat=None, lng=None, issue_type=None, exclude=None):
+    return duplicate_index.candidates(title, description, lat, lng, issue_type, exclude)
@@ -0,0 +1,329 @@
+"""
+Issue change events: recording (IssueEvent rows) and in-process fan-out to
+Server-Sent Events subscribers.
+
+Each worker process has one EventBroadcaster. Events written by this
+process are pushed to local subscribers as soon as the transaction commits;
+a single poller task per process reads IssueEvent rows written by other
+workers. Vote events are coalesced per issue over SSE_VOTE_COALESCE_SECONDS,
+so a burst of votes becomes one update carrying the summed score delta.
+Idle subscribers are just an asyncio.Queue each.
+
+Every reader that resumes from "the last event id I saw" (the SSE poller,
+delta sync, the duplicate index) only moves past ids whose events have
+settled; see settled_length().
+"""
+import asyncio
+import base64
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import IssueEvent
+
+
+def event_dict(event):
+    return {
+        'id': event.id,
+        'kind': event.kind,
+        'issue': str(event.issue_id),
+        'issue_type': event.issue_type_id,
+        'lat': float(event.location_latitude) if event.location_latitude is not None else None,
+        'lng': float(event.location_longitude) if event.location_longitude is not None else None,
+        'data': event.payload,
+    }
+
+
+def issue_payload(issue):
+    return {
+        'title': issue.title,
+        'status': issue.status,
+        'priority': issue.priority,
+        'location_latitude': None if issue.location_latitude is None else str(issue.location_latitude),
+        'location_longitude': None if issue.location_longitude is None else str(issue.location_longitude),
+        'updated_at': issue.updated_at.isoformat() if issue.updated_at else None,
+    }
+
+
+def record_event(kind, issue, payload):
+    """
+    Writes an IssueEvent and publishes it locally once the transaction commits.
+    """
+    event = IssueEvent.objects.create(
+        issue_id=issue.pk,
+        kind=kind,
+        issue_type_id=issue.issue_type_id,
+        location_latitude=issue.location_latitude,
+        location_longitude=issue.location_longitude,
+        payload=payload,
+    )
+    data = event_dict(event)
+    transaction.on_commit(lambda: broadcaster.publish_threadsafe(data))
+    return event
+
+
+def record_events(events):
+    """
+    record_event() for many (kind, issue, payload) triples, with one INSERT.
+    """
+    created = IssueEvent.objects.bulk_create([
+        IssueEvent(
+            issue_id=issue.pk,
+            kind=kind,
+            issue_type_id=issue.issue_type_id,
+            location_latitude=issue.location_latitude,
+            location_longitude=issue.location_longitude,
+            payload=payload,
+        )
+        for kind, issue, payload in events
+    ])
+    data = [event_dict(event) for event in created]
+
+    def publish():
+        for item in data:
+            broadcaster.publish_threadsafe(item)
+
+    transaction.on_commit(publish)
+    return created
+
+
+def settled_length(rows, after_id):
+    """
+    How many of `rows`, (id, created_at) pairs read in id order after
+    `after_id`, come before the first gap in the ids that may still fill.
+
+    Ids are taken when an event is inserted, not when it commits, so a
+    transaction holding id 5 can commit after id 6 has been read; a reader
+    that moved its cursor to 6 would never see 5. Readers stop before a gap
+    until the event after it is ISSUE_EVENT_COMMIT_LAG seconds old, after
+    which the gap is taken to be a rolled back insert.
+    """
+    cutoff = now() - timedelta(seconds=getattr(settings, 'ISSUE_EVENT_COMMIT_LAG', 30))
+    expected = after_id + 1
+    count = 0
+    for event_id, created_at in rows:
+        if event_id != expected and created_at > cutoff:
+            break
+        expected = event_id + 1
+        count += 1
+    return count
+
+
+def fetch_events(after_id, limit=500):
+    events = list(IssueEvent.objects.filter(id__gt=after_id).order_by('id')[:limit])
+    events = events[:settled_length(((event.id, event.created_at) for event in events), after_id)]
+    return [event_dict(event) for event in events]
+
+
+def latest_event_id():
+    return IssueEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def encode_sync_token(event_id):
+    """
+    Opaque continuation token for the delta sync endpoint.
+    """
+    raw = f'1:{event_id}:{int(time.time())}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_sync_token(token):
+    """
+    Returns (event_id, issued_at) or raises ValueError for a malformed token.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        version, event_id, issued_at = raw.split(':')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Malformed sync token')
+    if version != '1':
+        raise ValueError('Unsupported sync token')
+    return int(event_id), int(issued_at)
+
+
+def changes_since(after_id, limit):
+    """
+    Reads up to `limit` settled events after `after_id` along the primary key.
+
+    Returns (changed issue ids, deleted issue ids, last event id, has_more);
+    the cost depends on the number of events, not the size of the issue table.
+    """
+    events = list(
+        IssueEvent.objects.filter(id__gt=after_id).order_by('id')
+        .values_list('id', 'created_at', 'issue_id', 'kind')[:limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    settled = settled_length((row[:2] for row in events), after_id)
+    if settled < len(events):
+        # The rest is read again once the gap has settled
+        has_more = False
+        events = events[:settled]
+
+    changed, deleted = {}, set()
+    for _, _, issue_id, kind in events:
+        if kind == 'deleted':
+            # Created and deleted within the window: only the tombstone matters
+            deleted.add(issue_id)
+            changed.pop(issue_id, None)
+        elif issue_id not in deleted:
+            changed[issue_id] = True
+
+    last_id = events[-1][0] if events else after_id
+    return list(changed), sorted(deleted, key=str), last_id, has_more
+
+
+class EventFilter:
+    """
+    Matches events against ?issue_type= and ?bbox=min_lng,min_lat,max_lng,max_lat.
+    """
+    def __init__(self, issue_types=None, bbox=None):
+        self.issue_types = issue_types
+        self.bbox = bbox
+
+    @classmethod
+    def from_query(cls, params):
+        issue_types = None
+        if params.get('issue_type'):
+            issue_types = {int(value) for value in params['issue_type'].split(',')}
+
+        bbox = None
+        if params.get('bbox'):
+            bbox = [float(value) for value in params['bbox'].split(',')]
+            if len(bbox) != 4:
+                raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat')
+        return cls(issue_types, bbox)
+
+    def matches(self, event):
+        if self.issue_types is not None and event['issue_type'] not in self.issue_types:
+            return False
+        if self.bbox is not None:
+            if event['lat'] is None or event['lng'] is None:
+                return False
+            min_lng, min_lat, max_lng, max_lat = self.bbox
+            if not (min_lng <= event['lng'] <= max_lng and min_lat <= event['lat'] <= max_lat):
+                return False
+        return True
+
+
+class Subscription:
+    def __init__(self, event_filter, max_queue):
+        self.filter = event_filter
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def offer(self, event):
+        if self.closed or not self.filter.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up; the client reconnects with Last-Event-ID
+            self.closed = True
+
+
+class EventBroadcaster:
+
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+        self.poller = None
+        self.cursor = None
+        self.pending_votes = {}
+        self.flush_handle = None
+        self._seen = deque(maxlen=5000)
+        self._seen_ids = set()
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'SSE_POLL_INTERVAL', 1.0)
+
+    @property
+    def coalesce_seconds(self):
+        return getattr(settings, 'SSE_VOTE_COALESCE_SECONDS', 1.0)
+
+    async def subscribe(self, event_filter):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # First subscriber on this event loop (or the loop was replaced)
+            self.loop = loop
+            self.poller = None
+            self.pending_votes.clear()
+            self.flush_handle = None
+
+        subscription = Subscription(event_filter, getattr(settings, 'SSE_MAX_QUEUE', 1000))
+        self.subscribers.add(subscription)
+
+        if self.poller is None or self.poller.done():
+            # Start from "now"; reconnecting clients replay via Last-Event-ID
+            self.cursor = await sync_to_async(latest_event_id)()
+            self.poller = loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        self.subscribers.discard(subscription)
+
+    def publish_threadsafe(self, event):
+        """
+        Called from sync code after commit; hands the event to the loop.
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscribers:
+            return
+        loop.call_soon_threadsafe(self.dispatch, event)
+
+    def _is_new(self, event_id):
+        # Local events come back again through the poller
+        if event_id in self._seen_ids:
+            return False
+        if len(self._seen) == self._seen.maxlen:
+            self._seen_ids.discard(self._seen[0])
+        self._seen.append(event_id)
+        self._seen_ids.add(event_id)
+        return True
+
+    def dispatch(self, event):
+        if not self._is_new(event['id']):
+            return
+
+        if event['kind'] == 'votes':
+            self._coalesce(event)
+            return
+
+        for subscription in list(self.subscribers):
+            subscription.offer(event)
+
+    def _coalesce(self, event):
+        pending = self.pending_votes.get(event['issue'])
+        if pending is not None:
+            delta = pending['data'].get('delta', 0) + event['data'].get('delta', 0)
+            event = {**event, 'data': {**event['data'], 'delta': delta}}
+        self.pending_votes[event['issue']] = event
+
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.coalesce_seconds, self.flush_votes)
+
+    def flush_votes(self):
+        self.flush_handle = None
+        pending, self.pending_votes = self.pending_votes, {}
+        for event in pending.values():
+            for subscription in list(self.subscribers):
+                subscription.offer(event)
+
+    async def _poll(self):
+        # Picks up events written by other worker processes
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval)
+            events = await sync_to_async(fetch_events)(self.cursor)
+            for event in events:
+                self.cursor = max(self.cursor, event['id'])
+                self.dispatch(event)
+
+
+broadcaster = EventBroadcaster()
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from issues.archive import archive_batch
+
+
+class Command(BaseCommand):
+    help = 'Moves issues resolved/closed more than ISSUE_ARCHIVE_AFTER_DAYS ago into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'ISSUE_ARCHIVE_AFTER_DAYS', 365),
+            help='Archive issues resolved or closed longer ago than this'
+        )
+        parser.add_argument('--batch-size', type=int, default=200, help='Issues per transaction')
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['days'])
+        total = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            archived = archive_batch(cutoff, options['batch_size'])
+            if not archived:
+                break
+            total += archived
+            batches += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{total} issue(s) archived'))
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.issues.fast_serializers import IssueValuesSerializer
+from api.issues.serializers import IssueSerializer
+from issues.models import Issue, IssueType
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compares CPU time per item of IssueSerializer and the values() fast path for one issue page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='Issues per page')
+        parser.add_argument('--rounds', type=int, default=20, help='Timed repetitions per serializer')
+        parser.add_argument('--fields', default='', help='Optional ?fields= value')
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Create --items throwaway issues inside a rolled back transaction'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['items'])
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        user = User.objects.create_user(
+            username='benchmark', email='benchmark@example.com',
+            full_name='Benchmark', password='benchmark-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Benchmark')
+        Issue.objects.bulk_create([
+            Issue(
+                user=user, issue_type=issue_type,
+                title=f'Benchmark issue {i}', description='Lorem ipsum ' * 20,
+                location_latitude='16.84090000', location_longitude='96.17350000',
+            )
+            for i in range(count)
+        ])
+
+    def run(self, options):
+        url = '/api/v1/issues/'
+        if options['fields']:
+            url += f"?fields={options['fields']}"
+        request = Request(RequestFactory().get(url))
+        context = {'request': request}
+        renderer = JSONRenderer()
+
+        queryset = Issue.objects.order_by('-created_at')[:options['items']]
+        instances = list(queryset.select_related('user', 'issue_type').prefetch_related('attachments'))
+        fast = IssueValuesSerializer(context=context)
+        rows = list(queryset.values(*fast.columns))
+        if not rows:
+            self.stderr.write('No issues to serialize; use --seed.')
+            return
+
+        def drf():
+            return renderer.render(IssueSerializer(instances, many=True, context=context).data)
+
+        def values():
+            return renderer.render(IssueValuesSerializer(context=context).to_representation(rows))
+
+        if drf() != values():
+            self.stderr.write(self.style.WARNING('Outputs differ!'))
+
+        for name, func in (('IssueSerializer', drf), ('IssueValuesSerializer', values)):
+            start = time.process_time()
+            for _ in range(options['rounds']):
+                func()
+            elapsed = time.process_time() - start
+            per_item = elapsed / (options['rounds'] * len(rows)) * 1e6
+            self.stdout.write(f'{name:<24} {per_item:8.1f} us/item (CPU, includes queries)')
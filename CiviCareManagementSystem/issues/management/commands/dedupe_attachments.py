@@ -0,0 +1,93 @@
+import posixpath
+
+from django.core.management.base import BaseCommand
+
+from issues.models import ArchivedIssueAttachment, AttachmentBlob, IssueAttachment
+from issues.storage import digest_from_name, get_attachment_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves existing issue attachments into content-addressed storage so '
+        'identical files are stored once and shared through AttachmentBlob.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Also delete files under issue_attachments/ that no attachment, archived '
+                 'attachment or pending upload references'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = get_attachment_storage()
+        moved = missing = 0
+        replaced = set()
+
+        for attachment in IssueAttachment.objects.order_by('pk').iterator():
+            name = attachment.file.name
+            if digest_from_name(name):
+                if attachment.blob_id is None and not dry_run:
+                    # Links the blob (see issues.signals)
+                    attachment.save(update_fields=['file'])
+                continue
+
+            if not storage.exists(name):
+                self.stderr.write(f'Missing file for attachment {attachment.pk}: {name}')
+                missing += 1
+                continue
+
+            moved += 1
+            if dry_run:
+                continue
+
+            # Re-saving through the storage hashes the file and stores it once
+            with storage.open(name) as source:
+                attachment.file.name = storage.save(name, source)
+            attachment.save(update_fields=['file'])
+            replaced.add(name)
+
+        freed = 0
+        referenced = self.referenced_files()
+        for name in replaced - referenced:
+            freed += storage.size(name)
+            storage.delete(name)
+
+        orphans = self.find_orphans(storage, referenced)
+        if options['delete_orphans'] and not dry_run:
+            for name in orphans:
+                freed += storage.size(name)
+                storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} attachment(s) moved to content-addressed storage, '
+            f'{missing} missing, {len(orphans)} orphaned file(s), {freed} bytes freed'
+            + (' (dry run)' if dry_run else '')
+        ))
+
+    def referenced_files(self):
+        # Blobs include presigned uploads that aren't confirmed yet, which
+        # gc_attachment_blobs collects once their grace period is over
+        referenced = set(AttachmentBlob.objects.values_list('file', flat=True))
+        referenced.update(IssueAttachment.objects.values_list('file', flat=True))
+        referenced.update(ArchivedIssueAttachment.objects.values_list('file', flat=True))
+        return referenced
+
+    def find_orphans(self, storage, referenced):
+        # listdir() rather than os.walk, so this also works on object stores
+        orphans = []
+        pending = ['issue_attachments']
+        while pending:
+            directory = pending.pop()
+            try:
+                subdirectories, files = storage.listdir(directory)
+            except FileNotFoundError:
+                continue
+            pending.extend(posixpath.join(directory, name) for name in subdirectories)
+            for filename in files:
+                name = posixpath.join(directory, filename)
+                if name not in referenced:
+                    orphans.append(name)
+        return orphans
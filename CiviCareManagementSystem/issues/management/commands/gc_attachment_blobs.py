@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from issues.models import ArchivedIssueAttachment, AttachmentBlob, IssueAttachment
+from issues.storage import get_attachment_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes attachment blobs (rows and files) that no IssueAttachment references any more, '
+        'including direct uploads that were never confirmed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Only collect blobs unreferenced for at least this long'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(minutes=options['grace_minutes'])
+        candidates = AttachmentBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+
+        deleted = freed = 0
+        for blob_id in candidates.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                blob = AttachmentBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+                # An upload may have reused the content since the blob was listed
+                if (
+                    blob is None
+                    or IssueAttachment.objects.filter(file=blob.file).exists()
+                    or ArchivedIssueAttachment.objects.filter(file=blob.file).exists()
+                ):
+                    continue
+
+                deleted += 1
+                freed += blob.size
+                if options['dry_run']:
+                    continue
+
+                blob.delete()
+                transaction.on_commit(lambda name=blob.file: get_attachment_storage().delete(name))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} blob(s) collected, {freed} bytes freed'
+            + (' (dry run)' if options['dry_run'] else '')
+        ))
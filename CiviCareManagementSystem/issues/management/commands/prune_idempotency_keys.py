@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from issues.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired Idempotency-Key responses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        current = now()
+        total = 0
+        while True:
+            keys = list(
+                IdempotencyKey.objects.filter(expires_at__lte=current)
+                .order_by('expires_at').values_list('key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            total += IdempotencyKey.objects.filter(key__in=keys).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'{total} idempotency key(s) pruned'))
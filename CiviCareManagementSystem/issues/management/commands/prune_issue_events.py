@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from issues.models import IssueEvent
+
+
+class Command(BaseCommand):
+    help = 'Deletes IssueEvent rows older than ISSUE_EVENT_RETENTION_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'ISSUE_EVENT_RETENTION_DAYS', 30),
+            help='Keep events newer than this many days'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['days'])
+        total = 0
+        while True:
+            ids = list(
+                IssueEvent.objects.filter(created_at__lt=cutoff)
+                .order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            total += IssueEvent.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'{total} event(s) pruned'))
@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from issues.clusters import cell_rows
+from issues.models import Issue, IssueMapCell
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the map clustering grid cells from the issue table.'
+
+    def handle(self, *args, **options):
+        cells = defaultdict(lambda: [0, 0.0, 0.0])
+        issues = Issue.objects.filter(
+            location_latitude__isnull=False, location_longitude__isnull=False
+        ).values_list('location_latitude', 'location_longitude', 'status', 'priority')
+
+        for lat, lng, status, priority in issues.iterator(chunk_size=5000):
+            for zoom, x, y, status, priority, count, sum_lat, sum_lng in cell_rows(lat, lng, status, priority, 1):
+                cell = cells[zoom, x, y, status, priority]
+                cell[0] += count
+                cell[1] += sum_lat
+                cell[2] += sum_lng
+
+        with transaction.atomic():
+            IssueMapCell.objects.all().delete()
+            IssueMapCell.objects.bulk_create(
+                [
+                    IssueMapCell(
+                        zoom=zoom, cell_x=x, cell_y=y, status=status, priority=priority,
+                        count=count, sum_lat=sum_lat, sum_lng=sum_lng
+                    )
+                    for (zoom, x, y, status, priority), (count, sum_lat, sum_lng) in cells.items()
+                ],
+                batch_size=1000
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'{len(cells)} map cell(s) rebuilt'))
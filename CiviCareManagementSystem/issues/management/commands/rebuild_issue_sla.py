@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from issues.models import ArchivedIssue, IssueDurationHistogram, IssueStatusTransition
+from issues.sla import transition_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the SLA histograms from the issue status transition log '
+        'and the history kept with archived issues.'
+    )
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        transitions = IssueStatusTransition.objects.values_list(
+            'issue__issue_type_id', 'issue__priority', 'issue__created_at',
+            'from_status', 'to_status', 'changed_at', 'seconds_in_previous'
+        ).iterator(chunk_size=5000)
+
+        for row in transitions:
+            counts.update(transition_buckets(*row))
+
+        # Archiving deletes the live transitions; their JSON stays in ArchivedIssue
+        archived = ArchivedIssue.objects.values_list(
+            'issue_type_id', 'priority', 'created_at', 'data__history'
+        ).iterator(chunk_size=1000)
+        for issue_type_id, priority, created_at, history in archived:
+            for transition in history or []:
+                counts.update(transition_buckets(
+                    issue_type_id, priority, created_at, transition['from_status'], transition['to_status'],
+                    parse_datetime(transition['changed_at']), transition['seconds_in_previous']
+                ))
+
+        with transaction.atomic():
+            IssueDurationHistogram.objects.all().delete()
+            IssueDurationHistogram.objects.bulk_create(
+                [
+                    IssueDurationHistogram(
+                        issue_type_id=issue_type_id, priority=priority, metric=metric,
+                        status=status, bucket=bucket, count=count
+                    )
+                    for (issue_type_id, priority, metric, status, bucket), count in counts.items()
+                ],
+                batch_size=1000
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'{len(counts)} histogram bucket(s) rebuilt'))
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils.timezone import now
+
+from issues.models import ArchivedIssue, ArchivedVote, Issue, Vote
+from issues.user_stats import COUNTERS, DONE_STATUSES, compute
+from users.models import UserStats
+
+
+def count_by_user(queryset):
+    return Counter(dict(queryset.values_list('user_id').annotate(n=Count('pk')).order_by()))
+
+
+class Command(BaseCommand):
+    help = 'Recounts the per-user activity counters and fixes any that have drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report mismatches; exits with an error if there are any'
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            'issues_reported': count_by_user(Issue.objects) + count_by_user(ArchivedIssue.objects),
+            'open_issues': count_by_user(Issue.objects.exclude(status__in=DONE_STATUSES)),
+            'votes_cast': (
+                count_by_user(Vote.objects.exclude(value=0))
+                + count_by_user(ArchivedVote.objects.exclude(value=0))
+            ),
+        }
+        stored = {row[0]: dict(zip(COUNTERS, row[1:])) for row in UserStats.objects.values_list('user_id', *COUNTERS)}
+
+        mismatched = []
+        for user_id in set(stored).union(*expected.values()):
+            counts = {name: expected[name][user_id] for name in COUNTERS}
+            if stored.get(user_id) != counts:
+                mismatched.append((user_id, stored.get(user_id), counts))
+
+        if options['verify']:
+            for user_id, found, counts in mismatched:
+                self.stdout.write(f'{user_id}: stored {found}, counted {counts}')
+            if mismatched:
+                raise CommandError(f'{len(mismatched)} user(s) with wrong counters')
+            self.stdout.write(self.style.SUCCESS(f'{len(stored)} user stats row(s) verified'))
+            return
+
+        for user_id, _, _ in mismatched:
+            with transaction.atomic():
+                # Recount under the row lock, so concurrent updates are not lost
+                locked = UserStats.objects.select_for_update().filter(user_id=user_id).exists()
+                counts = compute(user_id)
+                if locked:
+                    UserStats.objects.filter(user_id=user_id).update(updated_at=now(), **counts)
+                else:
+                    UserStats.objects.create(user_id=user_id, **counts)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(mismatched)} user stats row(s) rebuilt'))
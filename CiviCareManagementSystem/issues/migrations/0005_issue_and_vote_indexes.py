@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0004_remove_vote_downvote_remove_vote_upvote_vote_value'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['-created_at'], name='issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['updated_at'], name='issue_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['status', '-created_at'], name='issue_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['priority', '-created_at'], name='issue_priority_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['user', '-created_at'], name='issue_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['issue_type', 'status', '-created_at'], name='issue_type_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['user', '-created_at'], name='vote_user_created_idx'),
+        ),
+    ]
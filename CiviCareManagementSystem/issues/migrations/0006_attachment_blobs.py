@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:30
+
+import django.db.models.deletion
+import django.utils.timezone
+import issues.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0005_issue_and_vote_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.CharField(max_length=100, unique=True)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='issueattachment',
+            name='file',
+            field=models.FileField(storage=issues.storage.get_attachment_storage, upload_to='issue_attachments/'),
+        ),
+        migrations.AddField(
+            model_name='issueattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='issues.attachmentblob'),
+        ),
+    ]
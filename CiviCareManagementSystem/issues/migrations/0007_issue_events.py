@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0006_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('issue_id', models.UUIDField(db_index=True)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('closed', 'Closed'), ('deleted', 'Deleted'), ('votes', 'Votes')], max_length=20)),
+                ('issue_type_id', models.BigIntegerField(blank=True, null=True)),
+                ('location_latitude', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('location_longitude', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_status_changed_at(apps, schema_editor):
+    Issue = apps.get_model('issues', 'Issue')
+    Issue.objects.update(status_changed_at=F('created_at'))
+    # close() never set closed_at; the last update is the best estimate
+    Issue.objects.filter(status='closed', closed_at__isnull=True).update(closed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0007_issue_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='status_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_status_changed_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='IssueDurationHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20)),
+                ('metric', models.CharField(choices=[('in_status', 'Time in status'), ('resolution', 'Time to resolution')], max_length=20)),
+                ('status', models.CharField(blank=True, default='', max_length=20)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('issue_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='issues.issuetype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('issue_type', 'priority', 'metric', 'status', 'bucket'), name='issue_histogram_bucket_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='IssueStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20, null=True)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seconds_in_previous', models.BigIntegerField(blank=True, null=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_transitions', to='issues.issue')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['issue', 'changed_at'], name='transition_issue_changed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:41
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def build_map_cells(apps, schema_editor):
+    from issues.clusters import cell_rows
+
+    Issue = apps.get_model('issues', 'Issue')
+    IssueMapCell = apps.get_model('issues', 'IssueMapCell')
+    cells = defaultdict(lambda: [0, 0.0, 0.0])
+    issues = Issue.objects.filter(
+        location_latitude__isnull=False, location_longitude__isnull=False
+    ).values_list('location_latitude', 'location_longitude', 'status', 'priority')
+    for lat, lng, status, priority in issues.iterator():
+        for zoom, x, y, status, priority, count, sum_lat, sum_lng in cell_rows(lat, lng, status, priority, 1):
+            cell = cells[zoom, x, y, status, priority]
+            cell[0] += count
+            cell[1] += sum_lat
+            cell[2] += sum_lng
+    IssueMapCell.objects.bulk_create(
+        [
+            IssueMapCell(
+                zoom=zoom, cell_x=x, cell_y=y, status=status, priority=priority,
+                count=count, sum_lat=sum_lat, sum_lng=sum_lng
+            )
+            for (zoom, x, y, status, priority), (count, sum_lat, sum_lng) in cells.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0008_status_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueMapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('sum_lat', models.FloatField(default=0)),
+                ('sum_lng', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'cell_x', 'cell_y', 'status', 'priority'), name='issue_map_cell_unique')],
+            },
+        ),
+        migrations.RunPython(build_map_cells, migrations.RunPython.noop),
+    ]
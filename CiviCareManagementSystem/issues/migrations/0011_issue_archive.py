@@ -0,0 +1,84 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:55
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_done_status_changed_at(apps, schema_editor):
+    # 0008 started every issue's status_changed_at at created_at, which would
+    # make old issues closed recently archivable at once. Done issues get
+    # their last transition instead, or their last update if they have none.
+    Issue = apps.get_model('issues', 'Issue')
+    IssueStatusTransition = apps.get_model('issues', 'IssueStatusTransition')
+    latest = (
+        IssueStatusTransition.objects.filter(issue=OuterRef('pk'))
+        .order_by('-changed_at').values('changed_at')[:1]
+    )
+    Issue.objects.filter(status__in=['resolved', 'closed']).update(
+        status_changed_at=Coalesce(Subquery(latest), F('updated_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0010_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_done_status_changed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('status__in', ['resolved', 'closed'])), fields=['status_changed_at'], name='issue_done_changed_idx'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssue',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('issue_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_issues', to='issues.issuetype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_issues', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssueAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.CharField(db_index=True, max_length=255)),
+                ('file_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('blob', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_attachments', to='issues.attachmentblob')),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='issues.archivedissue')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedVote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.IntegerField(choices=[(1, 'UpVote'), (-1, 'DownVote'), (0, 'No options')], default=0)),
+                ('created_at', models.DateTimeField()),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='issues.archivedissue')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_votes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedissue',
+            index=models.Index(fields=['user', '-created_at'], name='archived_issue_user_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedvote',
+            unique_together={('issue', 'user')},
+        ),
+    ]
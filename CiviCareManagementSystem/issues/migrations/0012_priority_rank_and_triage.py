@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def fill_rank_and_score(apps, schema_editor):
+    Issue = apps.get_model('issues', 'Issue')
+    Vote = apps.get_model('issues', 'Vote')
+    ranks = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+    score = (
+        Vote.objects.filter(issue=OuterRef('pk')).order_by()
+        .values('issue').annotate(total=Sum('value')).values('total')
+    )
+    Issue.objects.update(
+        priority_rank=Case(
+            *[When(priority=priority, then=Value(rank)) for priority, rank in ranks.items()],
+            default=Value(0)
+        ),
+        score=Coalesce(Subquery(score, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0011_issue_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='score',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rank_and_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['priority_rank', 'created_at'], name='issue_priority_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'open'])), fields=['-priority_rank', '-score', 'created_at'], include=('id', 'title', 'status', 'priority', 'issue_type', 'claimed_by', 'claimed_until'), name='issue_triage_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0012_priority_rank_and_triage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 import uuid
 from django.utils.timezone import now
 from users.models import User
+from .storage import get_attachment_storage
 
 class IssueType(models.Model):
     name = models.CharField(max_length=100)
@@ -11,6 +13,11 @@ class IssueType(models.Model):
     def __str__(self):
         return self.name
 
+class VersionConflict(Exception):
+    """
+    The issue was changed by someone else since it was loaded.
+    """
+
 class Issue(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -45,6 +52,10 @@ class Issue(models.Model):
         ('critical', 'Critical'),
     )
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='medium')
+    PRIORITY_RANKS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+    # Kept in step with priority by save(), so "most urgent first" sorts
+    # numerically and can use an index
+    priority_rank = models.PositiveSmallIntegerField(default=2, editable=False)
 
     location_latitude = models.DecimalField(
         max_digits=10, decimal_places=8, null=True, blank=True
@@ -57,10 +68,265 @@ class Issue(models.Model):
     created_at = models.DateTimeField(default=now)
     updated_at = models.DateTimeField(auto_now=True)
     closed_at = models.DateTimeField(null=True, blank=True)
+    status_changed_at = models.DateTimeField(default=now)
+
+    # Optimistic concurrency: bumped by every save() (see Issue.save)
+    version = models.PositiveIntegerField(default=1)
+
+    # Upvotes minus downvotes, maintained by issues.signals
+    score = models.IntegerField(default=0, editable=False)
+
+    # Triage queue claim (issues/triage.py)
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    # Written only with QuerySet.update(), never by save() of a possibly
+    # stale instance
+    UPDATED_SEPARATELY = ('score', 'claimed_by', 'claimed_until')
+
+    class Meta:
+        # Composite indexes follow the IssueViewSet filters (status, priority,
+        # issue_type, user) combined with its default -created_at ordering.
+        indexes = [
+            models.Index(fields=['-created_at'], name='issue_created_idx'),
+            models.Index(fields=['updated_at'], name='issue_updated_idx'),
+            models.Index(fields=['status', '-created_at'], name='issue_status_created_idx'),
+            models.Index(fields=['priority', '-created_at'], name='issue_priority_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='issue_user_created_idx'),
+            models.Index(fields=['issue_type', 'status', '-created_at'], name='issue_type_status_created_idx'),
+            # ?ordering=priority / -priority
+            models.Index(fields=['priority_rank', 'created_at'], name='issue_priority_rank_idx'),
+            # Admin triage queue; covers its columns on PostgreSQL
+            models.Index(
+                fields=['-priority_rank', '-score', 'created_at'],
+                name='issue_triage_idx',
+                condition=models.Q(status__in=['pending', 'open']),
+                include=['id', 'title', 'status', 'priority', 'issue_type', 'claimed_by', 'claimed_until'],
+            ),
+            # issues.archive scan; only done issues are indexed
+            models.Index(
+                fields=['status_changed_at'],
+                name='issue_done_changed_idx',
+                condition=models.Q(status__in=['resolved', 'closed']),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Records a status transition (and keeps closed_at/status_changed_at in
+        step) in the same transaction as the row itself. Set `_changed_by`
+        on the instance to attribute the change to a user.
+
+        Updates of an existing row leave out UPDATED_SEPARATELY unless they
+        are named in update_fields, bump `version` and only apply if the row
+        still has the version this instance was loaded with; otherwise
+        VersionConflict is raised and nothing is written.
+        """
+        adding = self._state.adding
+        if 'priority' not in self.get_deferred_fields():
+            self.priority_rank = self.PRIORITY_RANKS.get(self.priority, 0)
+
+        update_fields = kwargs.get('update_fields')
+        if not adding and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            if update_fields is None:
+                update_fields = {
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                    and field.name not in self.UPDATED_SEPARATELY
+                }
+            else:
+                update_fields = set(update_fields)
+                if 'priority' in update_fields:
+                    update_fields.add('priority_rank')
+            if update_fields and 'version' not in deferred:
+                self._expected_version = self.version
+                self.version += 1
+                update_fields |= {'version', 'updated_at'}
+            kwargs['update_fields'] = update_fields
+
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                transition = self._status_transition(adding, kwargs)
+                super().save(*args, **kwargs)
+                if transition is not None:
+                    transition.save(using=kwargs.get('using'))
+        except VersionConflict:
+            self.version = self._expected_version
+            raise
+        finally:
+            self._expected_version = None
+
+    def _status_transition(self, adding, kwargs):
+        """
+        Returns the unsaved IssueStatusTransition for this save, or None, and
+        updates status_changed_at/closed_at (and kwargs['update_fields'])
+        to match. Runs inside the saving transaction.
+        """
+        update_fields = kwargs.get('update_fields')
+        if not adding and update_fields is not None and 'status' not in update_fields:
+            # The stored status doesn't change
+            return None
+
+        previous = None
+        if not adding:
+            # Set by issues.signals on load; None if status was deferred
+            previous = getattr(self, '_loaded_status', None)
+            if previous is None:
+                # self.status already holds the new value, so ask the row
+                previous = (
+                    Issue._base_manager.db_manager(kwargs.get('using')).select_for_update()
+                    .filter(pk=self.pk).values_list('status', flat=True).first()
+                )
+                # issue_saved also compares against it
+                self._loaded_status = previous
+            if previous == self.status:
+                return None
+
+        changed_at = now()
+        since = self.created_at if adding or previous is None else self.status_changed_at
+        transition = IssueStatusTransition(
+            issue=self,
+            from_status=previous,
+            to_status=self.status,
+            changed_by=getattr(self, '_changed_by', None),
+            changed_at=changed_at,
+            seconds_in_previous=None if previous is None else int((changed_at - since).total_seconds()),
+        )
+
+        self.status_changed_at = changed_at
+        if self.status == 'closed':
+            self.closed_at = self.closed_at or changed_at
+        elif previous == 'closed':
+            # Reopened
+            self.closed_at = None
+
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'status_changed_at', 'closed_at'}
+        return transition
+
+    def _do_update(self, base_qs, using, pk_val, *args, **kwargs):
+        # UPDATE ... WHERE id = %s AND version = %s
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, *args, **kwargs)
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, *args, **kwargs)
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise VersionConflict(f'Issue {pk_val} is no longer at version {expected}')
+        return updated
+
+class IssueStatusTransition(models.Model):
+    """
+    Append-only history of issue status changes, written by Issue.save().
+    """
+    issue = models.ForeignKey(
+        Issue,
+        on_delete=models.CASCADE,
+        related_name='status_transitions'
+    )
+    from_status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES, null=True, blank=True)
+    to_status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    changed_at = models.DateTimeField(default=now)
+    # Time spent in from_status; None for the initial status
+    seconds_in_previous = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', 'changed_at'], name='transition_issue_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.issue_id}: {self.from_status} -> {self.to_status}"
+
+class IssueDurationHistogram(models.Model):
+    """
+    Log-bucketed histograms of time-in-status and time-to-resolution per
+    issue type and priority, updated incrementally as transitions are
+    written (see issues/sla.py). Histograms merge by summing counts, so SLA
+    percentiles never need to scan the transition history.
+    """
+    METRIC_CHOICES = (
+        ('in_status', 'Time in status'),
+        ('resolution', 'Time to resolution'),
+    )
+    issue_type = models.ForeignKey(IssueType, on_delete=models.CASCADE, related_name='+')
+    priority = models.CharField(max_length=20, choices=Issue.PRIORITY_CHOICES)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    # Status the time was spent in; blank for resolution
+    status = models.CharField(max_length=20, blank=True, default='')
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issue_type', 'priority', 'metric', 'status', 'bucket'],
+                name='issue_histogram_bucket_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.status} [{self.bucket}] = {self.count}"
+
+class IssueMapCell(models.Model):
+    """
+    Issue counts per map grid cell, zoom level, status and priority, kept
+    current incrementally (see issues/clusters.py).
+    """
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Issue.PRIORITY_CHOICES)
+    count = models.IntegerField(default=0)
+    # For the centroid: sum / count
+    sum_lat = models.FloatField(default=0)
+    sum_lng = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the viewport scan (zoom, cell_x range, ...)
+            models.UniqueConstraint(
+                fields=['zoom', 'cell_x', 'cell_y', 'status', 'priority'],
+                name='issue_map_cell_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"z{self.zoom} ({self.cell_x}, {self.cell_y}) {self.status}/{self.priority}: {self.count}"
+
+class AttachmentBlob(models.Model):
+    """
+    One stored file, shared by every IssueAttachment with the same content.
+    ref_count is kept up to date by issues.signals; blobs that drop to zero
+    are removed by `manage.py gc_attachment_blobs`.
+    """
+    file = models.CharField(max_length=100, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.file
+
 class IssueAttachment(models.Model):
     issue = models.ForeignKey(
         Issue,
@@ -68,7 +334,14 @@ class IssueAttachment(models.Model):
         related_name='attachments'
     )
 
-    file = models.FileField(upload_to='issue_attachments/')
+    file = models.FileField(upload_to='issue_attachments/', storage=get_attachment_storage)
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        on_delete=models.PROTECT,
+        related_name='attachments',
+        null=True,
+        blank=True
+    )
     file_type = models.CharField(max_length=50, null=True, blank=True)
     created_at = models.DateTimeField(default=now)
 
@@ -90,6 +363,156 @@ class Vote(models.Model):
     
     class Meta:
         unique_together = ['issue', 'user']
+        indexes = [
+            # VoteViewSet lists a user's own votes newest first
+            models.Index(fields=['user', '-created_at'], name='vote_user_created_idx'),
+        ]
         
     def __str__(self):
-        return f"Vote by {self.user} on {self.issue.title}"
\ No newline at end of file
+        return f"Vote by {self.user} on {self.issue.title}"
+
+    def save(self, *args, **kwargs):
+        # issues.signals updates the voter's counters in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class Notification(models.Model):
+    """
+    In-app notification telling a voter that an issue they voted on changed
+    status. Status changes within NOTIFICATION_COALESCE_SECONDS update the
+    same unread row (see issues/notifications.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='notifications')
+    status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES)
+    created_at = models.DateTimeField(default=now)
+    updated_at = models.DateTimeField(default=now)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Inbox and unread list in NotificationViewSet order; read rows
+            # are left out of the unread index
+            models.Index(fields=['user', '-updated_at', '-id'], name='notification_user_updated_idx'),
+            models.Index(
+                fields=['user', '-updated_at', '-id'],
+                name='notification_unread_idx',
+                condition=models.Q(read_at__isnull=True)
+            ),
+            # Coalescing lookup
+            models.Index(fields=['issue', 'user'], name='notification_issue_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.issue_id}: {self.status}"
+
+class ArchivedIssue(models.Model):
+    """
+    A closed/resolved issue moved out of the live tables by
+    manage.py archive_issues (see issues/archive.py). `data` is its
+    IssueSerializer representation at archive time plus its status history;
+    IssueViewSet.retrieve falls back to it.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_issues')
+    issue_type = models.ForeignKey(IssueType, on_delete=models.PROTECT, related_name='archived_issues')
+    title = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=Issue.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=Issue.PRIORITY_CHOICES)
+    created_at = models.DateTimeField()
+    closed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=now)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_issue_user_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class ArchivedVote(models.Model):
+    issue = models.ForeignKey(ArchivedIssue, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_votes')
+    value = models.IntegerField(choices=Vote.VOTE_CHOICES, default=0)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['issue', 'user']
+
+    def __str__(self):
+        return f"Archived vote by {self.user_id} on {self.issue_id}"
+
+class ArchivedIssueAttachment(models.Model):
+    """
+    Keeps the blob reference of an archived attachment, so the file stays
+    stored and servable (see CiviCareManagementSystem/media.py).
+    """
+    issue = models.ForeignKey(ArchivedIssue, on_delete=models.CASCADE, related_name='attachments')
+    file = models.CharField(max_length=255, db_index=True)
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        on_delete=models.PROTECT,
+        related_name='archived_attachments',
+        null=True,
+        blank=True
+    )
+    file_type = models.CharField(max_length=50, null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived attachment for {self.issue_id}"
+
+class IssueEvent(models.Model):
+    """
+    Append-only change log for issues and their vote counts. The
+    auto-increment id is the change sequence: the SSE feed replays and
+    polls it, so events written by one worker reach clients of all others.
+    """
+    KIND_CHOICES = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('closed', 'Closed'),
+        ('deleted', 'Deleted'),
+        ('votes', 'Votes'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    # Not a foreign key: events outlive deleted issues
+    issue_id = models.UUIDField(db_index=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    issue_type_id = models.BigIntegerField(null=True, blank=True)
+    location_latitude = models.DecimalField(
+        max_digits=10, decimal_places=8, null=True, blank=True
+    )
+    location_longitude = models.DecimalField(
+        max_digits=11, decimal_places=8, null=True, blank=True
+    )
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.issue_id}"
+
+class IdempotencyKey(models.Model):
+    """
+    Response to a create/upload request sent with an Idempotency-Key header,
+    replayed to retries of the same request (see api/issues/idempotency.py).
+    """
+    # SHA-256 of the user, method, path and the client's key
+    key = models.CharField(max_length=64, primary_key=True)
+    # SHA-256 of the request body, to catch a key reused for another request
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # manage.py prune_idempotency_keys
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return self.key
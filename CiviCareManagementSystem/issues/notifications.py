@@ -0,0 +1,65 @@
+"""
+Voter notifications for issue status changes.
+
+A status change to one of NOTIFY_STATUSES enqueues issues.notify_voters (see
+issues.signals), so nothing per voter happens inside the request. The task
+walks the issue's voters along the (issue, user) unique index in chunks of
+NOTIFICATION_BATCH_SIZE, refreshes unread notifications written within
+NOTIFICATION_COALESCE_SECONDS and bulk_creates the rest.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import Notification, Vote
+
+NOTIFY_STATUSES = ('resolved', 'closed')
+
+
+def voter_chunks(issue_id, exclude_user_id=None):
+    """
+    Yields lists of voter ids, keyset-paginated on user_id.
+    """
+    size = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 1000)
+    voters = Vote.objects.filter(issue_id=issue_id).order_by('user_id').values_list('user_id', flat=True)
+    if exclude_user_id is not None:
+        voters = voters.exclude(user_id=exclude_user_id)
+
+    last = None
+    while True:
+        page = voters.filter(user_id__gt=last) if last is not None else voters
+        chunk = list(page[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def notify_voters(issue_id, status, exclude_user_id=None):
+    """
+    Notifies every voter of `issue_id` about `status`; returns (created, coalesced).
+    """
+    current = now()
+    window = timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 300))
+    created = coalesced = 0
+
+    for chunk in voter_chunks(issue_id, exclude_user_id):
+        with transaction.atomic():
+            recent = Notification.objects.filter(
+                issue_id=issue_id, user_id__in=chunk,
+                read_at__isnull=True, updated_at__gte=current - window,
+            )
+            pending = set(recent.values_list('user_id', flat=True))
+            if pending:
+                coalesced += recent.update(status=status, updated_at=current)
+
+            new = [
+                Notification(user_id=user_id, issue_id=issue_id, status=status, created_at=current, updated_at=current)
+                for user_id in chunk if user_id not in pending
+            ]
+            Notification.objects.bulk_create(new)
+            created += len(new)
+
+    return created, coalesced
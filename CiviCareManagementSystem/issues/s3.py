@@ -0,0 +1,66 @@
+"""
+S3-compatible attachment storage (AWS S3, MinIO, R2, ...).
+
+Needs django-storages with boto3 (pip install "django-storages[s3]"), which
+is only imported when STORAGES['attachments'] points here.
+"""
+import base64
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from storages.backends.s3 import S3Storage
+    from storages.utils import clean_name
+except ImportError as exc:
+    raise ImproperlyConfigured(
+        'ATTACHMENT_STORAGE=s3 needs django-storages and boto3: pip install "django-storages[s3]"'
+    ) from exc
+
+from .storage import ContentAddressingMixin
+
+
+class S3ContentAddressedStorage(ContentAddressingMixin, S3Storage):
+    """
+    ContentAddressedStorage on a bucket.
+
+    Presigned uploads are PUT straight to the bucket. The URL signs the
+    content type, length and x-amz-checksum-sha256, so the store refuses a
+    body that doesn't match what was announced.
+    """
+    # Same name means same bytes, so rewriting an object is harmless
+    file_overwrite = True
+
+    def _save(self, name, content):
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        content.seek(0)
+
+        name = self.content_name(name, hasher.hexdigest())
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def presign_upload(self, name, size, sha256, content_type, expires):
+        """
+        Returns {'url', 'method', 'headers'} for uploading the file directly.
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.bucket.meta.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': self._normalize_name(clean_name(self.content_name(name, sha256))),
+                'ContentType': content_type,
+                'ContentLength': size,
+                'ChecksumSHA256': checksum,
+            },
+            ExpiresIn=expires,
+            HttpMethod='PUT',
+        )
+        return {
+            'url': url,
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum},
+        }
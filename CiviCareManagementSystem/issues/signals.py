@@ -0,0 +1,225 @@
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from jobs.queue import enqueue
+
+from .events import issue_payload, record_event
+from . import clusters, sla, user_stats
+from .archive import is_archiving
+from .models import AttachmentBlob, Issue, IssueAttachment, IssueStatusTransition, Vote
+from .notifications import NOTIFY_STATUSES
+from .storage import digest_from_name, file_digest
+
+
+def blob_for(file):
+    """
+    Returns the AttachmentBlob for a stored file, creating it on first use.
+    """
+    digest = digest_from_name(file.name)
+    try:
+        size = file.size
+        if digest is None:
+            # Stored before content addressing; see dedupe_attachments
+            with file.open('rb'):
+                digest = file_digest(file)
+    except OSError:
+        # Missing from storage, nothing to share
+        return None
+
+    blob, _ = AttachmentBlob.objects.get_or_create(
+        file=file.name,
+        defaults={'digest': digest, 'size': size}
+    )
+    return blob
+
+
+def change_ref_count(blob_id, delta):
+    # updated_at marks when a blob last lost a reference, for the GC grace period
+    AttachmentBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + delta, updated_at=now())
+
+
+@receiver(pre_save, sender=IssueAttachment)
+def remember_blob(sender, instance, raw=False, **kwargs):
+    instance._previous_blob_id = None if instance._state.adding else instance.blob_id
+
+
+@receiver(post_save, sender=IssueAttachment)
+def link_blob(sender, instance, created, raw=False, **kwargs):
+    # Runs after FileField.pre_save has stored the upload under its digest
+    if raw:
+        return
+
+    blob = None
+    if instance.file:
+        blob = instance.blob
+        if blob is None or blob.file != instance.file.name:
+            blob = blob_for(instance.file)
+
+    blob_id = blob.pk if blob else None
+    if blob_id != instance.blob_id:
+        sender.objects.filter(pk=instance.pk).update(blob=blob)
+        instance.blob = blob
+
+    previous = getattr(instance, '_previous_blob_id', None)
+    if previous != blob_id:
+        if blob_id:
+            change_ref_count(blob_id, 1)
+        if previous:
+            change_ref_count(previous, -1)
+
+
+@receiver(post_delete, sender=IssueAttachment)
+def release_blob_reference(sender, instance, **kwargs):
+    # Archived attachments take over the reference
+    if instance.blob_id and not is_archiving():
+        change_ref_count(instance.blob_id, -1)
+
+
+@receiver(post_init, sender=Issue)
+def remember_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Issue)
+def issue_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    wrote_status = update_fields is None or 'status' in update_fields
+    if created:
+        kind = 'created'
+    elif wrote_status and instance.status == 'closed' and instance._loaded_status != 'closed':
+        kind = 'closed'
+    else:
+        kind = 'updated'
+    if wrote_status:
+        instance._loaded_status = instance.status
+    record_event(kind, instance, issue_payload(instance))
+
+
+MAP_FIELDS = ('location_latitude', 'location_longitude', 'status', 'priority')
+DEFERRED = object()
+
+
+@receiver(post_init, sender=Issue)
+def remember_map_key(sender, instance, **kwargs):
+    if all(name in instance.__dict__ for name in MAP_FIELDS):
+        instance._loaded_map_key = clusters.map_key(instance)
+    else:
+        # Loaded with deferred fields; read in load_deferred_map_key
+        instance._loaded_map_key = DEFERRED
+
+
+@receiver(pre_save, sender=Issue)
+def load_deferred_map_key(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance._loaded_map_key is not DEFERRED:
+        return
+    stored = Issue.objects.filter(pk=instance.pk).values_list(*MAP_FIELDS).first()
+    instance._loaded_map_key = None
+    if stored is not None and stored[0] is not None and stored[1] is not None:
+        instance._loaded_map_key = (float(stored[0]), float(stored[1]), stored[2], stored[3])
+
+
+@receiver(post_save, sender=Issue)
+def update_map_cells(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_key = clusters.map_key(instance)
+    clusters.move(None if created else instance._loaded_map_key, new_key)
+    instance._loaded_map_key = new_key
+
+
+@receiver(post_save, sender=IssueStatusTransition)
+def roll_up_transition(sender, instance, created, raw=False, **kwargs):
+    # Same transaction as the status change (see Issue.save)
+    if created and not raw:
+        sla.add_transition(instance)
+
+
+@receiver(post_save, sender=IssueStatusTransition)
+def count_user_issues(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    opened = user_stats.is_open(instance.to_status) - user_stats.is_open(instance.from_status)
+    if instance.from_status is None:
+        # The issue was just created
+        user_stats.bump(instance.issue.user_id, issues_reported=1, open_issues=opened)
+    else:
+        user_stats.bump(instance.issue.user_id, open_issues=opened)
+
+
+@receiver(post_save, sender=IssueStatusTransition)
+def queue_voter_notifications(sender, instance, created, raw=False, **kwargs):
+    if not created or raw or instance.from_status is None:
+        return
+    # resolved -> closed shortly after coalesces into the same notification
+    if instance.to_status in NOTIFY_STATUSES:
+        enqueue(
+            'issues.notify_voters',
+            issue_id=str(instance.issue_id),
+            status=instance.to_status,
+            # No need to tell whoever made the change
+            exclude_user_id=str(instance.changed_by_id) if instance.changed_by_id else None,
+        )
+
+
+@receiver(post_delete, sender=Issue)
+def issue_deleted(sender, instance, **kwargs):
+    clusters.move(clusters.map_key(instance), None)
+    record_event('deleted', instance, {'archived': True} if is_archiving() else {})
+
+
+@receiver(pre_delete, sender=Issue)
+def count_deleted_issue(sender, instance, **kwargs):
+    # Before the delete, while deferred fields can still be loaded
+    if not is_archiving():
+        # Archived issues still count as reported, and are never open
+        user_stats.bump(
+            instance.user_id, create=False,
+            issues_reported=-1, open_issues=-user_stats.is_open(instance.status)
+        )
+
+
+@receiver(post_init, sender=Vote)
+def remember_vote_value(sender, instance, **kwargs):
+    instance._loaded_value = instance.__dict__.get('value', 0)
+
+
+def record_vote_change(vote, delta):
+    if not delta:
+        return
+    counts = Vote.objects.filter(issue_id=vote.issue_id).aggregate(
+        up=Count('id', filter=Q(value=1)),
+        down=Count('id', filter=Q(value=-1)),
+    )
+    record_event('votes', vote.issue, {
+        'up': counts['up'],
+        'down': counts['down'],
+        'score': counts['up'] - counts['down'],
+        'delta': delta,
+    })
+
+
+@receiver(post_save, sender=Vote)
+def vote_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = 0 if created else instance._loaded_value
+    instance._loaded_value = instance.value
+    if instance.value != previous:
+        Issue.objects.filter(pk=instance.issue_id).update(score=F('score') + instance.value - previous)
+    record_vote_change(instance, instance.value - previous)
+    user_stats.bump(instance.user_id, votes_cast=bool(instance.value) - bool(previous))
+
+
+@receiver(post_delete, sender=Vote)
+def vote_deleted(sender, instance, **kwargs):
+    if is_archiving():
+        # The issue itself is going; one 'deleted' event covers it, and
+        # archived votes still count as cast
+        return
+    if instance._loaded_value:
+        Issue.objects.filter(pk=instance.issue_id).update(score=F('score') - instance._loaded_value)
+    record_vote_change(instance, -instance._loaded_value)
+    user_stats.bump(instance.user_id, create=False, votes_cast=-bool(instance._loaded_value))
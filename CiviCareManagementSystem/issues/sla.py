@@ -0,0 +1,127 @@
+"""
+Time-in-status / time-to-resolution rollups over IssueDurationHistogram.
+
+Durations go into geometric buckets (each BUCKET_RATIO times wider than the
+previous, starting at BUCKET_BASE seconds), so a percentile read from the
+histogram is within ~10% of the exact value while the table stays small.
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import IssueDurationHistogram
+
+BUCKET_BASE = 60  # seconds
+BUCKET_RATIO = 1.1
+MAX_BUCKET = 250  # ~ 60s * 1.1**250, far beyond any real issue
+
+RESOLVED_STATUSES = ('resolved', 'closed')
+PERCENTILES = (50, 90, 95)
+
+
+def bucket_for(seconds):
+    if seconds <= BUCKET_BASE:
+        return 0
+    return min(1 + int(math.log(seconds / BUCKET_BASE, BUCKET_RATIO)), MAX_BUCKET)
+
+
+def bucket_upper_bound(bucket):
+    return BUCKET_BASE * BUCKET_RATIO ** bucket
+
+
+def add_counts(counts):
+    """
+    Adds {(issue_type_id, priority, metric, status, bucket): n} to the histograms.
+    """
+    for (issue_type_id, priority, metric, status, bucket), count in counts.items():
+        key = {
+            'issue_type_id': issue_type_id,
+            'priority': priority,
+            'metric': metric,
+            'status': status,
+            'bucket': bucket,
+        }
+        if IssueDurationHistogram.objects.filter(**key).update(count=F('count') + count):
+            continue
+        try:
+            with transaction.atomic():
+                IssueDurationHistogram.objects.create(count=count, **key)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            IssueDurationHistogram.objects.filter(**key).update(count=F('count') + count)
+
+
+def transition_buckets(issue_type_id, priority, created_at, from_status, to_status, changed_at, seconds_in_previous):
+    """
+    Histogram keys one status transition adds to.
+    """
+    keys = []
+    if from_status and seconds_in_previous is not None:
+        keys.append((issue_type_id, priority, 'in_status', from_status, bucket_for(seconds_in_previous)))
+    if to_status in RESOLVED_STATUSES and from_status not in RESOLVED_STATUSES:
+        resolution = max((changed_at - created_at).total_seconds(), 0)
+        keys.append((issue_type_id, priority, 'resolution', '', bucket_for(resolution)))
+    return keys
+
+
+def add_transition(transition):
+    """
+    Folds one IssueStatusTransition into the histograms.
+    """
+    issue = transition.issue
+    add_counts(Counter(transition_buckets(
+        issue.issue_type_id, issue.priority, issue.created_at, transition.from_status,
+        transition.to_status, transition.changed_at, transition.seconds_in_previous
+    )))
+
+
+def percentiles(buckets):
+    """
+    Estimates percentiles (in seconds) from a {bucket: count} histogram.
+    """
+    total = sum(buckets.values())
+    result = {'count': total}
+    if not total:
+        return result
+
+    ordered = sorted(buckets.items())
+    for p in PERCENTILES:
+        threshold = total * p / 100
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen >= threshold:
+                result[f'p{p}'] = round(bucket_upper_bound(bucket))
+                break
+    return result
+
+
+def sla_report(group_by='issue_type'):
+    """
+    Merges histograms per issue type or per priority.
+    """
+    group_field = 'issue_type_id' if group_by == 'issue_type' else 'priority'
+    rows = IssueDurationHistogram.objects.values(
+        group_field, 'metric', 'status', 'bucket', 'count'
+    )
+
+    groups = defaultdict(lambda: {'resolution': defaultdict(int), 'in_status': defaultdict(lambda: defaultdict(int))})
+    for row in rows:
+        group = groups[row[group_field]]
+        if row['metric'] == 'resolution':
+            group['resolution'][row['bucket']] += row['count']
+        else:
+            group['in_status'][row['status']][row['bucket']] += row['count']
+
+    return [
+        {
+            group_by: key,
+            'time_to_resolution': percentiles(group['resolution']),
+            'time_in_status': {
+                status: percentiles(buckets) for status, buckets in group['in_status'].items()
+            },
+        }
+        for key, group in groups.items()
+    ]
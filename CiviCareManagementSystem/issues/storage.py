@@ -0,0 +1,147 @@
+"""
+Content-addressed storage for issue attachments.
+
+IssueAttachment.file uses the 'attachments' entry of STORAGES (see
+settings.py): ContentAddressedStorage on the local filesystem by default, or
+issues.s3.S3ContentAddressedStorage for an S3-compatible bucket.
+
+Both also implement direct uploads. presign_upload() tells a client where
+and how to PUT the bytes of a file with a known size and SHA-256; the file
+lands under the same content-addressed name a server-side save would give
+it, and the store itself rejects bytes that don't match the digest.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage, storages
+from django.urls import reverse
+
+digest_re = re.compile(r'^[0-9a-f]{64}$')
+
+UPLOAD_SALT = 'issues.storage.upload'
+
+
+def file_digest(content):
+    """
+    SHA-256 of a Django File, read in chunks.
+    """
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def digest_from_name(name):
+    """
+    Returns the digest encoded in a content-addressed name, or None.
+    """
+    stem = os.path.splitext(posixpath.basename(name or ''))[0]
+    return stem if digest_re.match(stem) else None
+
+
+class ContentAddressingMixin:
+    """
+    Names files after the SHA-256 of their content.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Identical content is meant to land on the same name; the final
+        # name is only known once the upload has been hashed in _save().
+        return str(name).replace('\\', '/')
+
+    def content_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        ext = os.path.splitext(name)[1].lower()[:10]
+        return posixpath.join(directory, digest[:2], digest + ext)
+
+
+class ContentAddressedStorage(ContentAddressingMixin, FileSystemStorage):
+    """
+    Stores every upload once, under the SHA-256 of its content:
+
+        issue_attachments/photo.jpg -> issue_attachments/3f/3f9a...e1.jpg
+
+    The digest is computed while the upload is streamed to a temporary file,
+    which is then moved into place, or discarded if that content already
+    exists. Rows sharing the file are tracked by issues.models.AttachmentBlob.
+
+    Presigned uploads are PUT to CiviCareManagementSystem.media.receive_upload
+    with a signed token, standing in for an object store's presigned URL.
+    """
+
+    def _save(self, name, content):
+        return self.store(name, content.chunks())
+
+    def store(self, name, chunks, size=None, sha256=None):
+        """
+        Writes `chunks` under the content-addressed form of `name`.
+
+        Raises ValueError if `size` or `sha256` are given and the bytes
+        don't match them; nothing is stored then.
+        """
+        incoming = self.path('.incoming')
+        os.makedirs(incoming, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        written = 0
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in chunks:
+                    written += len(chunk)
+                    if size is not None and written > size:
+                        raise ValueError('Upload is larger than announced')
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+
+            if size is not None and written != size:
+                raise ValueError('Upload is smaller than announced')
+            digest = hasher.hexdigest()
+            if sha256 is not None and digest != sha256:
+                raise ValueError('Upload does not match its SHA-256')
+
+            name = self.content_name(name, digest)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                return name
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            # Atomic on the same filesystem, so readers never see partial blobs
+            os.replace(tmp_path, full_path)
+            return name
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def presign_upload(self, name, size, sha256, content_type, expires):
+        """
+        Returns {'url', 'method', 'headers'} for uploading the file directly.
+        """
+        token = signing.dumps({'name': name, 'size': size, 'sha256': sha256}, salt=UPLOAD_SALT)
+        return {
+            'url': reverse('media-upload', args=[token]),
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+        }
+
+    def receive_upload(self, token, chunks):
+        """
+        Stores a presigned upload; raises signing.BadSignature for a bad or
+        expired token and ValueError for bytes that don't match it.
+        """
+        max_age = getattr(settings, 'ATTACHMENT_UPLOAD_EXPIRES', 900)
+        upload = signing.loads(token, salt=UPLOAD_SALT, max_age=max_age)
+        return self.store(upload['name'], chunks, size=upload['size'], sha256=upload['sha256'])
+
+
+def get_attachment_storage():
+    if 'attachments' in settings.STORAGES:
+        return storages['attachments']
+    return storages.create_storage({'BACKEND': 'issues.storage.ContentAddressedStorage'})
@@ -0,0 +1,43 @@
+"""
+Background tasks (jobs.queue) for the issues app.
+"""
+from django.core.management import call_command
+
+from jobs.queue import task
+
+from . import notifications
+
+
+@task('issues.prune_events')
+def prune_events():
+    call_command('prune_issue_events')
+
+
+@task('issues.rebuild_sla')
+def rebuild_sla():
+    call_command('rebuild_issue_sla')
+
+
+@task('issues.rebuild_map_cells')
+def rebuild_map_cells():
+    call_command('rebuild_issue_map_cells')
+
+
+@task('issues.notify_voters')
+def notify_voters(issue_id, status, exclude_user_id=None):
+    notifications.notify_voters(issue_id, status, exclude_user_id)
+
+
+@task('issues.archive')
+def archive():
+    call_command('archive_issues')
+
+
+@task('issues.rebuild_user_stats')
+def rebuild_user_stats():
+    call_command('rebuild_user_stats')
+
+
+@task('issues.prune_idempotency_keys')
+def prune_idempotency_keys():
+    call_command('prune_idempotency_keys')
@@ -1,3 +1,1643 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import brotli
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from CiviCareManagementSystem.dbpool import pool_stats
+from CiviCareManagementSystem.middleware import ReplicaRoutingMiddleware, compressed_cache
+from CiviCareManagementSystem.routers import PIN_COOKIE_NAME
+from CiviCareManagementSystem.throttling import SharedBucketStore
+from api.issues.fast_serializers import IssueValuesSerializer
+from api.issues.serializers import IssueSerializer
+
+from users.models import User, UserStats
+from issues.clusters import cell_for
+from issues.duplicates import duplicate_index, minhash, similarity
+from issues.events import (
+    EventBroadcaster,
+    EventFilter,
+    decode_sync_token,
+    encode_sync_token,
+    event_dict,
+    fetch_events,
+)
+from issues.models import (
+    ArchivedIssue,
+    ArchivedIssueAttachment,
+    ArchivedVote,
+    AttachmentBlob,
+    Issue,
+    IssueAttachment,
+    IssueDurationHistogram,
+    IdempotencyKey,
+    IssueEvent,
+    IssueMapCell,
+    IssueStatusTransition,
+    IssueType,
+    Notification,
+    VersionConflict,
+    Vote,
+)
+from jobs.queue import Worker
+from issues.sla import bucket_for, sla_report
+from issues.storage import get_attachment_storage
+from issues.uploads import presign
+
+
+class IndexUsageTests(TestCase):
+    """
+    Runs EXPLAIN on the common IssueViewSet / VoteViewSet list queries and
+    checks that the planner picks an index instead of a full table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reporter', email='reporter@example.com',
+            full_name='Reporter', password='secret-pass-123'
+        )
+        cls.issue_type = IssueType.objects.create(name='Pothole')
+        for i in range(20):
+            issue = Issue.objects.create(
+                user=cls.user, issue_type=cls.issue_type,
+                title=f'Issue {i}', description='...',
+                status='open' if i % 2 else 'pending',
+                priority='high' if i % 3 else 'low',
+            )
+            Vote.objects.create(issue=issue, user=cls.user, value=1)
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are always cheaper to scan sequentially, so
+            # ask the planner whether it *can* use an index at all.
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        plan = self.explain(queryset)
+        if index_name:
+            self.assertIn(index_name, plan, plan)
+        else:
+            self.assertRegex(plan, r'(?i)index', plan)
+
+    def test_default_list(self):
+        self.assertUsesIndex(Issue.objects.order_by('-created_at'), 'issue_created_idx')
+
+    def test_ordering_by_updated_at(self):
+        self.assertUsesIndex(Issue.objects.order_by('updated_at'), 'issue_updated_idx')
+
+    def test_filter_by_status(self):
+        self.assertUsesIndex(
+            Issue.objects.filter(status='open').order_by('-created_at'),
+            'issue_status_created_idx'
+        )
+
+    def test_filter_by_priority(self):
+        self.assertUsesIndex(
+            Issue.objects.filter(priority='high').order_by('-created_at'),
+            'issue_priority_created_idx'
+        )
+
+    def test_filter_by_user(self):
+        self.assertUsesIndex(
+            Issue.objects.filter(user=self.user).order_by('-created_at'),
+            'issue_user_created_idx'
+        )
+
+    def test_filter_by_issue_type_and_status(self):
+        self.assertUsesIndex(
+            Issue.objects.filter(issue_type=self.issue_type, status='open').order_by('-created_at'),
+            'issue_type_status_created_idx'
+        )
+
+    def test_filter_by_issue_type(self):
+        self.assertUsesIndex(
+            Issue.objects.filter(issue_type=self.issue_type).order_by('-created_at')
+        )
+
+    def test_votes_by_user(self):
+        self.assertUsesIndex(
+            Vote.objects.filter(user=self.user).order_by('-created_at'),
+            'vote_user_created_idx'
+        )
+
+    def test_notification_inbox(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user).order_by('-updated_at', '-id'),
+            'notification_user_updated_idx'
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """
+    Checks PrimaryReplicaRouter decisions; no replica connection is opened.
+    """
+
+    def setUp(self):
+        caches['replica_pins'].clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(
+            username='voter', email='voter@example.com',
+            full_name='Voter', password='secret-pass-123'
+        )
+
+    def route(self, request, status=200):
+        """Run a request through the middleware and report where reads went."""
+        seen = {}
+
+        def view(request):
+            seen['issue'] = router.db_for_read(Issue)
+            seen['user'] = router.db_for_read(User)
+            return HttpResponse(status=status)
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_anonymous_get_reads_from_replica(self):
+        seen, _ = self.route(self.factory.get('/api/v1/issues/'))
+        self.assertEqual(seen['issue'], 'replica')
+        self.assertEqual(seen['user'], 'default')
+
+    def test_writes_and_unsafe_requests_use_primary(self):
+        seen, _ = self.route(self.factory.post('/api/v1/issues/'))
+        self.assertEqual(seen['issue'], 'default')
+        self.assertEqual(router.db_for_write(Issue), 'default')
+
+    def test_outside_a_request_uses_primary(self):
+        self.assertEqual(router.db_for_read(Issue), 'default')
+
+    def test_write_pins_cookie_client(self):
+        _, response = self.route(self.factory.post('/api/v1/issues/1/vote/'))
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        request = self.factory.get('/api/v1/issues/')
+        request.COOKIES[PIN_COOKIE_NAME] = '1'
+        seen, _ = self.route(request)
+        self.assertEqual(seen['issue'], 'default')
+
+    def test_write_pins_authenticated_user(self):
+        request = self.factory.post('/api/v1/issues/1/vote/')
+        request.user = self.user
+        self.route(request)
+
+        request = self.factory.get('/api/v1/issues/')
+        request.user = self.user
+        seen, _ = self.route(request)
+        self.assertEqual(seen['issue'], 'default')
+
+    def test_user_pin_is_shared_between_workers(self):
+        # Each worker process has its own cache connection; a process-local
+        # cache would share nothing between them
+        self.assertNotIsInstance(caches['replica_pins'], LocMemCache)
+        worker_a, worker_b = caches.create_connection('replica_pins'), caches.create_connection('replica_pins')
+
+        request = self.factory.post('/api/v1/issues/1/vote/')
+        request.user = self.user
+        with mock.patch('CiviCareManagementSystem.routers.pin_cache', return_value=worker_a):
+            self.route(request)
+
+        request = self.factory.get('/api/v1/issues/')
+        request.user = self.user
+        with mock.patch('CiviCareManagementSystem.routers.pin_cache', return_value=worker_b):
+            seen, _ = self.route(request)
+        self.assertEqual(seen['issue'], 'default')
+
+    def test_failed_write_does_not_pin(self):
+        request = self.factory.post('/api/v1/issues/1/vote/')
+        request.user = self.user
+        _, response = self.route(request, status=400)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+        request = self.factory.get('/api/v1/issues/')
+        request.user = self.user
+        seen, _ = self.route(request)
+        self.assertEqual(seen['issue'], 'replica')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        request = self.factory.post('/api/v1/issues/1/vote/')
+        request.user = self.user
+        with mock.patch('CiviCareManagementSystem.routers.pin_cache') as pin_cache:
+            _, response = self.route(request)
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+        pin_cache.assert_not_called()
+
+
+class DatabasePoolStatsTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='dba', email='dba@example.com', full_name='DBA', password='secret-pass-123'
+        )
+        self.user = User.objects.create_user(
+            username='citizen', email='citizen@example.com', full_name='Citizen', password='secret-pass-123'
+        )
+
+    def test_admin_only_and_empty_without_pooling(self):
+        url = '/api/v1/system/db-pool/'
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'pools': {}})
+
+    def test_pool_saturation_and_wait(self):
+        pool = mock.Mock(closed=False, max_size=10, timeout=30.0)
+        pool.get_stats.return_value = {
+            'pool_max': 10, 'pool_size': 6, 'pool_available': 1, 'requests_num': 4, 'requests_wait_ms': 10,
+        }
+        with mock.patch.object(connection, 'pool', pool, create=True):
+            stats = pool_stats()[connection.alias]
+        self.assertEqual(
+            {key: stats[key] for key in ('open', 'in_use', 'saturation', 'avg_wait_ms', 'timeout')},
+            {'open': True, 'in_use': 5, 'saturation': 0.5, 'avg_wait_ms': 2.5, 'timeout': 30.0}
+        )
+
+
+class SparseFieldsTests(TestCase):
+    """
+    ?fields= / ?expand= on the issue list trim both payload and queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='mapper', email='mapper@example.com',
+            full_name='Mapper', password='secret-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Streetlight')
+        for i in range(5):
+            issue = Issue.objects.create(
+                user=cls.user, issue_type=issue_type,
+                title=f'Light {i}', description='Broken',
+                location_latitude='16.80000000', location_longitude='96.15000000',
+            )
+            Vote.objects.create(issue=issue, user=cls.user, value=1)
+
+    def test_full_representation_by_default(self):
+        response = self.client.get('/api/v1/issues/')
+        item = response.json()['results'][0]
+        self.assertIn('vote_summary', item)
+        self.assertIn('user', item)
+        self.assertIn('description', item)
+
+    def test_map_fields_skip_nested_and_vote_queries(self):
+        # one COUNT for pagination + one SELECT for the page
+        with self.assertNumQueries(2) as ctx:
+            response = self.client.get(
+                '/api/v1/issues/?fields=id,location_latitude,location_longitude,status,priority'
+            )
+        item = response.json()['results'][0]
+        self.assertEqual(
+            set(item),
+            {'id', 'location_latitude', 'location_longitude', 'status', 'priority'}
+        )
+        self.assertNotIn('"issues_issue"."description"', ctx.captured_queries[-1]['sql'])
+
+    def test_expand_adds_nested_fields(self):
+        response = self.client.get('/api/v1/issues/?fields=id,status&expand=user,vote_summary')
+        item = response.json()['results'][0]
+        self.assertEqual(set(item), {'id', 'status', 'user', 'vote_summary'})
+        self.assertEqual(item['user']['username'], 'mapper')
+        self.assertEqual(item['vote_summary']['up'], 1)
+
+    def test_expand_alone_keeps_the_full_representation(self):
+        item = self.client.get('/api/v1/issues/?expand=user').json()['results'][0]
+        self.assertIn('description', item)
+        self.assertIn('vote_summary', item)
+
+    def test_fields_only_trim_the_response_of_writes(self):
+        issue = Issue.objects.filter(user=self.user).first()
+        self.client.force_login(self.user)
+        response = self.client.patch(
+            f'/api/v1/issues/{issue.pk}/?fields=id', {'title': 'Light fixed?'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': str(issue.pk)})
+        self.assertEqual(Issue.objects.get(pk=issue.pk).title, 'Light fixed?')
+
+
+class IssueValuesSerializerTests(TestCase):
+    """
+    The values() fast path must render byte-identical JSON to IssueSerializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='citizen', email='citizen@example.com',
+            full_name='Citizen', password='secret-pass-123',
+            avatar='avatars/me.png', first_name='Aung',
+        )
+        other = User.objects.create_user(
+            username='neighbour', email='neighbour@example.com',
+            full_name='Neighbour', password='secret-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Drainage')
+        for i in range(4):
+            issue = Issue.objects.create(
+                user=cls.user if i % 2 else other, issue_type=issue_type,
+                title=f'Drain {i}', description='Blocked drain',
+                status='closed' if i == 3 else 'open',
+                location_latitude='16.8409' if i else None,
+                location_longitude='96.17350123' if i else None,
+                closed_at=now() if i == 3 else None,
+            )
+            IssueAttachment.objects.create(issue=issue, file=f'issue_attachments/drain_{i}.png', file_type='image/png')
+            if i:
+                Vote.objects.create(issue=issue, user=cls.user, value=1 if i % 2 else -1)
+                Vote.objects.create(issue=issue, user=other, value=1)
+
+    def render_both(self, url):
+        request = Request(RequestFactory().get(url))
+        request.user = self.user
+        context = {'request': request}
+        queryset = Issue.objects.order_by('-created_at')
+
+        expected = IssueSerializer(queryset, many=True, context=context).data
+        fast = IssueValuesSerializer(context=context)
+        actual = fast.to_representation(queryset.values(*fast.columns))
+
+        renderer = JSONRenderer()
+        return renderer.render(expected), renderer.render(actual)
+
+    def test_full_representation_is_identical(self):
+        expected, actual = self.render_both('/api/v1/issues/')
+        self.assertEqual(expected, actual)
+
+    def test_sparse_representation_is_identical(self):
+        expected, actual = self.render_both(
+            '/api/v1/issues/?fields=id,location_latitude,location_longitude,status&expand=attachments'
+        )
+        self.assertEqual(expected, actual)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='compress', email='compress@example.com',
+            full_name='Compress', password='secret-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Garbage')
+        for i in range(10):
+            Issue.objects.create(
+                user=user, issue_type=issue_type,
+                title=f'Garbage pile {i}', description='Not collected for a week',
+            )
+
+    def setUp(self):
+        compressed_cache.clear()
+
+    def test_prefers_brotli(self):
+        response = self.client.get('/api/v1/issues/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(brotli.decompress(response.content))['count'], 10)
+
+    def test_gzip_fallback(self):
+        response = self.client.get('/api/v1/issues/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 10)
+
+    def test_identity_when_not_accepted(self):
+        response = self.client.get('/api/v1/issues/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_anonymous_responses_are_cached_by_etag(self):
+        first = self.client.get('/api/v1/issues/', HTTP_ACCEPT_ENCODING='br')
+        with mock.patch('CiviCareManagementSystem.middleware.brotli.compress') as compress:
+            second = self.client.get('/api/v1/issues/', HTTP_ACCEPT_ENCODING='br')
+        compress.assert_not_called()
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(second['ETag'].startswith('W/'))
+
+
+class MediaServingTests(TestCase):
+    name = 'issue_attachments/Screenshot_from_2026-01-23_20-33-21.png'
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            username='photographer', email='photographer@example.com',
+            full_name='Photographer', password='secret-pass-123'
+        )
+        issue = Issue.objects.create(
+            user=user, issue_type=IssueType.objects.create(name='Graffiti'),
+            title='Graffiti', description='On the bridge',
+        )
+        IssueAttachment.objects.create(issue=issue, file=cls.name, file_type='image/png')
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_serves_known_attachment(self):
+        response = self.client.get('/media/' + self.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(self.read(response).startswith(b'\x89PNG'))
+
+    def test_unknown_files_are_not_served(self):
+        other = 'issue_attachments/Screenshot_from_2026-01-29_18-09-43.png'
+        self.assertEqual(self.client.get('/media/' + other).status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_range_request(self):
+        response = self.client.get('/media/' + self.name, HTTP_RANGE='bytes=1-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '3')
+        self.assertTrue(response['Content-Range'].startswith('bytes 1-3/'))
+        self.assertEqual(self.read(response), b'PNG')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get('/media/' + self.name, HTTP_RANGE='bytes=999999999-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_modified_since(self):
+        first = self.client.get('/media/' + self.name)
+        response = self.client.get('/media/' + self.name, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='nginx')
+    def test_accel_redirect(self):
+        response = self.client.get('/media/' + self.name)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+
+
+class ContentAddressedAttachmentTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='uploader', email='uploader@example.com',
+            full_name='Uploader', password='secret-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Flooding')
+        self.issues = [
+            Issue.objects.create(user=self.user, issue_type=issue_type, title=f'Flood {i}', description='Water')
+            for i in range(2)
+        ]
+
+    def attach(self, issue, content=b'same photo bytes', name='photo.JPG'):
+        return IssueAttachment.objects.create(issue=issue, file=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.attach(self.issues[0])
+        second = self.attach(self.issues[1], name='another-name.jpg')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertRegex(first.file.name, r'^issue_attachments/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 2)
+
+    def test_deletes_release_references_and_gc_removes_file(self):
+        first = self.attach(self.issues[0])
+        self.attach(self.issues[1])
+        name = first.file.name
+
+        first.delete()
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        self.issues[1].delete()
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('gc_attachment_blobs', '--grace-minutes=0', stdout=io.StringIO())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+
+    def test_dedupe_command_moves_legacy_files(self):
+        legacy_dir = os.path.join(self.media_root, 'issue_attachments')
+        os.makedirs(legacy_dir)
+        for issue, filename in zip(self.issues, ['a.png', 'b.png']):
+            with open(os.path.join(legacy_dir, filename), 'wb') as f:
+                f.write(b'duplicated legacy upload')
+            IssueAttachment.objects.bulk_create([
+                IssueAttachment(issue=issue, file=f'issue_attachments/{filename}')
+            ])
+
+        call_command('dedupe_attachments', stdout=io.StringIO())
+
+        names = set(IssueAttachment.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 2)
+        self.assertEqual(os.listdir(legacy_dir), [names.pop().split('/')[1]])
+
+    def test_dedupe_keeps_archived_and_pending_files(self):
+        archived = self.attach(self.issues[0], content=b'archived photo')
+        self.issues[0].status = 'closed'
+        self.issues[0].save()
+        Issue.objects.filter(pk=self.issues[0].pk).update(status_changed_at=now() - timedelta(days=400))
+        call_command('archive_issues', stdout=io.StringIO())
+        self.assertTrue(ArchivedIssueAttachment.objects.filter(file=archived.file.name).exists())
+
+        # Uploaded through a presigned URL but not confirmed yet
+        content = b'pending upload'
+        digest = hashlib.sha256(content).hexdigest()
+        presign(self.user, self.issues[1], 'pending.jpg', 'image/jpeg', len(content), digest)
+        storage = get_attachment_storage()
+        pending = storage.store('issue_attachments/pending.jpg', [content], len(content), digest)
+
+        orphan = os.path.join(self.media_root, 'issue_attachments', 'stray.jpg')
+        with open(orphan, 'wb') as f:
+            f.write(b'nobody uses this')
+
+        call_command('dedupe_attachments', '--delete-orphans', stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(storage.exists(archived.file.name))
+        self.assertTrue(storage.exists(pending))
+
+
+class IssueEventTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='watcher', email='watcher@example.com',
+            full_name='Watcher', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.issue = Issue.objects.create(
+            user=self.user, issue_type=self.issue_type, title='Crack', description='Big crack',
+            location_latitude='16.80000000', location_longitude='96.15000000',
+        )
+
+    def kinds(self):
+        return list(IssueEvent.objects.order_by('id').values_list('kind', flat=True))
+
+    def test_issue_lifecycle_is_recorded(self):
+        self.issue.priority = 'high'
+        self.issue.save()
+        self.issue.status = 'closed'
+        self.issue.save()
+        self.issue.delete()
+        self.assertEqual(self.kinds(), ['created', 'updated', 'closed', 'deleted'])
+
+    def test_vote_events_carry_counts_and_delta(self):
+        vote = Vote.objects.create(issue=self.issue, user=self.user, value=1)
+        vote = Vote.objects.get(pk=vote.pk)
+        vote.value = -1
+        vote.save()
+        payloads = list(IssueEvent.objects.filter(kind='votes').order_by('id').values_list('payload', flat=True))
+        self.assertEqual(payloads[0], {'up': 1, 'down': 0, 'score': 1, 'delta': 1})
+        self.assertEqual(payloads[1], {'up': 0, 'down': 1, 'score': -1, 'delta': -2})
+
+    def test_filter_by_type_and_bbox(self):
+        event = event_dict(IssueEvent.objects.get(kind='created'))
+        self.assertTrue(EventFilter({self.issue_type.pk}, [96, 16, 97, 17]).matches(event))
+        self.assertFalse(EventFilter({self.issue_type.pk + 1}).matches(event))
+        self.assertFalse(EventFilter(bbox=[90, 10, 91, 11]).matches(event))
+
+    @override_settings(SSE_VOTE_COALESCE_SECONDS=0.01)
+    def test_vote_events_are_coalesced(self):
+        async def scenario():
+            broadcaster = EventBroadcaster()
+            with mock.patch('issues.events.latest_event_id', return_value=0):
+                subscription = await broadcaster.subscribe(EventFilter())
+            for event_id, delta in [(1, 1), (2, 1), (3, -1)]:
+                broadcaster.dispatch({
+                    'id': event_id, 'kind': 'votes', 'issue': 'x', 'issue_type': None,
+                    'lat': None, 'lng': None, 'data': {'score': event_id, 'delta': delta},
+                })
+            event = await asyncio.wait_for(subscription.queue.get(), 1)
+            broadcaster.unsubscribe(subscription)
+            broadcaster.poller.cancel()
+            return event, subscription.queue.qsize()
+
+        event, remaining = asyncio.run(scenario())
+        self.assertEqual(event['data'], {'score': 3, 'delta': 1})
+        self.assertEqual(remaining, 0)
+
+
+class DeltaSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='fieldworker', email='fieldworker@example.com',
+            full_name='Field Worker', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Water supply')
+        self.kept = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Leak', description='Pipe')
+        self.removed = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Dup', description='Pipe')
+
+    def sync(self, token=None):
+        url = '/api/v1/issues/sync/' + (f'?since={token}' if token else '')
+        return self.client.get(url)
+
+    def test_returns_only_changes_since_token(self):
+        token = self.sync().json()['next']
+
+        Vote.objects.create(issue=self.kept, user=self.user, value=1)
+        removed_id = str(self.removed.pk)
+        self.removed.delete()
+        untouched = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='New', description='x')
+
+        data = self.sync(token).json()
+        self.assertEqual(
+            {item['id'] for item in data['changes']},
+            {str(self.kept.pk), str(untouched.pk)}
+        )
+        changed = next(item for item in data['changes'] if item['id'] == str(self.kept.pk))
+        self.assertEqual(changed['vote_summary']['up'], 1)
+        self.assertEqual(data['deleted'], [removed_id])
+        self.assertFalse(data['has_more'])
+
+        data = self.sync(data['next']).json()
+        self.assertEqual((data['changes'], data['deleted']), ([], []))
+
+    @override_settings(ISSUE_SYNC_MAX_EVENTS=1)
+    def test_pages_through_events(self):
+        token = encode_sync_token(IssueEvent.objects.order_by('id').values_list('id', flat=True).first() - 1)
+        data = self.sync(token).json()
+        self.assertTrue(data['has_more'])
+        self.assertEqual(len(data['changes']), 1)
+
+    def test_events_committed_out_of_order_are_not_skipped(self):
+        # Logged in, so responses aren't served from the anonymous cache
+        self.client.force_login(self.user)
+        token = self.sync().json()['next']
+        self.kept.title = 'Leak, bigger'
+        self.kept.save()
+        self.removed.title = 'Dup, renamed'
+        self.removed.save()
+        first, second = IssueEvent.objects.order_by('-id')[:2][::-1]
+
+        # The transaction holding the lower id hasn't committed yet
+        IssueEvent.objects.filter(pk=first.pk).delete()
+        data = self.sync(token).json()
+        self.assertEqual((data['changes'], data['next'], data['has_more']), ([], token, False))
+        self.assertEqual(fetch_events(decode_sync_token(token)[0]), [])
+
+        first.save(force_insert=True)
+        data = self.sync(token).json()
+        self.assertEqual({item['id'] for item in data['changes']}, {str(self.kept.pk), str(self.removed.pk)})
+
+        # A gap that outlives ISSUE_EVENT_COMMIT_LAG is a rolled back insert
+        IssueEvent.objects.filter(pk=first.pk).delete()
+        IssueEvent.objects.filter(pk=second.pk).update(created_at=now() - timedelta(minutes=5))
+        data = self.sync(token).json()
+        self.assertEqual([item['id'] for item in data['changes']], [str(self.removed.pk)])
+        self.assertEqual(decode_sync_token(data['next'])[0], second.pk)
+
+    def test_bad_and_expired_tokens(self):
+        self.assertEqual(self.sync('not-a-token').status_code, 400)
+        with mock.patch('issues.events.time.time', return_value=0):
+            old = encode_sync_token(0)
+        self.assertEqual(self.sync(old).status_code, 410)
+
+
+class StatusHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='inspector', email='inspector@example.com',
+            full_name='Inspector', password='secret-pass-123'
+        )
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', full_name='Admin', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.issue = Issue.objects.create(
+            user=self.user, issue_type=self.issue_type, title='Pothole', description='Deep', priority='high'
+        )
+
+    def test_close_sets_closed_at_and_logs_transition(self):
+        self.client.force_login(self.user)
+        response = self.client.post(f'/api/v1/issues/{self.issue.pk}/close/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['closed_at'])
+
+        history = self.client.get(f'/api/v1/issues/{self.issue.pk}/history/').json()
+        self.assertEqual(
+            [(item['from_status'], item['to_status']) for item in history],
+            [(None, 'open'), ('open', 'closed')]
+        )
+        self.assertEqual(history[1]['changed_by'], str(self.user.pk))
+
+    def test_reopen_clears_closed_at(self):
+        self.issue.status = 'closed'
+        self.issue.save()
+        issue = Issue.objects.get(pk=self.issue.pk)
+        issue.status = 'open'
+        issue.save(update_fields=['status'])
+
+        issue.refresh_from_db()
+        self.assertIsNone(issue.closed_at)
+        self.assertEqual(IssueStatusTransition.objects.filter(issue=issue).count(), 3)
+
+    def test_saving_without_status_change_logs_nothing(self):
+        issue = Issue.objects.get(pk=self.issue.pk)
+        issue.title = 'Pothole on Main St'
+        issue.save()
+        self.assertEqual(IssueStatusTransition.objects.filter(issue=issue).count(), 1)
+
+    def test_transition_of_deferred_status_is_logged(self):
+        before = Issue.objects.get(pk=self.issue.pk).status_changed_at
+        issue = Issue.objects.defer('status').get(pk=self.issue.pk)
+        issue.status = 'closed'
+        issue.save()
+
+        self.assertEqual(
+            list(IssueStatusTransition.objects.filter(issue=issue).order_by('changed_at').values_list('from_status', 'to_status')),
+            [(None, 'open'), ('open', 'closed')]
+        )
+        issue.refresh_from_db()
+        self.assertGreater(issue.status_changed_at, before)
+        self.assertIsNotNone(issue.closed_at)
+        self.assertEqual(IssueEvent.objects.filter(issue_id=issue.pk).latest('id').kind, 'closed')
+
+    def test_status_left_out_of_update_fields_logs_nothing(self):
+        issue = Issue.objects.get(pk=self.issue.pk)
+        issue.status = 'closed'
+        issue.title = 'Pothole on Main St'
+        issue.save(update_fields=['title'])
+
+        issue.refresh_from_db()
+        self.assertEqual(issue.status, 'open')
+        self.assertEqual(IssueStatusTransition.objects.filter(issue=issue).count(), 1)
+
+    def test_rollup_reports_percentiles(self):
+        Issue.objects.filter(pk=self.issue.pk).update(
+            created_at=now() - timedelta(hours=2), status_changed_at=now() - timedelta(hours=2)
+        )
+        issue = Issue.objects.get(pk=self.issue.pk)
+        issue.status = 'resolved'
+        issue.save()
+
+        self.assertTrue(IssueDurationHistogram.objects.filter(
+            issue_type=self.issue_type, priority='high', metric='resolution',
+            bucket=bucket_for(7200)
+        ).exists())
+
+        [row] = sla_report('priority')
+        self.assertEqual(row['priority'], 'high')
+        self.assertEqual(row['time_to_resolution']['count'], 1)
+        # Within one bucket (10%) of the real two hours
+        self.assertAlmostEqual(row['time_to_resolution']['p50'], 7200, delta=720)
+        self.assertIn('open', row['time_in_status'])
+
+        before = list(IssueDurationHistogram.objects.values_list('metric', 'status', 'bucket', 'count').order_by('metric', 'status'))
+        call_command('rebuild_issue_sla', stdout=io.StringIO())
+        after = list(IssueDurationHistogram.objects.values_list('metric', 'status', 'bucket', 'count').order_by('metric', 'status'))
+        self.assertEqual(before, after)
+
+    def test_sla_endpoint_is_admin_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/v1/issues/sla/').status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/api/v1/issues/sla/?group_by=priority').status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/issues/sla/?group_by=user').status_code, 400)
+
+
+class DuplicateDetectionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reporter', email='reporter@example.com',
+            full_name='Reporter', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.pothole = Issue.objects.create(
+            user=self.user, issue_type=self.issue_type,
+            title='Large pothole on Main Street', description='Deep pothole near the bakery',
+            location_latitude='16.80000000', location_longitude='96.15000000'
+        )
+        duplicate_index.rebuild()
+        self.client.force_login(self.user)
+
+    def check(self, **data):
+        payload = {'title': 'Big pothole Main Street', 'description': 'pothole by the bakery', **data}
+        response = self.client.post('/api/v1/issues/check_duplicates/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['possible_duplicates']
+
+    def test_minhash_similarity(self):
+        self.assertEqual(similarity(minhash('Broken street light'), minhash('broken street-light!')), 1.0)
+        self.assertLess(similarity(minhash('Broken street light'), minhash('Overflowing garbage bin')), 0.2)
+
+    def test_nearby_similar_issue_is_a_candidate(self):
+        [candidate] = self.check(location_latitude='16.80010000', location_longitude='96.15010000')
+        self.assertEqual(candidate['id'], str(self.pothole.pk))
+        self.assertLess(candidate['distance_m'], 50)
+
+    def test_distant_issue_is_not_a_candidate(self):
+        self.assertEqual(self.check(location_latitude='16.90000000', location_longitude='96.15000000'), [])
+
+    def test_index_follows_new_and_closed_issues(self):
+        self.check()
+        other = Issue.objects.create(
+            user=self.user, issue_type=self.issue_type,
+            title='Big pothole Main Street', description='pothole by the bakery'
+        )
+        self.assertIn(str(other.pk), [item['id'] for item in self.check()])
+
+        other.status = 'closed'
+        other.save()
+        self.assertNotIn(str(other.pk), [item['id'] for item in self.check()])
+
+    @override_settings(DUPLICATE_INDEX_BACKGROUND=True, DUPLICATE_CATCH_UP_EVENTS=2)
+    def test_lookups_never_build_or_replay_much_in_the_request(self):
+        with mock.patch.object(duplicate_index, 'start_rebuild') as start_rebuild:
+            duplicate_index.built_at = None
+            self.assertEqual(self.check(), [])
+            start_rebuild.assert_called_once_with()
+
+            duplicate_index.rebuild()
+            self.assertEqual(len(self.check()), 1)
+
+            # More changes than one lookup may apply: skipped, rebuilt behind the scenes
+            start_rebuild.reset_mock()
+            for i in range(3):
+                self.pothole.title = f'Large pothole on Main Street ({i})'
+                self.pothole.save()
+            self.assertEqual(self.check(), [])
+            start_rebuild.assert_called_once_with()
+            self.assertEqual(len(self.check()), 1)
+
+    def test_create_returns_candidates(self):
+        response = self.client.post('/api/v1/issues/', {
+            'issue_type': self.issue_type.pk,
+            'title': 'Pothole on Main Street',
+            'description': 'Deep pothole near the bakery',
+            'location_latitude': '16.80001000',
+            'location_longitude': '96.15001000',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [item['id'] for item in response.json()['possible_duplicates']],
+            [str(self.pothole.pk)]
+        )
+
+
+class MapClusterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='mapper', email='mapper@example.com',
+            full_name='Mapper', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+
+    def report(self, lat, lng, **fields):
+        return Issue.objects.create(
+            user=self.user, issue_type=self.issue_type, title='Pothole', description='x',
+            location_latitude=lat, location_longitude=lng, **fields
+        )
+
+    def clusters(self, zoom, bbox='96.0,16.7,96.3,16.9', **params):
+        response = self.client.get('/api/v1/issues/clusters/', {'zoom': zoom, 'bbox': bbox, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['clusters']
+
+    def test_cells_are_quantized_per_zoom(self):
+        self.assertEqual(cell_for(0, 0, 0), (2, 2))
+        self.assertEqual(cell_for(1, 80, -170), (0, 0))
+        self.assertNotEqual(cell_for(16, 16.8, 96.15), cell_for(16, 16.8, 96.16))
+
+    def test_clusters_count_by_status_and_priority(self):
+        self.report('16.80000000', '96.15000000', priority='high')
+        self.report('16.81000000', '96.16000000', status='in_progress')
+
+        [cluster] = self.clusters(8)
+        self.assertEqual(cluster['count'], 2)
+        self.assertEqual(cluster['status'], {'open': 1, 'in_progress': 1})
+        self.assertEqual(cluster['priority'], {'high': 1, 'medium': 1})
+        self.assertAlmostEqual(cluster['lat'], 16.805, places=5)
+
+        self.assertEqual(len(self.clusters(16)), 2)
+        self.assertEqual(self.clusters(8, bbox='0,0,1,1'), [])
+        self.assertEqual(self.clusters(8, status='open')[0]['count'], 1)
+
+    def test_cells_follow_moves_status_changes_and_deletes(self):
+        issue = self.report('16.80000000', '96.15000000')
+        issue = Issue.objects.only('id', 'title').get(pk=issue.pk)
+        issue.location_latitude = '16.85000000'
+        issue.status = 'closed'
+        issue.save()
+
+        [cluster] = self.clusters(16)
+        self.assertEqual(cluster['status'], {'closed': 1})
+        self.assertAlmostEqual(cluster['lat'], 16.85, places=5)
+
+        issue.delete()
+        self.assertEqual(self.clusters(8), [])
+
+        self.report('16.80000000', '96.15000000')
+        before = set(IssueMapCell.objects.filter(count__gt=0).values_list('zoom', 'cell_x', 'cell_y', 'count'))
+        call_command('rebuild_issue_map_cells', stdout=io.StringIO())
+        after = set(IssueMapCell.objects.values_list('zoom', 'cell_x', 'cell_y', 'count'))
+        self.assertEqual(before, after)
+
+
+class TokenBucketThrottleTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.user = User.objects.create_user(
+            username='scripted', email='scripted@example.com',
+            full_name='Scripted Voter', password='secret-pass-123'
+        )
+        self.issue = Issue.objects.create(
+            user=self.user, issue_type=IssueType.objects.create(name='Roads'),
+            title='Pothole', description='x'
+        )
+
+    def rates(self, **rates):
+        return override_settings(
+            THROTTLE_BUCKET_FILE=os.path.join(self.tmpdir, 'buckets'),
+            REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates},
+        )
+
+    def test_buckets_are_shared_through_the_file(self):
+        path = os.path.join(self.tmpdir, 'shared')
+        # Two stores on one file stand in for two worker processes
+        first, second = SharedBucketStore(path, 64), SharedBucketStore(path, 64)
+        self.assertTrue(first.take('vote:a', 2, 0.001)[0])
+        self.assertTrue(second.take('vote:a', 2, 0.001)[0])
+        allowed, wait = first.take('vote:a', 2, 0.001)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+        self.assertTrue(second.take('vote:b', 2, 0.001)[0])
+
+    def test_votes_are_throttled_per_user(self):
+        self.client.force_login(self.user)
+        url = f'/api/v1/issues/{self.issue.pk}/vote/'
+        with self.rates(vote='2/min'):
+            for value in (1, -1):
+                response = self.client.post(url, {'value': value}, content_type='application/json')
+                self.assertLess(response.status_code, 400)
+            response = self.client.post(url, {'value': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_login_is_throttled_per_account(self):
+        with self.rates(login='100/min', login_account='1/min'):
+            credentials = {'username': 'Scripted', 'password': 'wrong'}
+            self.assertEqual(self.client.post('/api/v1/user/login/', credentials).status_code, 400)
+            self.assertEqual(self.client.post('/api/v1/user/login/', credentials).status_code, 429)
+
+
+class VoterNotificationTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', full_name='Owner', password='secret-pass-123'
+        )
+        self.issue = Issue.objects.create(
+            user=self.owner, issue_type=IssueType.objects.create(name='Roads'),
+            title='Pothole', description='x'
+        )
+        self.voters = [
+            User.objects.create_user(
+                username=f'voter{i}', email=f'voter{i}@example.com',
+                full_name=f'Voter {i}', password='secret-pass-123'
+            )
+            for i in range(3)
+        ]
+        for voter in [self.owner, *self.voters]:
+            Vote.objects.create(issue=self.issue, user=voter, value=1)
+
+    def change_status(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            issue = Issue.objects.get(pk=self.issue.pk)
+            issue.status = status
+            issue._changed_by = self.owner
+            issue.save()
+        Worker(name='test').run(drain=True)
+
+    @override_settings(NOTIFICATION_BATCH_SIZE=2)
+    def test_close_notifies_every_voter_but_the_actor(self):
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/issues/{self.issue.pk}/close/')
+        Worker(name='test').run(drain=True)
+
+        self.assertEqual(
+            set(Notification.objects.values_list('user_id', 'status')),
+            {(voter.pk, 'closed') for voter in self.voters}
+        )
+
+    def test_changes_within_window_coalesce(self):
+        self.change_status('resolved')
+        self.change_status('closed')
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(set(Notification.objects.values_list('status', flat=True)), {'closed'})
+
+        self.change_status('in_progress')
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_unread_endpoint(self):
+        self.change_status('resolved')
+        self.client.force_login(self.voters[0])
+        data = self.client.get('/api/v1/notifications/?unread=1').json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['issue_title'], 'Pothole')
+
+        self.assertEqual(self.client.post('/api/v1/notifications/read_all/').json(), {'marked_read': 1})
+        self.assertEqual(self.client.get('/api/v1/notifications/?unread=1').json()['count'], 0)
+        self.assertEqual(self.client.get('/api/v1/notifications/').json()['count'], 1)
+
+
+class IssueArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='archivist', email='archivist@example.com', full_name='Archivist', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.old = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Old pothole', description='x')
+        self.old.status = 'closed'
+        self.old._changed_by = self.user
+        self.old.save()
+        self.recent = Issue.objects.create(
+            user=self.user, issue_type=self.issue_type, title='New pothole', description='x', status='closed'
+        )
+        Issue.objects.filter(pk=self.old.pk).update(status_changed_at=now() - timedelta(days=400))
+        Vote.objects.create(issue=self.old, user=self.user, value=1)
+        IssueAttachment.objects.create(issue=self.old, file='issue_attachments/old.jpg', file_type='image/jpeg')
+        self.client.force_login(self.user)
+
+    def test_archived_issue_is_still_retrievable(self):
+        url = f'/api/v1/issues/{self.old.pk}/'
+        before = self.client.get(url).json()
+        history = self.client.get(url + 'history/').json()
+        self.assertEqual(history[-1]['changed_by'], str(self.user.pk))
+
+        out = io.StringIO()
+        call_command('archive_issues', stdout=out)
+        self.assertIn('1 issue(s) archived', out.getvalue())
+
+        self.assertFalse(Issue.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(Vote.objects.filter(issue_id=self.old.pk).exists())
+        self.assertTrue(ArchivedVote.objects.filter(issue_id=self.old.pk, user=self.user).exists())
+        self.assertTrue(Issue.objects.filter(pk=self.recent.pk).exists())
+
+        self.assertEqual(self.client.get(url).json(), before)
+        self.assertEqual(self.client.get(url + 'history/').json(), history)
+        self.assertEqual(self.client.get(url + '?fields=title').json(), {'id': str(self.old.pk), 'title': 'Old pothole'})
+        self.assertEqual(self.client.get(f'/api/v1/issues/{uuid.uuid4()}/').status_code, 404)
+
+        listed = [item['id'] for item in self.client.get('/api/v1/issues/').json()['results']]
+        self.assertEqual(listed, [str(self.recent.pk)])
+
+    def test_archiving_emits_one_event_and_keeps_files_servable(self):
+        from CiviCareManagementSystem.media import can_access
+
+        latest = IssueEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        call_command('archive_issues', stdout=io.StringIO())
+
+        events = list(IssueEvent.objects.filter(id__gt=latest).values_list('kind', 'payload'))
+        self.assertEqual(events, [('deleted', {'archived': True})])
+        self.assertTrue(can_access(None, 'issue_attachments/old.jpg'))
+        self.assertEqual(ArchivedIssue.objects.get().data['attachments'][0]['file_type'], 'image/jpeg')
+
+    def test_sla_rebuild_counts_archived_history(self):
+        def histogram():
+            return set(IssueDurationHistogram.objects.exclude(count=0).values_list(
+                'issue_type_id', 'priority', 'metric', 'status', 'bucket', 'count'
+            ))
+
+        maintained = histogram()
+        call_command('archive_issues', stdout=io.StringIO())
+        self.assertFalse(IssueStatusTransition.objects.filter(issue_id=self.old.pk).exists())
+
+        call_command('rebuild_issue_sla', stdout=io.StringIO())
+        self.assertEqual(histogram(), maintained)
+
+    def test_backfill_keeps_recently_closed_issues_out_of_the_archive(self):
+        from django.apps import apps
+        backfill = importlib.import_module('issues.migrations.0011_issue_archive').backfill_done_status_changed_at
+
+        long_ago = now() - timedelta(days=400)
+        closed_at = IssueStatusTransition.objects.filter(issue=self.recent).latest('changed_at').changed_at
+        legacy = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Legacy', description='x')
+        IssueStatusTransition.objects.filter(issue=legacy).delete()
+        # What the status_changed_at backfill in 0008 left behind
+        Issue.objects.filter(pk__in=[self.recent.pk, legacy.pk]).update(
+            status='closed', created_at=long_ago, status_changed_at=long_ago
+        )
+        Issue.objects.filter(pk=legacy.pk).update(updated_at=now() - timedelta(days=3))
+
+        backfill(apps, None)
+
+        self.assertEqual(Issue.objects.get(pk=self.recent.pk).status_changed_at, closed_at)
+        self.assertGreater(Issue.objects.get(pk=legacy.pk).status_changed_at, now() - timedelta(days=4))
+        # self.old was closed in setUp too, so nothing is old enough
+        out = io.StringIO()
+        call_command('archive_issues', stdout=out)
+        self.assertIn('0 issue(s) archived', out.getvalue())
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reporter', email='reporter@example.com', full_name='Reporter', password='secret-pass-123'
+        )
+        self.other = User.objects.create_user(
+            username='neighbour', email='neighbour@example.com', full_name='Neighbour', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.client.force_login(self.user)
+
+    def counters(self, user):
+        return UserStats.objects.filter(user=user).values('issues_reported', 'open_issues', 'votes_cast').first()
+
+    def test_counters_follow_issues_and_votes(self):
+        first = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Pothole', description='x')
+        second = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Lamp', description='x')
+        self.assertEqual(self.counters(self.user), {'issues_reported': 2, 'open_issues': 2, 'votes_cast': 0})
+
+        first.status = 'resolved'
+        first.save()
+        first.status = 'in_progress'
+        first.save()
+        second.status = 'closed'
+        second.save()
+        self.assertEqual(self.counters(self.user)['open_issues'], 1)
+
+        url = f'/api/v1/issues/{first.pk}/vote/'
+        self.client.post(url, {'value': 1}, content_type='application/json')
+        self.client.post(url, {'value': -1}, content_type='application/json')
+        Vote.objects.create(issue=second, user=self.user, value=0)
+        self.assertEqual(self.counters(self.user)['votes_cast'], 1)
+        self.client.post(url, {'value': 0}, content_type='application/json')
+        self.assertEqual(self.counters(self.user)['votes_cast'], 0)
+
+        Vote.objects.create(issue=first, user=self.other, value=1)
+        first.delete()
+        self.assertEqual(self.counters(self.user), {'issues_reported': 1, 'open_issues': 0, 'votes_cast': 0})
+        self.assertEqual(self.counters(self.other)['votes_cast'], 0)
+
+    def test_archiving_keeps_counters(self):
+        issue = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Old', description='x')
+        issue.status = 'closed'
+        issue.save()
+        Vote.objects.create(issue=issue, user=self.user, value=1)
+        Issue.objects.filter(pk=issue.pk).update(status_changed_at=now() - timedelta(days=400))
+        before = self.counters(self.user)
+
+        call_command('archive_issues', stdout=io.StringIO())
+        self.assertFalse(Issue.objects.filter(pk=issue.pk).exists())
+        self.assertEqual(self.counters(self.user), before)
+        call_command('rebuild_user_stats', '--verify', stdout=io.StringIO())
+
+    def test_profile_endpoints_read_counters_without_counting(self):
+        Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Pothole', description='x')
+        for url in ('/api/v1/user/me/', '/api/v1/user/profile/'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.json()['stats'], {'issues_reported': 1, 'open_issues': 1, 'votes_cast': 0})
+            self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+        # No activity yet: the row is counted once, on first read
+        self.client.force_login(self.other)
+        self.assertEqual(
+            self.client.get('/api/v1/user/me/').json()['stats'],
+            {'issues_reported': 0, 'open_issues': 0, 'votes_cast': 0}
+        )
+        self.assertTrue(UserStats.objects.filter(user=self.other).exists())
+
+    def test_rebuild_fixes_drift(self):
+        Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Pothole', description='x')
+        UserStats.objects.filter(user=self.user).update(open_issues=7, votes_cast=3)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_user_stats', '--verify', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('rebuild_user_stats', stdout=out)
+        self.assertIn('1 user stats row(s) rebuilt', out.getvalue())
+        self.assertEqual(self.counters(self.user), {'issues_reported': 1, 'open_issues': 1, 'votes_cast': 0})
+        call_command('rebuild_user_stats', '--verify', stdout=io.StringIO())
+
+
+class TriageQueueTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='triager', email='triager@example.com', full_name='Triager',
+            password='secret-pass-123', is_staff=True
+        )
+        self.colleague = User.objects.create_user(
+            username='colleague', email='colleague@example.com', full_name='Colleague',
+            password='secret-pass-123', is_staff=True
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        start = now() - timedelta(hours=1)
+        self.issues = {}
+        for i, (title, priority, status) in enumerate([
+            ('old medium', 'medium', 'open'),
+            ('low', 'low', 'pending'),
+            ('critical', 'critical', 'open'),
+            ('new medium', 'medium', 'open'),
+            ('high but done', 'high', 'resolved'),
+        ]):
+            self.issues[title] = Issue.objects.create(
+                user=self.admin, issue_type=self.issue_type, title=title, description='x',
+                priority=priority, status=status, created_at=start + timedelta(minutes=i)
+            )
+        Vote.objects.create(issue=self.issues['new medium'], user=self.colleague, value=1)
+        self.client.force_login(self.admin)
+
+    def titles(self, items):
+        return [item['title'] for item in items]
+
+    def test_rank_and_score_are_maintained(self):
+        issue = self.issues['low']
+        self.assertEqual(issue.priority_rank, 1)
+        issue.priority = 'high'
+        issue.save(update_fields=['priority'])
+        self.assertEqual(Issue.objects.get(pk=issue.pk).priority_rank, 3)
+
+        stale = Issue.objects.get(pk=self.issues['new medium'].pk)
+        vote = Vote.objects.create(issue=stale, user=self.admin, value=1)
+        self.assertEqual(Issue.objects.get(pk=stale.pk).score, 2)
+        # A save from an instance loaded before the vote keeps the score
+        stale.title = 'renamed'
+        stale.save()
+        self.assertEqual(Issue.objects.get(pk=stale.pk).score, 2)
+        vote.delete()
+        self.assertEqual(Issue.objects.get(pk=stale.pk).score, 1)
+
+    def test_ordering_by_priority_is_by_urgency(self):
+        response = self.client.get('/api/v1/issues/', {'ordering': '-priority', 'fields': 'title'})
+        titles = self.titles(response.json()['results'])
+        self.assertEqual(titles[0], 'critical')
+        self.assertEqual(titles[-1], 'low')
+
+    def test_queue_order_and_claims(self):
+        queue = self.client.get('/api/v1/issues/triage/').json()['results']
+        self.assertEqual(self.titles(queue), ['critical', 'new medium', 'old medium', 'low'])
+
+        claimed = self.client.post('/api/v1/issues/triage/claim/', {'count': 2}, content_type='application/json').json()
+        self.assertEqual(self.titles(claimed['results']), ['critical', 'new medium'])
+        self.assertEqual(claimed['results'][0]['claimed_by'], str(self.admin.pk))
+
+        self.client.force_login(self.colleague)
+        claimed = self.client.post('/api/v1/issues/triage/claim/', {'count': 5}, content_type='application/json').json()
+        self.assertEqual(self.titles(claimed['results']), ['old medium', 'low'])
+        available = self.client.get('/api/v1/issues/triage/', {'available': 1}).json()['results']
+        self.assertEqual(available, [])
+
+        self.client.force_login(self.admin)
+        critical = str(self.issues['critical'].pk)
+        response = self.client.post('/api/v1/issues/triage/release/', {'ids': [critical, str(self.issues['low'].pk)]}, content_type='application/json')
+        self.assertEqual(response.json(), {'released': 1})
+        available = self.client.get('/api/v1/issues/triage/', {'available': 1}).json()['results']
+        self.assertEqual(self.titles(available), ['critical'])
+
+    def test_expired_claims_can_be_taken_over(self):
+        Issue.objects.update(claimed_by=self.colleague, claimed_until=now() - timedelta(seconds=1))
+        claimed = self.client.post('/api/v1/issues/triage/claim/', {}, content_type='application/json').json()
+        self.assertEqual(self.titles(claimed['results']), ['critical'])
+
+    def test_queue_is_admin_only(self):
+        citizen = User.objects.create_user(
+            username='citizen', email='citizen@example.com', full_name='Citizen', password='secret-pass-123'
+        )
+        self.client.force_login(citizen)
+        self.assertEqual(self.client.get('/api/v1/issues/triage/').status_code, 403)
+        self.assertEqual(self.client.post('/api/v1/issues/triage/claim/').status_code, 403)
+
+
+class BulkUpdateTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='bulkadmin', email='bulkadmin@example.com', full_name='Bulk Admin',
+            password='secret-pass-123', is_staff=True
+        )
+        self.reporter = User.objects.create_user(
+            username='bulkreporter', email='bulkreporter@example.com', full_name='Reporter',
+            password='secret-pass-123'
+        )
+        self.roads = IssueType.objects.create(name='Roads')
+        self.lights = IssueType.objects.create(name='Lights')
+        self.issues = [
+            Issue.objects.create(
+                user=self.reporter, issue_type=self.roads if i % 2 else self.lights,
+                title=f'Issue {i}', description='x', status='in_progress' if i == 4 else 'open',
+                location_latitude=f'16.8{i}000000', location_longitude='96.15000000',
+                created_at=now() - timedelta(days=i + 1)
+            )
+            for i in range(5)
+        ]
+        Vote.objects.create(issue=self.issues[1], user=self.admin, value=1)
+        Vote.objects.create(issue=self.issues[1], user=self.reporter, value=1)
+        self.client.force_login(self.admin)
+
+    def bulk(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/issues/bulk/', data, content_type='application/json')
+        return response
+
+    def snapshot(self, model, *fields):
+        # Emptied cells stay behind with a zero count
+        return sorted(model.objects.exclude(count=0).values_list(*fields))
+
+    @override_settings(BULK_UPDATE_CHUNK_SIZE=2)
+    def test_bulk_close_matches_one_by_one_bookkeeping(self):
+        latest = IssueEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        response = self.bulk({'filter': {'status': 'open'}, 'status': 'closed', 'priority': 'high'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'updated': 4, 'status_changed': 4})
+
+        closed = Issue.objects.filter(status='closed')
+        self.assertEqual(closed.count(), 4)
+        self.assertFalse(closed.filter(closed_at__isnull=True).exists())
+        self.assertEqual(set(closed.values_list('priority_rank', flat=True)), {3})
+        self.assertEqual(
+            IssueStatusTransition.objects.filter(from_status='open', to_status='closed', changed_by=self.admin).count(), 4
+        )
+        events = IssueEvent.objects.filter(id__gt=latest)
+        self.assertEqual(sorted(events.values_list('kind', flat=True)), ['closed'] * 4)
+
+        histograms = self.snapshot(IssueDurationHistogram, 'issue_type', 'priority', 'metric', 'status', 'bucket', 'count')
+        cells = self.snapshot(IssueMapCell, 'zoom', 'cell_x', 'cell_y', 'status', 'priority', 'count')
+        call_command('rebuild_issue_sla', stdout=io.StringIO())
+        call_command('rebuild_issue_map_cells', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(IssueDurationHistogram, 'issue_type', 'priority', 'metric', 'status', 'bucket', 'count'), histograms)
+        self.assertEqual(self.snapshot(IssueMapCell, 'zoom', 'cell_x', 'cell_y', 'status', 'priority', 'count'), cells)
+        call_command('rebuild_user_stats', '--verify', stdout=io.StringIO())
+
+        # Voters other than the admin hear about it through the job queue
+        Worker(name='test').run(drain=True)
+        self.assertEqual(
+            list(Notification.objects.values_list('user', 'issue', 'status')),
+            [(self.reporter.pk, self.issues[1].pk, 'closed')]
+        )
+
+    def test_ids_and_no_op_rows(self):
+        ids = [str(issue.pk) for issue in self.issues[:3]]
+        self.assertEqual(self.bulk({'ids': ids, 'priority': 'critical'}).json(), {'updated': 3, 'status_changed': 0})
+        self.assertEqual(self.bulk({'ids': ids, 'priority': 'critical'}).json(), {'updated': 0, 'status_changed': 0})
+        self.assertEqual(IssueStatusTransition.objects.filter(from_status__isnull=False).count(), 0)
+        self.assertEqual(Issue.objects.filter(priority_rank=4).count(), 3)
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.bulk({'status': 'closed'}).status_code, 400)
+        self.assertEqual(self.bulk({'filter': {}, 'status': 'closed'}).status_code, 400)
+        self.assertEqual(self.bulk({'ids': [str(self.issues[0].pk)]}).status_code, 400)
+        self.assertEqual(self.bulk({'ids': [str(self.issues[0].pk)], 'status': 'bogus'}).status_code, 400)
+
+        self.client.force_login(self.reporter)
+        self.assertEqual(self.bulk({'ids': [str(self.issues[0].pk)], 'status': 'closed'}).status_code, 403)
+
+
+class OptimisticUpdateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='editor', email='editor@example.com', full_name='Editor', password='secret-pass-123'
+        )
+        self.issue = Issue.objects.create(
+            user=self.user, issue_type=IssueType.objects.create(name='Roads'),
+            title='Pothole', description='Deep one'
+        )
+        self.url = f'/api/v1/issues/{self.issue.pk}/'
+        self.client.force_login(self.user)
+
+    def patch(self, data):
+        return self.client.patch(self.url, data, content_type='application/json')
+
+    def test_patch_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch({'title': 'Big pothole', 'description': 'Deep one', 'version': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 2)
+
+        [update] = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "issues_issue"') and '"title"' in q['sql']]
+        self.assertNotIn('"description"', update)
+        self.assertIn('"version"', update.split('WHERE')[1])
+
+        # Nothing changed: nothing written
+        self.assertEqual(self.patch({'title': 'Big pothole'}).json()['version'], 2)
+
+    def test_stale_version_is_a_conflict(self):
+        self.assertEqual(self.patch({'priority': 'high', 'version': 1}).status_code, 200)
+        response = self.patch({'priority': 'low', 'version': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertEqual(Issue.objects.get(pk=self.issue.pk).priority, 'high')
+
+    def test_concurrent_saves_do_not_overwrite_each_other(self):
+        first = Issue.objects.get(pk=self.issue.pk)
+        second = Issue.objects.get(pk=self.issue.pk)
+        first.status = 'in_progress'
+        first.save()
+        second.title = 'Renamed'
+        with self.assertRaises(VersionConflict):
+            second.save()
+        self.assertEqual(second.version, 1)
+
+        stored = Issue.objects.get(pk=self.issue.pk)
+        self.assertEqual((stored.status, stored.title, stored.version), ('in_progress', 'Pothole', 2))
+        self.assertEqual(IssueStatusTransition.objects.filter(issue=stored).count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url + 'close/')
+        self.assertEqual(response.json()['version'], 3)
+
+
+@override_settings(THROTTLE_BUCKET_FILE=os.path.join(tempfile.gettempdir(), 'ccms-test-idempotency-buckets'))
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='retrier', email='retrier@example.com', full_name='Retrier', password='secret-pass-123'
+        )
+        self.issue_type = IssueType.objects.create(name='Roads')
+        self.client.force_login(self.user)
+
+    def create_issue(self, key, title='Pothole'):
+        return self.client.post(
+            '/api/v1/issues/', {'title': title, 'description': 'x', 'issue_type': self.issue_type.pk},
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retried_create_replays_the_first_response(self):
+        first = self.create_issue('abc-123')
+        retry = self.create_issue('abc-123')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Issue.objects.count(), 1)
+
+        self.assertEqual(self.create_issue('abc-123', title='Something else').status_code, 422)
+        self.assertEqual(self.create_issue('other-key').status_code, 201)
+        self.assertEqual(Issue.objects.count(), 2)
+
+    def test_failed_requests_are_not_stored(self):
+        response = self.client.post('/api/v1/issues/', {'title': 'No type'}, HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.create_issue('k1').status_code, 201)
+
+    def test_retried_upload_stores_one_attachment(self):
+        issue = Issue.objects.create(user=self.user, issue_type=self.issue_type, title='Pothole', description='x')
+
+        def upload():
+            return self.client.post(
+                '/api/v1/attachments/',
+                {'issue': str(issue.pk), 'file': SimpleUploadedFile('photo.jpg', b'photo bytes')},
+                HTTP_IDEMPOTENCY_KEY='upload-1'
+            )
+
+        first = upload()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(upload().json(), first.json())
+        self.assertEqual(IssueAttachment.objects.count(), 1)
+
+    def test_expired_keys_run_again_and_are_pruned(self):
+        self.create_issue('old-key')
+        IdempotencyKey.objects.update(expires_at=now() - timedelta(seconds=1))
+        self.assertEqual(self.create_issue('old-key').status_code, 201)
+        self.assertEqual(Issue.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=now() - timedelta(seconds=1))
+        out = io.StringIO()
+        call_command('prune_idempotency_keys', stdout=out)
+        self.assertIn('1 idempotency key(s) pruned', out.getvalue())
+
+
+class DirectUploadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='direct', email='direct@example.com', full_name='Direct', password='secret-pass-123'
+        )
+        issue_type = IssueType.objects.create(name='Graffiti')
+        self.issue = Issue.objects.create(user=self.user, issue_type=issue_type, title='Tag', description='x')
+        self.client.force_login(self.user)
+
+    def presign(self, content, filename='wall.JPG'):
+        return self.client.post('/api/v1/attachments/presign/', {
+            'issue': str(self.issue.pk),
+            'filename': filename,
+            'content_type': 'image/jpeg',
+            'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+
+    def confirm(self, token):
+        return self.client.post('/api/v1/attachments/confirm/', {'token': token})
+
+    def test_presign_put_confirm_creates_attachment(self):
+        content = b'jpeg bytes'
+        presigned = self.presign(content).json()
+        upload = presigned['upload']
+        self.assertEqual(upload['method'], 'PUT')
+        self.assertTrue(upload['url'].startswith('http://testserver/api/v1/uploads/'))
+
+        self.assertEqual(self.confirm(presigned['token']).status_code, 400)
+        self.client.logout()
+        put = self.client.put(upload['url'], content, content_type=upload['headers']['Content-Type'])
+        self.assertEqual(put.status_code, 200)
+        self.client.force_login(self.user)
+
+        response = self.confirm(presigned['token'])
+        self.assertEqual(response.status_code, 201)
+        attachment = IssueAttachment.objects.get()
+        self.assertRegex(attachment.file.name, r'^issue_attachments/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(attachment.file_type, 'image/jpeg')
+        self.assertEqual(attachment.blob.size, len(content))
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+        # Confirming twice doesn't attach the file twice
+        self.assertEqual(self.confirm(presigned['token']).status_code, 200)
+        self.assertEqual(IssueAttachment.objects.count(), 1)
+
+        # Content that is already stored needs no upload
+        again = self.presign(content, filename='copy.jpg').json()
+        self.assertIsNone(again['upload'])
+        self.assertEqual(self.confirm(again['token']).status_code, 200)
+
+    def test_unconfirmed_uploads_are_collected(self):
+        content = b'abandoned upload'
+        upload = self.presign(content).json()['upload']
+        self.client.put(upload['url'], content, content_type='image/jpeg')
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (0, len(content)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, blob.file)))
+
+        # Within the grace period the upload may still be confirmed
+        call_command('gc_attachment_blobs', stdout=io.StringIO())
+        self.assertTrue(AttachmentBlob.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('gc_attachment_blobs', '--grace-minutes=0', stdout=io.StringIO())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, blob.file)))
+
+    def test_upload_must_match_presigned_size_and_digest(self):
+        upload = self.presign(b'the real bytes').json()['upload']
+        self.assertEqual(self.client.put(upload['url'], b'other bytes!!!', content_type='image/jpeg').status_code, 400)
+        self.assertEqual(self.client.put(upload['url'], b'the real bytes and more', content_type='image/jpeg').status_code, 400)
+        self.assertEqual(self.client.put('/api/v1/uploads/forged/', b'x', content_type='image/jpeg').status_code, 403)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'issue_attachments')))
+
+    def test_tokens_are_bound_to_the_user_and_limits_apply(self):
+        content = b'jpeg bytes'
+        presigned = self.presign(content).json()
+        self.client.put(presigned['upload']['url'], content, content_type='image/jpeg')
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', full_name='Other', password='secret-pass-123'
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.confirm(presigned['token']).status_code, 400)
+        self.assertFalse(IssueAttachment.objects.exists())
+
+        with override_settings(ATTACHMENT_MAX_UPLOAD_SIZE=5):
+            self.assertEqual(self.presign(content).status_code, 400)
@@ -0,0 +1,82 @@
+"""
+Administrator triage queue.
+
+The queue holds pending and open issues, most urgent first:
+
+    priority_rank desc, score desc, created_at asc
+
+which is exactly the issue_triage_idx partial index, so reading the head
+of the queue never sorts. Staff claim items for TRIAGE_CLAIM_SECONDS; a
+claimed issue is skipped by everyone else's claims until the claim expires,
+is released, or the issue leaves the queue by changing status.
+
+Claims use SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+(PostgreSQL), so concurrent claims take different rows without waiting on
+each other. Elsewhere (SQLite) each candidate is claimed with a conditional
+UPDATE that only one caller can win, as in jobs.queue.claim.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import Issue
+
+TRIAGE_STATUSES = ('pending', 'open')
+QUEUE_ORDER = ('-priority_rank', '-score', 'created_at')
+QUEUE_COLUMNS = (
+    'id', 'title', 'status', 'priority', 'priority_rank', 'score', 'issue_type',
+    'created_at', 'claimed_by', 'claimed_until',
+)
+
+
+def triage_queue():
+    return Issue.objects.filter(status__in=TRIAGE_STATUSES).order_by(*QUEUE_ORDER).only(*QUEUE_COLUMNS)
+
+
+def claimable(current):
+    return Q(status__in=TRIAGE_STATUSES) & (Q(claimed_until__isnull=True) | Q(claimed_until__lte=current))
+
+
+def claim(user, limit=1):
+    """
+    Claims up to `limit` unclaimed issues from the head of the queue for
+    `user` and returns them in queue order.
+    """
+    using = router.db_for_write(Issue)
+    issues = Issue.objects.using(using)
+    current = now()
+    lease = {
+        'claimed_by': user,
+        'claimed_until': current + timedelta(seconds=getattr(settings, 'TRIAGE_CLAIM_SECONDS', 900)),
+    }
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            ids = list(
+                issues.select_for_update(skip_locked=True).filter(claimable(current))
+                .order_by(*QUEUE_ORDER).values_list('id', flat=True)[:limit]
+            )
+            issues.filter(id__in=ids).update(**lease)
+    else:
+        # Over-fetch a little: other admins may win some of the candidates
+        candidates = issues.filter(claimable(current)).order_by(*QUEUE_ORDER).values_list('id', flat=True)[:limit * 4]
+        ids = []
+        for issue_id in candidates:
+            if issues.filter(claimable(current), id=issue_id).update(**lease):
+                ids.append(issue_id)
+                if len(ids) == limit:
+                    break
+
+    if not ids:
+        return []
+    return list(triage_queue().using(using).filter(id__in=ids, claimed_by=user))
+
+
+def release(user, ids):
+    """
+    Gives up `user`'s claims on `ids`; returns how many were released.
+    """
+    return Issue.objects.filter(id__in=ids, claimed_by=user).update(claimed_by=None, claimed_until=None)
@@ -0,0 +1,92 @@
+"""
+Direct attachment uploads, so file bytes don't pass through a worker:
+
+    1. POST /api/v1/attachments/presign/ with the issue, file name, content
+       type, size and SHA-256. The response says where to PUT the bytes
+       (`upload`, null if that content is already stored) and has a token.
+    2. PUT the bytes to upload.url with upload.headers.
+    3. POST /api/v1/attachments/confirm/ with the token, which creates the
+       IssueAttachment.
+
+The attachment storage checks size and digest while taking the upload
+(see issues.storage), so confirm only has to see that the object is there.
+The token is signed and names the final file, so a client can't confirm
+anything it didn't presign.
+
+presign records the file as an AttachmentBlob with no references, so bytes
+that are uploaded but never confirmed are deleted by gc_attachment_blobs
+once its grace period (which must exceed ATTACHMENT_UPLOAD_EXPIRES) is over.
+"""
+import posixpath
+
+from django.conf import settings
+from django.core import signing
+from django.utils.timezone import now
+
+from .models import AttachmentBlob, Issue, IssueAttachment
+from .storage import get_attachment_storage
+
+CONFIRM_SALT = 'issues.uploads.confirm'
+
+
+class UploadError(Exception):
+    pass
+
+
+def upload_expires():
+    return getattr(settings, 'ATTACHMENT_UPLOAD_EXPIRES', 900)
+
+
+def presign(user, issue, filename, content_type, size, sha256):
+    """
+    Returns {'upload', 'token', 'expires_in'} for a new attachment of `issue`.
+    """
+    storage = get_attachment_storage()
+    requested = posixpath.join(IssueAttachment._meta.get_field('file').upload_to, filename)
+    name = storage.content_name(requested, sha256)
+
+    upload = None
+    if not AttachmentBlob.objects.filter(file=name, ref_count__gt=0).exists():
+        upload = storage.presign_upload(requested, size, sha256, content_type, upload_expires())
+        # Unreferenced until confirmed, so gc_attachment_blobs collects the
+        # file if the upload is never confirmed
+        blob, created = AttachmentBlob.objects.get_or_create(
+            file=name, defaults={'digest': sha256, 'size': size}
+        )
+        if not created and blob.ref_count == 0:
+            AttachmentBlob.objects.filter(pk=blob.pk, ref_count=0).update(updated_at=now())
+
+    token = signing.dumps({
+        'user': str(user.pk),
+        'issue': str(issue.pk),
+        'name': name,
+        'size': size,
+        'content_type': content_type,
+    }, salt=CONFIRM_SALT)
+    return {'upload': upload, 'token': token, 'expires_in': upload_expires()}
+
+
+def confirm(user, token):
+    """
+    Creates the attachment for an uploaded file; returns (attachment, created).
+    Confirming the same token again returns the existing attachment.
+    """
+    try:
+        data = signing.loads(token, salt=CONFIRM_SALT, max_age=upload_expires())
+    except signing.BadSignature:
+        raise UploadError('Invalid or expired upload token')
+    if data['user'] != str(user.pk):
+        raise UploadError('Invalid or expired upload token')
+
+    issue = Issue.objects.filter(pk=data['issue']).only('pk').first()
+    if issue is None:
+        raise UploadError('Issue not found')
+
+    storage = get_attachment_storage()
+    name = data['name']
+    if not storage.exists(name) or storage.size(name) != data['size']:
+        raise UploadError('The file has not been uploaded')
+
+    return IssueAttachment.objects.get_or_create(
+        issue=issue, file=name, defaults={'file_type': data['content_type']}
+    )
@@ -0,0 +1,80 @@
+"""
+Per-user activity counters (users.UserStats).
+
+issues.signals adjusts the counters with F() updates inside the transaction
+that creates, deletes or changes the status of an issue, or changes a vote,
+so they commit or roll back with the change itself. A user's row is created
+from a full count the first time one of their counters moves (or when
+their stats are first read), so counters never need a backfill.
+
+Archiving an issue moves it and its votes to the archive tables without
+touching the counters: archived issues still count as reported and their
+votes as cast.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from users.models import UserStats
+
+from .models import ArchivedIssue, ArchivedVote, Issue, Vote
+
+DONE_STATUSES = ('resolved', 'closed')
+COUNTERS = ('issues_reported', 'open_issues', 'votes_cast')
+
+
+def is_open(status):
+    return status is not None and status not in DONE_STATUSES
+
+
+def compute(user_id):
+    """
+    Counts a user's activity from the issue and vote tables.
+    """
+    issues = Issue.objects.filter(user_id=user_id)
+    return {
+        'issues_reported': issues.count() + ArchivedIssue.objects.filter(user_id=user_id).count(),
+        'open_issues': issues.exclude(status__in=DONE_STATUSES).count(),
+        'votes_cast': (
+            Vote.objects.filter(user_id=user_id).exclude(value=0).count()
+            + ArchivedVote.objects.filter(user_id=user_id).exclude(value=0).count()
+        ),
+    }
+
+
+def create_stats(user_id):
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user_id=user_id, **compute(user_id))
+    except IntegrityError:
+        # Created concurrently
+        return UserStats.objects.get(user_id=user_id)
+
+
+def get_stats(user):
+    """
+    Returns the user's UserStats, using the select_related row if present.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return create_stats(user.pk)
+
+
+def bump(user_id, create=True, **deltas):
+    """
+    Adds `deltas` to the user's counters.
+
+    A missing row is created from a full count, which already includes the
+    change being recorded. Deletes pass create=False: the user may be the
+    one being deleted, and a later read recounts anyway.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas or user_id is None:
+        return
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        updated_at=now(),
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    if not updated and create:
+        create_stats(user_id)
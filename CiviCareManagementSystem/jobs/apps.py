@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    name = 'jobs'
+
+    def ready(self):
+        # Registers @task functions from every app's tasks.py
+        autodiscover_modules('tasks')
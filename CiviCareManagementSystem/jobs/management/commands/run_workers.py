@@ -0,0 +1,82 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import Worker
+
+
+def run_worker(batch_size, poll_interval, drain):
+    import django
+    # No-op when forked; needed for the spawn start method (macOS, Windows)
+    django.setup()
+
+    worker = Worker(batch_size=batch_size, poll_interval=poll_interval)
+
+    def stop(signum, frame):
+        worker.stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    worker.run(drain=drain)
+
+
+class Command(BaseCommand):
+    help = 'Runs background job workers; finishes the current job on SIGTERM/SIGINT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=getattr(settings, 'JOB_WORKER_PROCESSES', 2),
+            help='Worker processes to run (1 runs in this process)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1, help='Jobs claimed at a time')
+        parser.add_argument('--poll-interval', type=float, default=None, help='Seconds to sleep when idle')
+        parser.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        worker_args = (options['batch_size'], options['poll_interval'], options['drain'])
+
+        if options['processes'] <= 1:
+            run_worker(*worker_args)
+            return
+
+        # Children must not share the parent's database sockets
+        connections.close_all()
+
+        stopping = False
+        workers = []
+
+        def start():
+            process = multiprocessing.Process(target=run_worker, args=worker_args, daemon=False)
+            process.start()
+            return process
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        workers.extend(start() for _ in range(options['processes']))
+        self.stdout.write(f'Started {len(workers)} worker(s)')
+
+        while workers:
+            for process in list(workers):
+                if process.is_alive():
+                    continue
+                process.join()
+                if stopping or options['drain'] or process.exitcode == 0:
+                    workers.remove(process)
+                else:
+                    self.stderr.write(f'Worker {process.pid} exited with {process.exitcode}, restarting')
+                    workers[workers.index(process)] = start()
+            time.sleep(0.5)
+
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class Job(models.Model):
+    """
+    A unit of background work, claimed and run by manage.py run_workers
+    (see jobs/queue.py).
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=now)
+    # Visibility timeout: a running job whose worker died is claimable again after this
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim scan: queued jobs that are due, expired running jobs
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
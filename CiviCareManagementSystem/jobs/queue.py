@@ -0,0 +1,207 @@
+"""
+Database-backed background jobs.
+
+    from jobs.queue import enqueue, task
+
+    @task('issues.rebuild_sla')
+    def rebuild_sla():
+        ...
+
+    enqueue('issues.rebuild_sla')
+
+Tasks are registered from each app's tasks.py (see JobsConfig.ready) and
+take JSON-serializable keyword arguments. enqueue() inserts the job once
+the surrounding transaction commits, so it is safe to call from serializers
+and signal receivers: a rolled back request never leaves work behind.
+
+Workers (manage.py run_workers) claim due jobs with SELECT ... FOR UPDATE
+SKIP LOCKED where the database supports it (PostgreSQL). Elsewhere (SQLite)
+every candidate is claimed with a conditional UPDATE that only one worker
+can win. A claimed job is invisible to other workers until JOB_VISIBILITY_TIMEOUT
+passes; if its worker dies it is then claimed again. Failures are retried
+with exponential backoff up to max_attempts.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name, max_attempts=None):
+    """
+    Registers a function as the task `name`.
+    """
+    def decorator(func):
+        registry[name] = (func, max_attempts)
+        func.task_name = name
+        return func
+    return decorator
+
+
+def enqueue(task_name, delay=0, max_attempts=None, **payload):
+    """
+    Queues `task_name(**payload)` to run `delay` seconds after the current
+    transaction commits (immediately outside a transaction).
+    """
+    enqueue_many(task_name, [payload], delay, max_attempts)
+
+
+def enqueue_many(task_name, payloads, delay=0, max_attempts=None):
+    """
+    enqueue() for a list of payloads, inserted with one bulk_create.
+    """
+    if task_name not in registry:
+        raise ValueError(f'Unknown task {task_name!r}')
+    if max_attempts is None:
+        max_attempts = registry[task_name][1] or getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+    payloads = list(payloads)
+    if not payloads:
+        return
+
+    using = router.db_for_write(Job)
+
+    def insert():
+        run_at = now() + timedelta(seconds=delay)
+        Job.objects.using(using).bulk_create([
+            Job(task=task_name, payload=payload, max_attempts=max_attempts, run_at=run_at)
+            for payload in payloads
+        ])
+
+    transaction.on_commit(insert, using=using)
+
+
+def backoff(attempts):
+    """
+    Seconds before retry number `attempts`, doubling each time, with jitter.
+    """
+    base = getattr(settings, 'JOB_BACKOFF_BASE', 10)
+    cap = getattr(settings, 'JOB_BACKOFF_MAX', 3600)
+    return min(base * 2 ** (attempts - 1), cap) * random.uniform(0.5, 1)
+
+
+def claimable(current):
+    return Q(status='queued', run_at__lte=current) | Q(status='running', locked_until__lt=current)
+
+
+def claim(worker_id, limit=1):
+    """
+    Marks up to `limit` due jobs as running for `worker_id` and returns them.
+    """
+    using = router.db_for_write(Job)
+    jobs = Job.objects.using(using)
+    current = now()
+    lease = {
+        'status': 'running',
+        'locked_by': worker_id,
+        'locked_until': current + timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 300)),
+        'attempts': F('attempts') + 1,
+    }
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            ids = list(
+                jobs.select_for_update(skip_locked=True).filter(claimable(current))
+                .order_by('run_at').values_list('id', flat=True)[:limit]
+            )
+            jobs.filter(id__in=ids).update(**lease)
+    else:
+        # Over-fetch a little: other workers may win some of the candidates
+        candidates = jobs.filter(claimable(current)).order_by('run_at').values_list('id', flat=True)[:limit * 4]
+        ids = []
+        for job_id in candidates:
+            if jobs.filter(claimable(current), id=job_id).update(**lease):
+                ids.append(job_id)
+                if len(ids) == limit:
+                    break
+
+    if not ids:
+        return []
+    return list(jobs.filter(id__in=ids, locked_by=worker_id).order_by('run_at'))
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records the outcome. Returns True on success.
+    """
+    jobs = Job.objects.using(router.db_for_write(Job))
+    # Only the current lease holder may record the outcome
+    lease = jobs.filter(id=job.id, status='running', locked_by=job.locked_by)
+
+    func = registry.get(job.task, (None, None))[0]
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {job.task!r}')
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.task, job.attempts)
+        if job.attempts >= job.max_attempts:
+            lease.update(status='failed', locked_until=None, finished_at=now(), last_error=error)
+        else:
+            lease.update(
+                status='queued',
+                locked_until=None,
+                run_at=now() + timedelta(seconds=backoff(job.attempts)),
+                last_error=error,
+            )
+        return False
+
+    lease.update(status='done', locked_until=None, finished_at=now(), last_error='')
+    return True
+
+
+def release(jobs, worker_id):
+    """
+    Hands claimed but unstarted jobs back to the queue.
+    """
+    Job.objects.using(router.db_for_write(Job)).filter(
+        id__in=[job.id for job in jobs], status='running', locked_by=worker_id
+    ).update(status='queued', locked_until=None, attempts=F('attempts') - 1)
+
+
+class Worker:
+
+    def __init__(self, name=None, batch_size=1, poll_interval=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+        self.stopping = False
+
+    def run_once(self):
+        """
+        Claims and runs one batch; returns the number of jobs claimed.
+        """
+        jobs = claim(self.name, self.batch_size)
+        for index, job in enumerate(jobs):
+            if self.stopping:
+                release(jobs[index:], self.name)
+                break
+            run_job(job)
+        return len(jobs)
+
+    def run(self, drain=False):
+        """
+        Processes jobs until stopped, or until the queue is empty with `drain`.
+        """
+        while not self.stopping:
+            # Long-lived process: honour CONN_MAX_AGE / health checks
+            close_old_connections()
+            if self.run_once():
+                continue
+            if drain:
+                break
+            time.sleep(self.poll_interval)
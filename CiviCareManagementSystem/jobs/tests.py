@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from .models import Job
+from .queue import Worker, claim, enqueue, registry, task
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('tests.record', value=1)
+            self.assertFalse(Job.objects.exists())
+
+        Worker(name='w1').run(drain=True)
+        self.assertEqual(calls, [1])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_jobs_are_claimed_once(self):
+        Job.objects.bulk_create([Job(task='tests.record', payload={'value': i}) for i in range(3)])
+        first = claim('w1', limit=2)
+        second = claim('w2', limit=2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.id for job in first} & {job.id for job in second})
+        self.assertEqual(claim('w3', limit=2), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        job = Job.objects.create(task='tests.record', payload={'value': 1})
+        [claimed] = claim('w1')
+        Job.objects.filter(id=job.id).update(locked_until=now() - timedelta(seconds=1))
+
+        [reclaimed] = claim('w2')
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (claimed.id, 2))
+
+    @override_settings(JOB_BACKOFF_BASE=60)
+    def test_failures_back_off_then_fail(self):
+        self.assertEqual(registry['tests.explode'][1], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('tests.explode')
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            Worker(name='w1').run(drain=True)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreaterEqual(job.run_at, now() + timedelta(seconds=25))
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+        Job.objects.update(run_at=now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            Worker(name='w1').run(drain=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
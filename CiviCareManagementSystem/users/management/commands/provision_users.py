@@ -0,0 +1,100 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from users.models import User
+
+FIELDS = ('username', 'email', 'full_name', 'phone', 'role', 'password')
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates accounts from a CSV staff roster with columns '
+        'username,email,full_name[,phone,role,password]. Existing usernames, '
+        'emails and phones are skipped; rows without a password get an '
+        'unusable one (use password reset).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--role', default='citizen', choices=[c[0] for c in User.ROLE_CHOICES],
+                            help='Role for rows without one (default: citizen)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing passwords')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                rows = [self.clean(row, options['role']) for row in csv.DictReader(f)]
+        except OSError as e:
+            raise CommandError(e)
+
+        created = skipped = 0
+        # Password hashing is deliberately slow; spread it over all cores
+        with ProcessPoolExecutor(max_workers=max(options['processes'], 1), initializer=django.setup) as pool:
+            for start in range(0, len(rows), options['batch_size']):
+                chunk = rows[start:start + options['batch_size']]
+                batch = self.new_rows(chunk)
+                skipped += len(chunk) - len(batch)
+                if not batch:
+                    continue
+
+                hashes = pool.map(make_password, [row.pop('password') for row in batch], chunksize=16)
+                users = [User(password=password, **row) for row, password in zip(batch, hashes)]
+                if options['dry_run']:
+                    created += len(users)
+                else:
+                    created += self.insert(users)
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}{created} user(s) provisioned, {skipped} skipped'))
+
+    def insert(self, users):
+        """
+        Inserts `users`, skipping any created concurrently since new_rows();
+        returns how many were actually inserted.
+        """
+        usernames = [user.username for user in users]
+        existing = User.objects.filter(username__in=usernames)
+        with transaction.atomic():
+            before = existing.count()
+            User.objects.bulk_create(users, ignore_conflicts=True)
+            return existing.count() - before
+
+    def clean(self, row, default_role):
+        row = {field: (row.get(field) or '').strip() for field in FIELDS}
+        missing = [field for field in ('username', 'email', 'full_name') if not row[field]]
+        if missing:
+            raise CommandError(f'Row {row} is missing {", ".join(missing)}')
+        row['email'] = row['email'].lower()
+        row['phone'] = row['phone'] or None
+        row['role'] = row['role'] or default_role
+        row['password'] = row['password'] or None
+        return row
+
+    def new_rows(self, batch):
+        """
+        Drops rows whose username, email or phone already exists (one query
+        per field for the whole batch) or repeats an earlier row.
+        """
+        taken = {}
+        for field in ('username', 'email', 'phone'):
+            values = [row[field] for row in batch if row[field]]
+            taken[field] = set(User.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+
+        fresh = []
+        for row in batch:
+            if any(row[field] and row[field] in taken[field] for field in taken):
+                continue
+            for field in taken:
+                if row[field]:
+                    taken[field].add(row[field])
+            fresh.append(row)
+        return fresh
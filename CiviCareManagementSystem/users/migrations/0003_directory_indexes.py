@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+SEARCH_COLUMNS = ('username', 'email', 'full_name', 'phone')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # icontains/istartswith compile to UPPER(col) LIKE ..., which these serve
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS user_{column}_trgm_idx '
+            f'ON users_user USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_alter_user_date_of_birth_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', '-created_at', '-id'], name='user_role_created_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
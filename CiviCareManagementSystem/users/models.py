@@ -31,10 +31,35 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'  
     REQUIRED_FIELDS = ['username', 'full_name']  # Fields required when creating superuser
 
+    class Meta(AbstractUser.Meta):
+        # On PostgreSQL, users/migrations/0003 also adds pg_trgm GIN indexes on
+        # UPPER(username/email/full_name/phone) for the directory search
+        indexes = [
+            # UserListView keyset pagination, optionally filtered by role
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+            models.Index(fields=['role', '-created_at', '-id'], name='user_role_created_idx'),
+        ]
+
     def __str__(self):
         return self.email  # Or self.username
     
     def save(self, *args, **kwargs):
         # Ensure email is lowercase
         self.email = self.email.lower()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class UserStats(models.Model):
+    """
+    Activity counters shown on the profile screens. Kept current by
+    issues.signals in the same transaction as the change they count (see
+    issues/user_stats.py); rebuild_user_stats recounts them.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Includes archived issues and votes
+    issues_reported = models.IntegerField(default=0)
+    open_issues = models.IntegerField(default=0)
+    votes_cast = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"Stats for {self.user_id}"
@@ -1,3 +1,156 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from api.users.serializers import SignupSerializer
+from users.models import User
+
+
+class UserDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', full_name='City Admin',
+            password='secret-pass-123', role='administrator'
+        )
+        start = now() - timedelta(days=1)
+        User.objects.bulk_create([
+            User(
+                username=f'citizen{i:02d}', email=f'citizen{i:02d}@example.com',
+                full_name=f'Citizen {i:02d}', phone=f'0955{i:04d}',
+                is_active=i % 5 != 0, created_at=start + timedelta(minutes=i)
+            )
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def list(self, url='/api/v1/user/users/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_keyset_pages_cover_everyone_once_without_count(self):
+        seen = []
+        url, params = '/api/v1/user/users/', {'page_size': 10}
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                data = self.list(url, **params)
+                seen.extend(item['username'] for item in data['results'])
+                url, params = data['next'], {}
+        self.assertEqual(len(seen), 26)
+        self.assertEqual(len(set(seen)), 26)
+        self.assertNotIn('count', data)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries))
+
+    def test_prefix_and_contains_search(self):
+        self.assertEqual(len(self.list(search='citizen1')['results']), 10)
+        self.assertEqual([item['username'] for item in self.list(search='09550010')['results']], ['citizen10'])
+        self.assertEqual(self.list(search='zen 07')['results'], [])
+        self.assertEqual(
+            [item['username'] for item in self.list(search='zen 07', match='contains')['results']],
+            ['citizen07']
+        )
+
+    def test_filters(self):
+        self.assertEqual(len(self.list(is_active='false')['results']), 5)
+        self.assertEqual([item['username'] for item in self.list(role='administrator')['results']], ['admin'])
+
+    def test_citizens_only_see_themselves(self):
+        self.client.force_login(User.objects.get(username='citizen03'))
+        self.assertEqual([item['username'] for item in self.list()['results']], ['citizen03'])
+
+
+# Keeps the signup throttle's buckets out of the shared file
+@override_settings(THROTTLE_BUCKET_FILE=os.path.join(tempfile.mkdtemp(), 'buckets'))
+class SignupTests(TestCase):
+
+    def signup(self, **fields):
+        data = {
+            'username': 'newcitizen', 'email': 'New@Example.com', 'full_name': 'New Citizen',
+            'password': 'a-long-pass-phrase-9', 'confirm_password': 'a-long-pass-phrase-9',
+            **fields
+        }
+        return self.client.post('/api/v1/user/signup/', data)
+
+    def test_signup_is_a_single_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.signup().status_code, 201)
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT')])
+        self.assertEqual(User.objects.get().email, 'new@example.com')
+
+    def test_duplicates_map_to_field_errors(self):
+        self.signup(phone='')
+        response = self.signup(username='other', email='NEW@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'email': ['A user with this email already exists.']})
+
+        response = self.signup(email='other@example.com')
+        self.assertEqual(response.json(), {'username': ['A user with this username already exists.']})
+
+        # Blank phones are stored as NULL and don't collide
+        self.assertEqual(self.signup(username='third', email='third@example.com', phone='').status_code, 201)
+
+
+class UniqueFieldForTests(SimpleTestCase):
+
+    def error(self, message, constraint=None):
+        error = IntegrityError(message)
+        if constraint:
+            cause = Exception(message)
+            cause.diag = mock.Mock(constraint_name=constraint)
+            error.__cause__ = cause
+        return error
+
+    def test_reads_the_constraint_or_the_column_not_the_value(self):
+        field_for = SignupSerializer.unique_field_for
+        detail = 'duplicate key value violates unique constraint\nDETAIL:  Key (email)=(john.username@x.com) already exists.'
+        self.assertEqual(field_for(self.error(detail, 'users_user_email_key')), 'email')
+        self.assertEqual(field_for(self.error(detail, 'users_user_username_6821ab7c_uniq')), 'username')
+        self.assertIsNone(field_for(self.error(detail, 'users_userstats_pkey')))
+        self.assertEqual(field_for(self.error(detail)), 'email')
+        self.assertEqual(field_for(self.error('UNIQUE constraint failed: users_user.phone')), 'phone')
+        self.assertIsNone(field_for(self.error('NOT NULL constraint failed: users_user.email')))
+
+
+class ProvisionUsersTests(TestCase):
+
+    def roster(self):
+        User.objects.create_user(username='taken', email='taken@example.com', full_name='Taken', password='x')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('username,email,full_name,phone,role,password\n')
+            f.write('clerk1,Clerk1@City.gov,Clerk One,0911,,initial-pass-1\n')
+            f.write('clerk2,clerk2@city.gov,Clerk Two,,administrator,\n')
+            f.write('taken,someone@city.gov,Dup Username,,,\n')
+            f.write('clerk3,clerk1@city.gov,Dup Email In File,,,\n')
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_roster_import(self):
+        out = io.StringIO()
+        call_command('provision_users', self.roster(), '--processes=2', '--batch-size=2', stdout=out)
+        self.assertIn('2 user(s) provisioned, 2 skipped', out.getvalue())
+
+        clerk = User.objects.get(username='clerk1')
+        self.assertEqual((clerk.email, clerk.role), ('clerk1@city.gov', 'citizen'))
+        self.assertTrue(clerk.check_password('initial-pass-1'))
+        self.assertFalse(User.objects.get(username='clerk2').has_usable_password())
+        self.assertEqual(User.objects.get(username='clerk2').role, 'administrator')
+
+    def test_counts_only_inserted_rows(self):
+        # As if the other rows were created between new_rows() and the insert
+        with mock.patch('users.management.commands.provision_users.Command.new_rows', lambda self, batch: batch):
+            out = io.StringIO()
+            call_command('provision_users', self.roster(), '--processes=1', '--batch-size=10', stdout=out)
+        self.assertIn('2 user(s) provisioned, 0 skipped', out.getvalue())
+        self.assertEqual(User.objects.count(), 3)